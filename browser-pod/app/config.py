@@ -12,20 +12,97 @@ class Settings:
     # Storage settings
     STORAGE_PATH: Path = Path("storage")
     UPLOADS_PATH: Path = STORAGE_PATH / "uploads"
+    PARTIAL_UPLOADS_PATH: Path = STORAGE_PATH / "partial_uploads"
+    BLOBS_PATH: Path = STORAGE_PATH / "blobs"
     SCREENSHOTS_PATH: Path = STORAGE_PATH / "screenshots"
     RECORDINGS_PATH: Path = STORAGE_PATH / "recordings"
     OUTPUTS_PATH: Path = STORAGE_PATH / "outputs"
+    COMPRESSED_PATH: Path = STORAGE_PATH / "compressed"
+    BROWSER_STATES_PATH: Path = STORAGE_PATH / "browser_states"
+    TIMELINES_PATH: Path = STORAGE_PATH / "timelines"
+    SCRIPTS_PATH: Path = STORAGE_PATH / "scripts"
     
     # Task settings
     MAX_CONCURRENT_TASKS: int = int(os.getenv("MAX_CONCURRENT_TASKS", "5"))
     TASK_TIMEOUT: int = int(os.getenv("TASK_TIMEOUT", "3600"))  # 1 hour
+    TASK_STEP_TIMEOUT: int = int(os.getenv("TASK_STEP_TIMEOUT", "600"))  # seconds per agent step, 0 disables
+    TASK_IDLE_TIMEOUT: int = int(os.getenv("TASK_IDLE_TIMEOUT", "300"))  # seconds without starting a step, 0 disables
+    TASK_PAUSE_SPILL_AFTER: int = int(os.getenv("TASK_PAUSE_SPILL_AFTER", "0"))  # seconds paused before pages are spilled to disk, 0 disables
+    TASK_WATCHDOG_INTERVAL: float = float(os.getenv("TASK_WATCHDOG_INTERVAL", "1"))  # seconds between limit checks
+    TRACE_MAX_EVENTS: int = int(os.getenv("TRACE_MAX_EVENTS", "2000"))  # spans kept per task trace
+    TRACE_MAX_TASKS: int = int(os.getenv("TRACE_MAX_TASKS", "200"))  # most recent tasks keeping a trace
+    
+    # Scheduler settings
+    MAX_QUEUED_TASKS: int = int(os.getenv("MAX_QUEUED_TASKS", "100"))
+    MAX_BATCH_SIZE: int = int(os.getenv("MAX_BATCH_SIZE", "10000"))  # tasks per run-tasks request
+    MAX_BATCH_BODY_SIZE: int = int(os.getenv("MAX_BATCH_BODY_SIZE", "50")) * 1024 * 1024  # 50MB per run-tasks request
+    QUEUE_RETRY_AFTER: int = int(os.getenv("QUEUE_RETRY_AFTER", "30"))  # seconds
+    SCHEDULER_PRIORITY_STRIDE: int = int(os.getenv("SCHEDULER_PRIORITY_STRIDE", "10"))
+    
+    # Task store settings
+    TASK_STORE: str = os.getenv("TASK_STORE", "memory")  # memory or sqlite
+    TASK_STORE_PATH: Path = Path(os.getenv("TASK_STORE_PATH", str(STORAGE_PATH / "tasks.db")))
+    TASK_STORE_CACHE_SIZE: int = int(os.getenv("TASK_STORE_CACHE_SIZE", "1000"))  # finished tasks kept in memory
+    TASK_STORE_BATCH_SIZE: int = int(os.getenv("TASK_STORE_BATCH_SIZE", "100"))  # rows per write batch
+    TASK_STORE_FLUSH_INTERVAL: float = float(os.getenv("TASK_STORE_FLUSH_INTERVAL", "0.5"))  # seconds
+    
+    # Task retention settings
+    TASK_RETENTION_SECONDS: int = int(os.getenv("TASK_RETENTION_SECONDS", "3600"))  # full details after finishing
+    TASK_RETENTION_MAX_COUNT: int = int(os.getenv("TASK_RETENTION_MAX_COUNT", "1000"))  # finished tasks kept in full
+    TASK_SUMMARY_RETENTION_SECONDS: int = int(os.getenv("TASK_SUMMARY_RETENTION_SECONDS", "604800"))  # 7 days, 0 keeps forever
+    TASK_REAPER_INTERVAL: int = int(os.getenv("TASK_REAPER_INTERVAL", "60"))  # seconds
+    
+    # Task event stream settings
+    TASK_EVENTS_HISTORY: int = int(os.getenv("TASK_EVENTS_HISTORY", "256"))  # events kept per watched task
+    TASK_EVENTS_HEARTBEAT: float = float(os.getenv("TASK_EVENTS_HEARTBEAT", "15"))  # seconds
+    
+    # Screenshot settings
+    SCREENSHOT_THUMBNAIL_WIDTH: int = int(os.getenv("SCREENSHOT_THUMBNAIL_WIDTH", "320"))  # pixels, 0 disables thumbnails
+    
+    # Screenshot timeline settings
+    TIMELINE_MAX_WIDTH: int = int(os.getenv("TIMELINE_MAX_WIDTH", "640"))  # pixels
+    TIMELINE_COLORS: int = int(os.getenv("TIMELINE_COLORS", "128"))  # palette size per frame
+    TIMELINE_FRAME_DURATION: int = int(os.getenv("TIMELINE_FRAME_DURATION", "1000"))  # milliseconds
+    TIMELINE_WORKERS: int = int(os.getenv("TIMELINE_WORKERS", "2"))  # encoding processes
+    TIMELINE_MAX_FRAMES: int = int(os.getenv("TIMELINE_MAX_FRAMES", "300"))  # screenshots sampled evenly beyond this
     
     # Browser settings
     BROWSER_HEADLESS: bool = os.getenv("BROWSER_HEADLESS", "true").lower() == "true"
     BROWSER_TIMEOUT: int = int(os.getenv("BROWSER_TIMEOUT", "30000"))  # 30 seconds
     
+    # Browser pool settings
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    BROWSER_POOL_MAX_TASKS: int = int(os.getenv("BROWSER_POOL_MAX_TASKS", "20"))  # recycle after N tasks
+    BROWSER_POOL_MAX_MEMORY_MB: int = int(os.getenv("BROWSER_POOL_MAX_MEMORY_MB", "1024"))
+    BROWSER_POOL_HEALTH_CHECK_INTERVAL: int = int(os.getenv("BROWSER_POOL_HEALTH_CHECK_INTERVAL", "30"))  # seconds
+    BROWSER_ORPHAN_SWEEP_INTERVAL: int = int(os.getenv("BROWSER_ORPHAN_SWEEP_INTERVAL", "60"))  # seconds, 0 disables
+    TEARDOWN_TIMEOUT: float = float(os.getenv("TEARDOWN_TIMEOUT", "10"))  # seconds to close a task's browser resources
+    
+    # LLM settings
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))  # pooled HTTP connections per provider
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # in-flight calls per provider
+    LLM_REQUESTS_PER_MINUTE: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # calls per provider, 0 disables
+    LLM_PROVIDER_LIMITS: str = os.getenv("LLM_PROVIDER_LIMITS", "")  # e.g. "openai=32/600,anthropic=8/120"
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))  # SDK retries per call
+    LLM_FAILOVER: bool = os.getenv("LLM_FAILOVER", "false").lower() == "true"  # retry failed calls on equivalent models
+    LLM_HEDGE: bool = os.getenv("LLM_HEDGE", "false").lower() == "true"  # race an equivalent model against slow calls, billing both
+    LLM_CROSS_PROVIDER: bool = os.getenv("LLM_CROSS_PROVIDER", "false").lower() == "true"  # let failover and hedging send prompts to other providers
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))  # latency after which calls are hedged
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # calls measured before hedging a model
+    LLM_LATENCY_WINDOW: int = int(os.getenv("LLM_LATENCY_WINDOW", "200"))  # recent calls kept per model
+    LLM_FAILURE_COOLDOWN: int = int(os.getenv("LLM_FAILURE_COOLDOWN", "30"))  # seconds a failing model is tried last
+    LLM_CACHE_POLICY: str = os.getenv("LLM_CACHE_POLICY", "off")  # default cache_policy of tasks
+    LLM_CACHE_PATH: Path = Path(os.getenv("LLM_CACHE_PATH", str(STORAGE_PATH / "llm_cache.db")))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))  # least recently used evicted first
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "86400"))  # seconds a cached response is reused
+    
     # File settings
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "100")) * 1024 * 1024  # 100MB
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", "1048576"))  # bytes per disk write
+    UPLOAD_PROOF_SIZE: int = int(os.getenv("UPLOAD_PROOF_SIZE", "65536"))  # bytes hashed to prove a stored file is held
+    UPLOAD_PROOF_TTL: int = int(os.getenv("UPLOAD_PROOF_TTL", "300"))  # seconds to answer an upload challenge
+    MEDIA_CACHE_MAX_AGE: int = int(os.getenv("MEDIA_CACHE_MAX_AGE", "0"))  # seconds, 0 always revalidates
+    MEDIA_COMPRESS_MIN_SIZE: int = int(os.getenv("MEDIA_COMPRESS_MIN_SIZE", "1024"))  # bytes
     ALLOWED_FILE_TYPES: set = {
         "image/png", "image/jpeg", "image/gif", "image/webp",
         "application/pdf", "text/plain", "text/csv",
@@ -34,8 +111,9 @@ class Settings:
     
     def __init__(self):
         # Create storage directories
-        for path in [self.UPLOADS_PATH, self.SCREENSHOTS_PATH, 
-                    self.RECORDINGS_PATH, self.OUTPUTS_PATH]:
+        for path in [self.UPLOADS_PATH, self.PARTIAL_UPLOADS_PATH, self.BLOBS_PATH, self.SCREENSHOTS_PATH,
+                    self.RECORDINGS_PATH, self.OUTPUTS_PATH, self.COMPRESSED_PATH, self.TIMELINES_PATH,
+                    self.BROWSER_STATES_PATH, self.SCRIPTS_PATH]:
             path.mkdir(parents=True, exist_ok=True)
 
 
@@ -5,7 +5,12 @@ from contextlib import asynccontextmanager
 import os
 
 from .config import settings
-from .routers import health, tasks, uploads
+from .routers import health, metrics, tasks, uploads
+from .services.browser_pool import browser_pool
+from .services.llm_cache import llm_cache
+from .services.llm_registry import llm_registry
+from .services.timeline_service import timeline_service
+from .utils.task_manager import task_manager
 
 
 @asynccontextmanager
@@ -14,11 +19,19 @@ async def lifespan(app: FastAPI):
     # Startup
     print(f"Starting Browser Pod API server...")
     print(f"Storage path: {settings.STORAGE_PATH}")
+    await browser_pool.start()
+    print(f"Browser pool warmed with {browser_pool.stats()['idle']} browsers")
+    await task_manager.start()
     
     yield
     
     # Shutdown
     print("Shutting down Browser Pod API server...")
+    await browser_pool.close()
+    await task_manager.close()
+    await timeline_service.close()
+    await llm_registry.close()
+    await llm_cache.close()
 
 
 def create_app() -> FastAPI:
@@ -50,6 +63,7 @@ def create_app() -> FastAPI:
     app.include_router(health.router)
     app.include_router(tasks.router)
     app.include_router(uploads.router)
+    app.include_router(metrics.router)
     
     return app
 
@@ -65,5 +79,6 @@ async def root():
         "message": "Browser Use Cloud API",
         "version": "0.1.0",
         "docs": "/docs",
-        "health": "/api/v1/ping"
+        "health": "/api/v1/ping",
+        "metrics": "/metrics"
     }
@@ -29,6 +29,13 @@ class LLMModel(str, Enum):
     LLAMA_4_MAVERICK = "llama-4-maverick-17b-128e-instruct"
 
 
+class LLMCachePolicy(str, Enum):
+    """How a task uses the LLM response cache."""
+    OFF = "off"
+    USE = "use"
+    REFRESH = "refresh"
+
+
 class ProxyCountryCode(str, Enum):
     """Supported proxy country codes."""
     US = "us"
@@ -1,6 +1,6 @@
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
-from .enums import LLMModel, ProxyCountryCode
+from .enums import LLMCachePolicy, LLMModel, ProxyCountryCode
 
 
 class RunTaskRequest(BaseModel):
@@ -11,6 +11,8 @@ class RunTaskRequest(BaseModel):
     save_browser_data: Optional[bool] = Field(False, description="If set to True, the browser cookies and other data will be saved")
     structured_output_json: Optional[str] = Field(None, description="JSON schema for structured output")
     llm_model: Optional[LLMModel] = Field(None, description="LLM model to use")
+    cache_policy: Optional[LLMCachePolicy] = Field(None, description="LLM response cache use: off, use (read and write) or refresh (write only), defaults to the server's LLM_CACHE_POLICY")
+    replay_task_id: Optional[str] = Field(None, description="ID of a successful task whose recorded actions are replayed without LLM calls, the agent takes over where the page diverges")
     use_adblock: Optional[bool] = Field(True, description="If set to True, the agent will use an adblocker")
     use_proxy: Optional[bool] = Field(True, description="If set to True, the agent will use a proxy")
     proxy_country_code: Optional[ProxyCountryCode] = Field(ProxyCountryCode.US, description="Country code for residential proxy")
@@ -19,10 +21,27 @@ class RunTaskRequest(BaseModel):
     browser_viewport_width: Optional[int] = Field(1280, description="Width of the browser viewport in pixels")
     browser_viewport_height: Optional[int] = Field(960, description="Height of the browser viewport in pixels")
     max_agent_steps: Optional[int] = Field(75, description="Maximum number of agent steps to take")
+    timeout_seconds: Optional[int] = Field(None, ge=1, description="Wall-clock limit for the task in seconds, defaults to the server's TASK_TIMEOUT")
     enable_public_share: Optional[bool] = Field(False, description="Enable public sharing of the task")
+    priority: Optional[int] = Field(0, ge=0, le=9, description="Scheduling priority, higher values are dispatched first")
+    idempotency_key: Optional[str] = Field(None, max_length=255, description="Client supplied key, retried requests with the same key return the original task")
 
 
 class UploadFileRequest(BaseModel):
     """Request model for file upload presigned URL."""
     file_name: str = Field(..., description="Name of the file to upload")
     content_type: str = Field(..., description="Content type of the file to upload")
+
+
+class UploadCheckRequest(UploadFileRequest):
+    """Request model for checking whether a file is already stored before uploading it."""
+    sha256: str = Field(..., pattern="^[0-9a-fA-F]{64}$", description="SHA-256 of the file content")
+
+
+class UploadProofRequest(BaseModel):
+    """Request model for proving a client has a stored file's content."""
+    proof: str = Field(
+        ...,
+        pattern="^[0-9a-fA-F]{64}$",
+        description="SHA-256 of the challenge nonce followed by the challenged bytes of the file"
+    )
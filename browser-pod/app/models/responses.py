@@ -7,6 +7,28 @@ from .enums import TaskStatusEnum
 class TaskCreatedResponse(BaseModel):
     """Response model for task creation."""
     id: str = Field(..., description="Task ID")
+    queue_position: int = Field(0, description="Position in the task queue, 0 once the task has been dispatched")
+
+
+class BatchCreatedResponse(BaseModel):
+    """Response model for batch task creation."""
+    id: str = Field(..., description="Batch ID")
+    task_ids: List[str] = Field(..., description="Task ID of each request in order, the original task for a repeated idempotency_key")
+    created: int = Field(..., description="Number of tasks created and queued by the batch")
+
+
+class BatchResponse(BaseModel):
+    """Response model for the aggregated progress of a batch."""
+    id: str = Field(..., description="Batch ID")
+    created_at: datetime = Field(..., description="Batch creation timestamp")
+    finished_at: Optional[datetime] = Field(None, description="Time the last task of the batch finished")
+    total: int = Field(..., description="Number of tasks created by the batch")
+    created: int = Field(..., description="Tasks waiting in the queue")
+    running: int = Field(..., description="Tasks currently executing")
+    paused: int = Field(..., description="Tasks paused")
+    finished: int = Field(..., description="Tasks completed successfully")
+    stopped: int = Field(..., description="Tasks stopped")
+    failed: int = Field(..., description="Tasks that failed")
 
 
 class TaskStepResponse(BaseModel):
@@ -37,6 +59,8 @@ class TaskResponse(BaseModel):
     user_uploaded_files: Optional[List[str]] = Field(None, description="List of user uploaded files")
     output_files: Optional[List[str]] = Field(None, description="List of output files generated")
     public_share_url: Optional[str] = Field(None, description="Public sharing URL")
+    queue_position: int = Field(0, description="Position in the task queue, 0 once the task has been dispatched")
+    batch_id: Optional[str] = Field(None, description="ID of the batch the task was submitted in")
 
 
 class TaskSimpleResponse(BaseModel):
@@ -57,6 +81,7 @@ class ListTasksResponse(BaseModel):
     page: int = Field(..., description="Current page number")
     limit: int = Field(..., description="Number of items per page")
     total_count: int = Field(..., description="Total number of tasks across all pages")
+    next_cursor: Optional[str] = Field(None, description="Task ID to pass as `after` to fetch the next page")
 
 
 class TaskMediaResponse(BaseModel):
@@ -67,6 +92,7 @@ class TaskMediaResponse(BaseModel):
 class TaskScreenshotsResponse(BaseModel):
     """Response model for task screenshots."""
     screenshots: Optional[List[str]] = Field(None, description="List of screenshot URLs")
+    thumbnails: Optional[List[str]] = Field(None, description="List of screenshot thumbnail URLs")
 
 
 class TaskGifResponse(BaseModel):
@@ -84,6 +110,77 @@ class UploadFileResponse(BaseModel):
     upload_url: str = Field(..., description="Presigned URL for uploading a file")
 
 
+class UploadChallengeResponse(BaseModel):
+    """Byte range of a file to hash to prove having its content."""
+    offset: int = Field(..., description="Offset of the first byte to hash")
+    length: int = Field(..., description="Number of bytes to hash")
+    nonce: str = Field(..., description="Prefix to hash before the bytes")
+    proof_url: str = Field(..., description="URL to send the proof to")
+
+
+class UploadCheckResponse(BaseModel):
+    """Response model for checking a file before upload."""
+    exists: bool = Field(..., description="Whether the content is already stored and can be linked by answering `challenge`")
+    file_name: str = Field(..., description="File name to use in `included_file_names`")
+    upload_url: str = Field(..., description="URL to upload the file to when it is not stored or the proof fails")
+    challenge: Optional[UploadChallengeResponse] = Field(None, description="Challenge proving the client has the content")
+
+
+class BrowserPoolStatsResponse(BaseModel):
+    """Response model for browser pool statistics."""
+    size: int = Field(..., description="Number of browsers kept warm")
+    idle: int = Field(..., description="Number of idle pre-launched browsers")
+    in_use: int = Field(..., description="Number of browsers leased to tasks")
+    hits: int = Field(..., description="Leases served by a warm browser")
+    misses: int = Field(..., description="Leases that had to launch a browser")
+    launches: int = Field(..., description="Total browsers launched")
+    recycled: int = Field(..., description="Browsers closed after reaching their task or memory limit, or failing a health check")
+    unhealthy: int = Field(..., description="Idle browsers that failed a health check")
+    parked: int = Field(..., description="Leased browsers frozen while their task is paused")
+    spilled: int = Field(..., description="Paused contexts whose pages were saved to disk and closed")
+    killed: int = Field(..., description="Browser processes killed after their browser failed to close")
+    orphans_killed: int = Field(..., description="Processes of browsers unknown to the pool killed by the orphan sweeper")
+    open_resources: int = Field(..., description="Task contexts and pages registered and not yet closed")
+    registered_resources: int = Field(..., description="Task contexts and pages registered for teardown")
+    closed_resources: int = Field(..., description="Task contexts and pages closed by teardown")
+    close_failures: int = Field(..., description="Task resources that raised while closing")
+    close_timeouts: int = Field(..., description="Task resources not closed within the teardown deadline")
+
+
+class TaskManagerStatsResponse(BaseModel):
+    """Response model for task manager statistics."""
+    tasks: int = Field(..., description="Number of task snapshots held in memory")
+    running: int = Field(..., description="Number of tasks currently executing")
+    lock_acquisitions: int = Field(..., description="Total task lock acquisitions")
+    lock_contentions: int = Field(..., description="Lock acquisitions that had to wait for another writer")
+    lock_wait_seconds: float = Field(..., description="Total time spent waiting for task locks")
+    evicted_tasks: int = Field(..., description="Finished tasks evicted from memory by the reaper")
+    deleted_tasks: int = Field(..., description="Evicted task summaries deleted after their retention")
+    event_channels: int = Field(..., description="Tasks with an open event stream channel")
+    event_subscribers: int = Field(..., description="Clients connected to task event streams")
+    timed_out_tasks: int = Field(..., description="Tasks failed by the watchdog for exceeding a time limit")
+
+
+class LLMModelStatsResponse(BaseModel):
+    """Response model for the routing statistics of one LLM model."""
+    model: str = Field(..., description="Model name")
+    provider: str = Field(..., description="Provider serving the model")
+    available: bool = Field(..., description="Whether the provider's API key is configured")
+    calls: int = Field(..., description="Calls routed to the model")
+    failures: int = Field(..., description="Calls to the model that failed")
+    p50_seconds: Optional[float] = Field(None, description="Median latency of recent calls")
+    p95_seconds: Optional[float] = Field(None, description="95th percentile latency of recent calls")
+
+
+class LLMStatsResponse(BaseModel):
+    """Response model for LLM client and routing statistics."""
+    models: List[LLMModelStatsResponse] = Field(..., description="Routing statistics per model")
+    clients: int = Field(..., description="Shared model clients")
+    in_flight: int = Field(..., description="Calls sent to providers")
+    waiting: int = Field(..., description="Calls waiting for a provider concurrency or rate limit")
+    throttled: int = Field(..., description="Calls delayed by a provider rate limit")
+
+
 class ValidationError(BaseModel):
     """Validation error model."""
     loc: List[Any] = Field(..., description="Location of the error")
@@ -1,5 +1,13 @@
 from fastapi import APIRouter
 
+from ..models.responses import BrowserPoolStatsResponse, LLMStatsResponse, TaskManagerStatsResponse
+from ..services.browser_pool import browser_pool
+from ..services.browser_service import browser_service
+from ..services.llm_registry import llm_registry
+from ..services.llm_router import llm_router
+from ..services.resource_tracker import resource_tracker
+from ..utils.task_manager import task_manager
+
 router = APIRouter(prefix="/api/v1", tags=["API v1.0"])
 
 
@@ -7,3 +15,21 @@ router = APIRouter(prefix="/api/v1", tags=["API v1.0"])
 async def ping():
     """Use this endpoint to check if the server is running and responding."""
     return {"status": "ok", "message": "pong"}
+
+
+@router.get("/browser-pool", response_model=BrowserPoolStatsResponse)
+async def browser_pool_stats():
+    """Returns occupancy, hit/miss and teardown statistics of the warm browser pool."""
+    return BrowserPoolStatsResponse(**browser_pool.stats(), **resource_tracker.stats())
+
+
+@router.get("/task-manager", response_model=TaskManagerStatsResponse)
+async def task_manager_stats():
+    """Returns task counts, lock contention, eviction and timeout statistics of the task manager."""
+    return TaskManagerStatsResponse(**task_manager.stats(), timed_out_tasks=browser_service.timed_out_tasks)
+
+
+@router.get("/llm", response_model=LLMStatsResponse)
+async def llm_stats():
+    """Returns the provider, availability and recent latency of each model, and shared client load."""
+    return LLMStatsResponse(models=llm_router.stats(), **llm_registry.stats())
@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..services.browser_pool import browser_pool
+from ..services.llm_cache import llm_cache
+from ..services.llm_registry import llm_registry
+from ..services.metrics import metrics
+from ..services.scheduler import task_scheduler
+from ..utils.task_manager import task_manager
+
+router = APIRouter(tags=["Monitoring"])
+
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+metrics.gauge("browser_pod_tasks_running", "Tasks holding a worker slot", lambda: task_scheduler.running_count)
+metrics.gauge("browser_pod_tasks_paused", "Paused tasks that gave up their worker slot", lambda: task_scheduler.parked_count)
+metrics.gauge("browser_pod_tasks_queued", "Tasks waiting for a worker slot", lambda: task_scheduler.queued_count)
+metrics.gauge("browser_pod_llm_calls_in_flight", "LLM calls sent to providers", lambda: llm_registry.stats()["in_flight"])
+metrics.gauge(
+    "browser_pod_llm_calls_waiting", "LLM calls waiting for a provider concurrency or rate limit",
+    lambda: llm_registry.stats()["waiting"]
+)
+metrics.gauge("browser_pod_llm_cache_entries", "LLM responses in the cache", lambda: llm_cache.stats()["entries"])
+metrics.gauge("browser_pod_browsers_idle", "Warm browsers waiting in the pool", lambda: browser_pool.stats()["idle"])
+metrics.gauge("browser_pod_browsers_in_use", "Browsers leased to tasks", lambda: browser_pool.stats()["in_use"])
+metrics.gauge("browser_pod_task_manager_tasks", "Tasks held in memory", lambda: task_manager.stats()["tasks"])
+metrics.gauge(
+    "browser_pod_task_manager_running", "Running tasks registered with the task manager",
+    lambda: task_manager.stats()["running"]
+)
+metrics.gauge(
+    "browser_pod_task_manager_event_subscribers", "Clients streaming task events",
+    lambda: task_manager.stats()["event_subscribers"]
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Returns queue, browser and LLM metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
@@ -1,44 +1,223 @@
-import asyncio
 import math
-from typing import Optional
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Path
-from fastapi.responses import FileResponse
+from pathlib import Path as PathType
+from typing import AsyncIterator, List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Path, Header, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import RedirectResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 
 from ..models.requests import RunTaskRequest
 from ..models.responses import (
-    TaskCreatedResponse, TaskResponse, TaskStatusEnum, 
+    BatchCreatedResponse, BatchResponse, TaskCreatedResponse, TaskResponse, TaskStatusEnum, 
     ListTasksResponse, TaskMediaResponse, TaskScreenshotsResponse,
     TaskGifResponse, TaskOutputFileResponse
 )
 from ..utils.task_manager import task_manager
 from ..services.browser_service import browser_service
+from ..services.media_service import media_service
+from ..services.replay_service import replay_service
+from ..services.screenshot_service import screenshot_service, screenshot_url, thumbnail_url
+from ..services.timeline_service import timeline_service
+from ..services.trace_service import TaskTrace, trace_service
+from ..services.scheduler import task_scheduler, QueueFullError
+from ..services.upload_service import upload_service
 from ..config import settings
 
 router = APIRouter(prefix="/api/v1", tags=["API v1.0"])
 
+# Validator of run-tasks JSON array bodies
+TASK_REQUESTS = TypeAdapter(List[RunTaskRequest])
+
 
 @router.post("/run-task", response_model=TaskCreatedResponse)
-async def run_task(request: RunTaskRequest, background_tasks: BackgroundTasks):
+async def run_task(request: RunTaskRequest):
     """
     Requires an active subscription. Returns the task ID that can be used to track progress.
+    Returns 429 with a `Retry-After` header when the task queue is full.
+    Requests repeating an `idempotency_key` return the original task without launching it again.
+    Every name in `included_file_names` must have been uploaded first.
+    A `replay_task_id` must name a task that finished successfully and saved its actions.
     """
-    # Create task
-    task_id = await task_manager.create_task(request.task)
+    if request.idempotency_key:
+        existing_id = await task_manager.get_task_id_by_idempotency_key(request.idempotency_key)
+        if existing_id:
+            return TaskCreatedResponse(id=existing_id, queue_position=task_scheduler.queue_position(existing_id))
+    
+    error = _check_request(request)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
-    # Start task execution in background
-    background_tasks.add_task(
-        browser_service.create_and_run_task,
-        task_id,
-        request
+    try:
+        task_scheduler.ensure_capacity()
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Task queue is full",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    # Create task
+    task_id = await task_manager.create_task(
+        request.task,
+        idempotency_key=request.idempotency_key,
+        user_uploaded_files=tuple(request.included_file_names or ())
     )
     
-    # Register the background task
-    task = asyncio.create_task(
-        browser_service.create_and_run_task(task_id, request)
+    # Queue task for execution, it starts as soon as a worker is free
+    queue_position = task_scheduler.submit(task_id, request)
+    
+    return TaskCreatedResponse(id=task_id, queue_position=queue_position)
+
+
+@router.post(
+    "/run-tasks",
+    response_model=BatchCreatedResponse,
+    # The body is parsed by hand to accept NDJSON, so describe it for the OpenAPI schema
+    openapi_extra={"requestBody": {"required": True, "content": {
+        media_type: {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/RunTaskRequest"}}}
+        for media_type in ("application/json", "application/x-ndjson")
+    }}}
+)
+async def run_tasks(request: Request):
+    """
+    Creates and queues many tasks at once from a JSON array of `run-task` requests, or from an
+    NDJSON stream (`Content-Type: application/x-ndjson`) with one request per line. All tasks are
+    created in a single bulk insert under a shared batch ID; follow their progress with
+    `/batch/{batch_id}`. The same checks as `run-task` apply to every request, and the whole
+    batch is rejected if one fails them. Batches of more than `MAX_BATCH_SIZE` tasks, or bodies
+    over `MAX_BATCH_BODY_SIZE` bytes, are rejected with 413 as soon as the limit is passed. A batch is admitted whenever `run-task` would be and then queued whole, even past
+    `MAX_QUEUED_TASKS`; while the queue is full, 429 is returned with a `Retry-After` header.
+    """
+    requests = await _read_task_requests(request)
+    if not requests:
+        raise HTTPException(status_code=400, detail="No tasks in request")
+    if len(requests) > settings.MAX_BATCH_SIZE:
+        raise _batch_too_large(len(requests))
+    for index, task_request in enumerate(requests):
+        error = _check_request(task_request)
+        if error:
+            raise HTTPException(status_code=400, detail=f"Task {index}: {error}")
+    
+    try:
+        task_scheduler.ensure_capacity()
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Task queue is full",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    batch, task_ids = await task_manager.create_batch([
+        {
+            "task": task_request.task,
+            "idempotency_key": task_request.idempotency_key,
+            "user_uploaded_files": tuple(task_request.included_file_names or ())
+        }
+        for task_request in requests
+    ])
+    
+    created = set(batch.task_ids)
+    task_scheduler.submit_many([
+        (task_id, task_request) for task_id, task_request in zip(task_ids, requests) if task_id in created
+    ])
+    
+    return BatchCreatedResponse(id=batch.id, task_ids=task_ids, created=len(batch.task_ids))
+
+
+@router.get("/batch/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: str = Path(..., description="Batch ID")):
+    """
+    Returns how many tasks of a batch are in each status. Batches are kept in memory until the
+    summaries of their tasks are deleted.
+    """
+    batch = task_manager.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    return BatchResponse(
+        id=batch.id,
+        created_at=batch.created_at,
+        finished_at=batch.finished_at,
+        total=len(batch.task_ids),
+        **{status.value: batch.status_counts[status] for status in TaskStatusEnum}
     )
-    await task_manager.register_running_task(task_id, task)
+
+
+def _check_request(request: RunTaskRequest) -> Optional[str]:
+    """Return why a task request cannot be run, or None if it can."""
+    missing = [name for name in request.included_file_names or () if not upload_service.resolve(name)]
+    if missing:
+        return f"Unknown files: {', '.join(missing)}"
+    if request.replay_task_id and not replay_service.is_valid_task_id(request.replay_task_id):
+        return f"Invalid replay_task_id: {request.replay_task_id}"
+    if request.replay_task_id and not replay_service.exists(request.replay_task_id):
+        return f"No replay script for task {request.replay_task_id}"
+    return None
+
+
+def _batch_too_large(count: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Batch of {count} tasks exceeds the limit of {settings.MAX_BATCH_SIZE} tasks"
+    )
+
+
+async def _read_batch_body(request: Request) -> AsyncIterator[bytes]:
+    """Yield the request body, rejecting it with 413 once it exceeds the batch body size limit."""
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Request body exceeds the limit of {settings.MAX_BATCH_BODY_SIZE} bytes"
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_BATCH_BODY_SIZE:
+        raise too_large
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > settings.MAX_BATCH_BODY_SIZE:
+            raise too_large
+        yield chunk
+
+
+async def _read_task_requests(request: Request) -> List[RunTaskRequest]:
+    """Parse a JSON array of task requests, or an NDJSON stream validated line by line as it arrives.
+
+    Bodies over the batch body size limit, and NDJSON streams with more lines than the
+    batch size limit, are rejected with 413 before the rest of the body is read.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" not in content_type and "jsonl" not in content_type:
+        body = bytearray()
+        async for chunk in _read_batch_body(request):
+            body += chunk
+        try:
+            return TASK_REQUESTS.validate_json(bytes(body))
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    
+    requests, errors, buffer = [], [], b""
+    count = 0
     
-    return TaskCreatedResponse(id=task_id)
+    def parse(line: bytes):
+        nonlocal count
+        if not line.strip():
+            return
+        count += 1
+        if count > settings.MAX_BATCH_SIZE:
+            raise _batch_too_large(count)
+        try:
+            requests.append(RunTaskRequest.model_validate_json(line))
+        except ValidationError as e:
+            errors.extend({**error, "loc": ("body", count - 1, *error["loc"])} for error in e.errors())
+    
+    async for chunk in _read_batch_body(request):
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            parse(line)
+    parse(buffer)
+    if errors:
+        raise RequestValidationError(errors)
+    return requests
 
 
 @router.put("/stop-task")
@@ -47,6 +226,7 @@ async def stop_task(task_id: str = Query(..., description="Task ID")):
     Stops a running browser automation task immediately. The task cannot be resumed after being stopped.
     Use `/pause-task` endpoint instead if you want to temporarily halt execution.
     """
+    task_scheduler.discard(task_id)
     success = await browser_service.stop_task(task_id)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found or not running")
@@ -64,6 +244,7 @@ async def pause_task(task_id: str = Query(..., description="Task ID")):
     if not success:
         raise HTTPException(status_code=404, detail="Task not found or not running")
     
+    task_scheduler.park(task_id)
     return {"status": "paused"}
 
 
@@ -77,6 +258,8 @@ async def resume_task(task_id: str = Query(..., description="Task ID")):
     if not success:
         raise HTTPException(status_code=404, detail="Task not found or not paused")
     
+    task_scheduler.unpark(task_id)
+    
     return {"status": "resumed"}
 
 
@@ -90,7 +273,9 @@ async def get_task(task_id: str = Path(..., description="Task ID")):
     if not task_data:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return task_manager.to_task_response(task_data)
+    response = task_manager.to_task_response(task_data)
+    response.queue_position = task_scheduler.queue_position(task_id)
+    return response
 
 
 @router.get("/task/{task_id}/status", response_model=TaskStatusEnum)
@@ -106,6 +291,35 @@ async def get_task_status(task_id: str = Path(..., description="Task ID")):
     return task_data.status
 
 
+@router.get("/task/{task_id}/events")
+async def get_task_events(
+    task_id: str = Path(..., description="Task ID"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID", description="ID of the last event received")
+):
+    """
+    Streams task progress as Server-Sent Events until the task finishes.
+    The stream starts with a `snapshot` event holding the full task, followed by `step`, `screenshot`,
+    `output` and `status` events as deltas, and ends with an `end` event.
+    Reconnecting with `Last-Event-ID` resumes with the missed events instead of a new snapshot.
+    """
+    if not await task_manager.get_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    async def snapshot():
+        task_data = await task_manager.get_task(task_id)
+        if not task_data:
+            return None
+        response = task_manager.to_task_response(task_data)
+        response.queue_position = task_scheduler.queue_position(task_id)
+        return response.model_dump(mode="json")
+    
+    return StreamingResponse(
+        task_manager.events.stream(task_id, snapshot, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/task/{task_id}/media", response_model=TaskMediaResponse)
 async def get_task_media(task_id: str = Path(..., description="Task ID")):
     """
@@ -128,21 +342,62 @@ async def get_task_screenshots(task_id: str = Path(..., description="Task ID")):
     if not task_data:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return TaskScreenshotsResponse(screenshots=task_data.screenshots)
+    return TaskScreenshotsResponse(
+        screenshots=[screenshot_url(screenshot) for screenshot in task_data.screenshots],
+        thumbnails=(
+            [thumbnail_url(screenshot) for screenshot in task_data.screenshots]
+            if screenshot_service.thumbnail_width else None
+        )
+    )
 
 
 @router.get("/task/{task_id}/gif", response_model=TaskGifResponse)
-async def get_task_gif(task_id: str = Path(..., description="Task ID")):
+async def get_task_gif(
+    task_id: str = Path(..., description="Task ID"),
+    format: Literal["gif", "webp"] = Query("gif", description="Animation format")
+):
     """
     Returns a gif url generated from the screenshots of the task execution.
-    Only available for completed tasks that have screenshots.
+    Running tasks get an animation of the screenshots taken so far.
     """
     task_data = await task_manager.get_task(task_id)
     if not task_data:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # For now, return None as GIF generation is not implemented
-    return TaskGifResponse(gif=None)
+    screenshots = [screenshot_service.path(screenshot) for screenshot in task_data.screenshots]
+    timeline = await timeline_service.timeline(task_id, screenshots, format)
+    if timeline is None:
+        return TaskGifResponse(gif=None)
+    return TaskGifResponse(gif=f"/api/v1/download/timeline/{task_id}/{timeline.name}")
+
+
+@router.get("/task/{task_id}/trace")
+async def get_task_trace(task_id: str = Path(..., description="Task ID")):
+    """
+    Returns the execution timeline of a task in the Chrome trace event format, loadable in
+    Perfetto or chrome://tracing. Spans cover browser launch, agent creation, each step with its
+    browser state, LLM and action phases, and screenshot persistence. Tasks that have not started,
+    or whose trace was dropped to make room for newer tasks, return an empty trace.
+    """
+    task_data = await task_manager.get_task(task_id)
+    if not task_data:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    trace = trace_service.get(task_id) or TaskTrace(task_id, 0)
+    return trace.to_chrome_trace()
+
+
+@router.get("/task/{task_id}/script")
+async def get_task_script(task_id: str = Path(..., description="Task ID")):
+    """
+    Returns the actions recorded from a successful task, step by step with the page URL each
+    step started on and the element each action interacted with. Pass the task ID as
+    `replay_task_id` to `run-task` to replay them without LLM calls.
+    """
+    script = await replay_service.load(task_id)
+    if script is None:
+        raise HTTPException(status_code=404, detail="Script not found")
+    return script
 
 
 @router.get("/task/{task_id}/output-file/{file_name}", response_model=TaskOutputFileResponse)
@@ -174,14 +429,19 @@ async def get_task_output_file(
 @router.get("/tasks", response_model=ListTasksResponse)
 async def list_tasks(
     page: int = Query(1, ge=1, description="Page number"),
-    limit: int = Query(10, ge=1, le=100, description="Items per page")
+    limit: int = Query(10, ge=1, le=100, description="Items per page"),
+    status: Optional[TaskStatusEnum] = Query(None, description="Only return tasks with this status"),
+    after: Optional[str] = Query(None, description="Cursor: return tasks created before this task ID, overrides page")
 ):
     """
     Returns a paginated list of all tasks belonging to the user, ordered by creation date.
     Each task includes basic information like status and creation time. For detailed task info, 
     use the get task endpoint.
     """
-    tasks, total_count = await task_manager.list_tasks(page=page, limit=limit)
+    if after and not await task_manager.get_task(after):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    tasks, total_count = await task_manager.list_tasks(page=page, limit=limit, status=status, after=after)
     
     total_pages = math.ceil(total_count / limit) if total_count > 0 else 1
     
@@ -192,7 +452,8 @@ async def list_tasks(
         total_pages=total_pages,
         page=page,
         limit=limit,
-        total_count=total_count
+        total_count=total_count,
+        next_cursor=tasks[-1].id if len(tasks) == limit else None
     )
 
 
@@ -206,16 +467,48 @@ async def delete_browser_profile_for_user():
     return {"status": "deleted"}
 
 
-# Helper endpoint for file downloads (not in OpenAPI spec but needed for local development)
-@router.get("/download/output/{task_id}/{file_name}")
-async def download_output_file(task_id: str, file_name: str):
-    """Download output file directly."""
-    file_path = settings.OUTPUTS_PATH / task_id / file_name
-    if not file_path.exists():
+def _task_file(base: PathType, task_id: str, file_name: str) -> PathType:
+    """Resolve a file stored for a task, rejecting names that leave its directory."""
+    file_path = base / task_id / file_name
+    if PathType(task_id).name != task_id or PathType(file_name).name != file_name or not file_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(
-        path=str(file_path),
-        filename=file_name,
-        media_type='application/octet-stream'
-    )
+    return file_path
+
+
+# Helper endpoints for file downloads (not in OpenAPI spec but needed for local development)
+@router.get("/download/output/{task_id}/{file_name}")
+async def download_output_file(task_id: str, file_name: str, request: Request):
+    """Download output file directly, supporting `Range` and conditional requests."""
+    file_path = _task_file(settings.OUTPUTS_PATH, task_id, file_name)
+    return await media_service.response(request, file_path, filename=file_name)
+
+
+@router.get("/download/recording/{task_id}/{file_name}")
+async def download_recording(task_id: str, file_name: str, request: Request):
+    """Download a task recording, supporting `Range` so players can seek."""
+    file_path = _task_file(settings.RECORDINGS_PATH, task_id, file_name)
+    return await media_service.response(request, file_path, filename=file_name)
+
+
+@router.get("/screenshots/{task_id}/{file_name}")
+async def download_screenshot(task_id: str, file_name: str, request: Request):
+    """Download a screenshot or thumbnail; they never change, so clients may cache them for good."""
+    file_path = _task_file(screenshot_service.screenshots_path, task_id, file_name)
+    return await media_service.response(request, file_path, immutable=True)
+
+
+@router.get("/download/timeline/{task_id}/{file_name}")
+async def download_timeline(task_id: str, file_name: str, request: Request):
+    """Download a screenshot timeline built by the gif endpoint.
+
+    Links to a timeline replaced since the task took more screenshots
+    redirect to the newest one.
+    """
+    try:
+        file_path = _task_file(settings.TIMELINES_PATH, task_id, file_name)
+    except HTTPException:
+        latest = timeline_service.latest(task_id, file_name)
+        if latest is None:
+            raise
+        return RedirectResponse(f"/api/v1/download/timeline/{task_id}/{latest.name}", status_code=307)
+    return await media_service.response(request, file_path, filename=file_name)
@@ -1,15 +1,25 @@
-import os
+import re
 import uuid
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Header, Request, Response
 from fastapi.responses import JSONResponse
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
 
-from ..models.requests import UploadFileRequest
-from ..models.responses import UploadFileResponse
+from ..models.requests import UploadFileRequest, UploadCheckRequest, UploadProofRequest
+from ..models.responses import UploadFileResponse, UploadCheckResponse, UploadChallengeResponse
+from ..services.media_service import media_service
+from ..services.upload_service import upload_service, UploadError, UploadOffsetError, UploadTooLargeError
 from ..config import settings
 
 router = APIRouter(prefix="/api/v1", tags=["API v1.0"])
 
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+# Allowance for multipart boundaries and headers when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
 
 @router.post("/uploads/presigned-url", response_model=UploadFileResponse)
 async def upload_file_presigned_url(request: UploadFileRequest):
@@ -18,6 +28,61 @@ async def upload_file_presigned_url(request: UploadFileRequest):
     After uploading a file, the user can use the `included_file_names` field
     in the `RunTaskRequest` to include the files in the task.
     """
+    unique_filename = _unique_filename(request)
+    
+    # For local development, return a direct upload URL
+    # In production, you would generate a presigned URL to cloud storage
+    upload_url = f"/api/v1/upload/{unique_filename}"
+    
+    return UploadFileResponse(upload_url=upload_url)
+
+
+@router.post("/uploads/check", response_model=UploadCheckResponse)
+async def check_upload(request: UploadCheckRequest):
+    """
+    Checks by SHA-256 whether a file's content is already stored, before uploading it.
+    If it is, `challenge` names a byte range of the file: send the SHA-256 of `nonce`
+    followed by those bytes to `proof_url`, and the returned `file_name` can then be used
+    in `included_file_names` without uploading. Otherwise the file should be uploaded to
+    `upload_url`.
+    """
+    unique_filename = _unique_filename(request)
+    upload_url = f"/api/v1/upload/{unique_filename}"
+    challenge = upload_service.challenge(request.sha256, unique_filename)
+    if challenge is None:
+        return UploadCheckResponse(exists=False, file_name=unique_filename, upload_url=upload_url)
+    
+    return UploadCheckResponse(
+        exists=True,
+        file_name=unique_filename,
+        upload_url=upload_url,
+        challenge=UploadChallengeResponse(
+            offset=challenge.offset,
+            length=challenge.length,
+            nonce=challenge.nonce,
+            proof_url=f"/api/v1/uploads/check/{unique_filename}"
+        )
+    )
+
+
+@router.post("/uploads/check/{file_name}")
+async def prove_upload(file_name: str, request: UploadProofRequest):
+    """
+    Links `file_name` to stored content once the client proved having it by answering
+    the challenge of `POST /uploads/check`. A challenge can be answered once; on 403
+    the file must be uploaded instead.
+    """
+    try:
+        linked = await upload_service.link_proven(file_name, request.proof)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not linked:
+        raise HTTPException(status_code=403, detail="Proof does not match the stored file")
+    return {"status": "uploaded", "filename": file_name}
+
+
+def _unique_filename(request: UploadFileRequest) -> str:
+    """Validate the content type and generate a unique file name keeping the extension."""
     # Validate content type
     if request.content_type not in settings.ALLOWED_FILE_TYPES:
         raise HTTPException(
@@ -28,52 +93,167 @@ async def upload_file_presigned_url(request: UploadFileRequest):
     # Generate unique file ID to avoid conflicts
     file_id = str(uuid.uuid4())
     file_extension = Path(request.file_name).suffix
-    unique_filename = f"{file_id}{file_extension}"
+    return f"{file_id}{file_extension}"
+
+
+def _parse_content_range(content_range: str) -> Tuple[int, int, Optional[int]]:
+    """Parse a `bytes start-end/total` Content-Range header, total may be `*`."""
+    match = CONTENT_RANGE.fullmatch(content_range.strip())
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range header")
+    start, end, total = match.groups()
+    start, end = int(start), int(end)
+    if end < start:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range header")
+    return start, end, None if total == "*" else int(total)
+
+
+async def _multipart_chunks(request: Request) -> AsyncIterator[bytes]:
+    """Yield the `file` field of a multipart body as it arrives, without spooling the body to disk."""
+    _, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Missing multipart boundary")
     
-    # For local development, return a direct upload URL
-    # In production, you would generate a presigned URL to cloud storage
-    upload_url = f"/api/v1/upload/{unique_filename}"
+    part = {"header": b"", "value": b"", "disposition": b"", "is_file": False}
+    received: List[bytes] = []
+    found = False
     
-    return UploadFileResponse(upload_url=upload_url)
+    def on_part_begin():
+        part.update(header=b"", value=b"", disposition=b"", is_file=False)
+    
+    def on_header_field(data: bytes, start: int, end: int):
+        part["header"] += data[start:end]
+    
+    def on_header_value(data: bytes, start: int, end: int):
+        part["value"] += data[start:end]
+    
+    def on_header_end():
+        if part["header"].lower() == b"content-disposition":
+            part["disposition"] = part["value"]
+        part.update(header=b"", value=b"")
+    
+    def on_headers_finished():
+        _, params = parse_options_header(part["disposition"])
+        part["is_file"] = not found and params.get(b"name") == b"file"
+    
+    def on_part_data(data: bytes, start: int, end: int):
+        if part["is_file"]:
+            received.append(data[start:end])
+    
+    def on_part_end():
+        nonlocal found
+        found = found or part["is_file"]
+        part["is_file"] = False
+    
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for data in received:
+                yield data
+            received.clear()
+            if found:
+                break
+        else:
+            parser.finalize()
+    except FormParserError:
+        raise HTTPException(status_code=400, detail="Invalid multipart body")
+    if not found:
+        raise HTTPException(status_code=400, detail="Missing file field")
 
 
-@router.put("/upload/{filename}")
-async def upload_file_direct(filename: str, file: UploadFile = File(...)):
+@router.put(
+    "/upload/{filename}",
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"]
+                    }
+                }
+            },
+            "required": True
+        }
+    }
+)
+async def upload_file_direct(
+    filename: str,
+    request: Request,
+    content_range: Optional[str] = Header(None, description="`bytes start-end/total` to upload a file in parts"),
+    checksum: Optional[str] = Header(None, alias="X-Checksum-SHA256", description="Expected SHA-256 of the whole file")
+):
     """
     Direct file upload endpoint for local development.
     In production, this would be handled by cloud storage with presigned URLs.
+    
+    Send the file as the raw request body, or as the `file` field of a multipart form.
+    Both are streamed to disk and rejected with 413 as soon as they exceed the size limit.
+    Large files can be sent in parts with `Content-Range` headers; incomplete parts return 202 and
+    `HEAD` on the same URL reports the stored offset in `Upload-Offset` to resume from.
     """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > upload_service.max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=str(UploadTooLargeError(upload_service.max_size)))
+    
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        if content_range:
+            raise HTTPException(status_code=400, detail="Content-Range uploads must send the raw file as the body")
+        chunks = _multipart_chunks(request)
+    else:
+        chunks = request.stream()
+    
+    try:
+        if content_range:
+            start, end, total = _parse_content_range(content_range)
+            result = await upload_service.write_range(filename, chunks, start, end, total, checksum)
+        else:
+            result = await upload_service.write(filename, chunks, checksum)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not result.complete:
+        return JSONResponse(
+            status_code=202,
+            content={"status": "partial", "filename": filename, "received": result.size},
+            headers={"Upload-Offset": str(result.size)}
+        )
+    
+    return {"status": "uploaded", "filename": filename, "size": result.size, "sha256": result.sha256}
+
+
+@router.head("/upload/{filename}")
+async def get_upload_offset(filename: str):
+    """Reports in `Upload-Offset` how many bytes of a resumable upload have been stored."""
     try:
-        # Validate file size
-        file_content = await file.read()
-        if len(file_content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File too large. Maximum size is {settings.MAX_FILE_SIZE // (1024*1024)}MB"
-            )
-        
-        # Save file to uploads directory
-        file_path = settings.UPLOADS_PATH / filename
-        
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
-        return {"status": "uploaded", "filename": filename}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+        offset = upload_service.received(filename)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(headers={"Upload-Offset": str(offset)})
 
 
 @router.get("/uploads/{filename}")
-async def get_uploaded_file(filename: str):
-    """Get an uploaded file."""
-    file_path = settings.UPLOADS_PATH / filename
-    if not file_path.exists():
+async def get_uploaded_file(filename: str, request: Request):
+    """Get an uploaded file, supporting `Range` and conditional requests."""
+    file_path = upload_service.resolve(filename)
+    if not file_path:
         raise HTTPException(status_code=404, detail="File not found")
     
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        path=str(file_path),
-        filename=filename,
-        media_type='application/octet-stream'
-    )
+    return await media_service.response(request, file_path, filename=filename)
@@ -0,0 +1,472 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import psutil
+
+from ..config import settings
+from .metrics import metrics
+
+
+# Extra Chromium switch used to recognise processes launched by the pool
+BROWSER_ID_ARG = "--browser-pod-id="
+
+# Extra Chromium switch naming the server process that launched a browser
+BROWSER_OWNER_ARG = "--browser-pod-owner="
+
+
+def process_owner_id(proc: psutil.Process) -> str:
+    """Identify a process by PID and start time, so a reused PID is not mistaken for it."""
+    return f"{proc.pid}-{proc.create_time():.3f}"
+
+
+def is_owner_alive(owner: str) -> bool:
+    """Check whether the server process a browser was tagged with is still running."""
+    pid, _, _ = owner.partition("-")
+    if not pid.isdigit():
+        return False
+    try:
+        return process_owner_id(psutil.Process(int(pid))) == owner
+    except psutil.NoSuchProcess:
+        return False
+    except psutil.AccessDenied:
+        return True
+
+
+@dataclass
+class PooledBrowser:
+    """A browser process owned by the pool."""
+    id: str
+    browser: Any
+    launched_at: datetime
+    tasks_served: int = 0
+
+
+@dataclass
+class BrowserLease:
+    """A fresh browser context on a pooled browser, handed out to one task."""
+    browser: PooledBrowser
+    context: Any
+    hit: bool
+    parked: bool = False
+    spilled_to: Optional[Path] = None
+
+
+class ChromiumBrowserFactory:
+    """Launches Chromium through Playwright for the browser pool."""
+
+    def __init__(self):
+        self._playwright = None
+
+    @property
+    def owner(self) -> str:
+        """Tag of the current server process, read on use so forked workers get their own."""
+        return process_owner_id(psutil.Process(os.getpid()))
+
+    async def launch(self, browser_id: str) -> Any:
+        """Launch a new browser tagged with the pool browser ID and this server process."""
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+
+        return await self._playwright.chromium.launch(
+            headless=settings.BROWSER_HEADLESS,
+            timeout=settings.BROWSER_TIMEOUT,
+            args=[f"{BROWSER_ID_ARG}{browser_id}", f"{BROWSER_OWNER_ARG}{self.owner}"]
+        )
+
+    async def new_context(self, browser: Any, **options) -> Any:
+        """Create an isolated browser context."""
+        return await browser.new_context(**options)
+
+    async def is_healthy(self, browser: Any) -> bool:
+        """Check that the browser is connected and can open a context."""
+        if not browser.is_connected():
+            return False
+        try:
+            context = await asyncio.wait_for(browser.new_context(), timeout=settings.BROWSER_TIMEOUT / 1000)
+            await context.close()
+            return True
+        except Exception:
+            return False
+
+    def memory_usage(self, browser_id: str) -> int:
+        """Return the resident memory in bytes of a browser and its child processes."""
+        total = 0
+        for proc in self._processes(lambda found, owner: found == browser_id):
+            try:
+                total += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total
+
+    def kill(self, browser_id: str) -> int:
+        """Kill the processes of a browser that could not be closed, returning how many were killed."""
+        return self._kill(self._processes(lambda found, owner: found == browser_id))
+
+    def kill_orphans(self, known_ids: Set[str]) -> int:
+        """Kill processes of pool browsers that are no longer known, e.g. from a previous run.
+
+        Browsers launched by another server process on the same host, such as
+        another worker, are only killed once that process has exited.
+        """
+        def is_orphan(found: str, owner: Optional[str]) -> bool:
+            if owner == self.owner:
+                return found not in known_ids
+            return owner is not None and not is_owner_alive(owner)
+
+        return self._kill(self._processes(is_orphan))
+
+    def watch_pages(self, context: Any, callback: Callable[[Any], None]):
+        """Call ``callback`` with every page opened in a context."""
+        context.on("page", callback)
+
+    async def freeze(self, context: Any):
+        """Freeze every page of a context so it stops using CPU."""
+        await self._set_lifecycle_state(context, "frozen")
+
+    async def thaw(self, context: Any):
+        """Let the pages of a frozen context run again."""
+        await self._set_lifecycle_state(context, "active")
+
+    async def spill(self, context: Any, path: Path):
+        """Save a context's storage state and open pages to a file, then close the pages."""
+        state = await context.storage_state()
+        state["pages"] = [page.url for page in context.pages]
+        await asyncio.to_thread(path.write_text, json.dumps(state))
+        for page in list(context.pages):
+            await page.close()
+
+    async def restore(self, context: Any, path: Path):
+        """Reopen the pages of a spilled context; its cookies and storage never left it."""
+        state = json.loads(await asyncio.to_thread(path.read_text))
+        for url in state.get("pages", []):
+            page = await context.new_page()
+            await page.goto(url)
+
+    async def close(self, browser: Any):
+        """Close a browser."""
+        await browser.close()
+
+    @staticmethod
+    def _processes(matches: Callable[[str, Optional[str]], bool]) -> List[psutil.Process]:
+        """Find the processes, children included, of pool browsers whose ID and owner match."""
+        processes = {}
+        for proc in psutil.process_iter(["cmdline"]):
+            try:
+                args = proc.info["cmdline"] or []
+                browser_id = next((arg[len(BROWSER_ID_ARG):] for arg in args if arg.startswith(BROWSER_ID_ARG)), None)
+                if browser_id is None:
+                    continue
+                owner = next((arg[len(BROWSER_OWNER_ARG):] for arg in args if arg.startswith(BROWSER_OWNER_ARG)), None)
+                if matches(browser_id, owner):
+                    processes[proc.pid] = proc
+                    for child in proc.children(recursive=True):
+                        processes[child.pid] = child
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return list(processes.values())
+
+    @staticmethod
+    def _kill(processes: List[psutil.Process]) -> int:
+        killed = 0
+        for proc in processes:
+            try:
+                proc.kill()
+                killed += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return killed
+
+    @staticmethod
+    async def _set_lifecycle_state(context: Any, state: str):
+        for page in context.pages:
+            session = await context.new_cdp_session(page)
+            try:
+                await session.send("Page.setWebLifecycleState", {"state": state})
+            finally:
+                await session.detach()
+
+
+class BrowserPool:
+    """Pool of pre-launched browsers handing out fresh contexts per task.
+
+    The factory launches browsers and contexts; anything implementing the
+    ChromiumBrowserFactory methods can be used, which is how tests avoid
+    starting Chromium. Browsers are recycled after ``max_tasks`` leases or
+    once their memory exceeds ``max_memory_mb``.
+
+    Closing a context or browser is bounded by ``teardown_timeout``; a
+    browser that does not close in time, or whose context fails to, has its
+    processes killed. Chromium processes tagged with an ID the pool no
+    longer knows are killed every ``orphan_sweep_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        factory: Optional[Any] = None,
+        size: Optional[int] = None,
+        max_tasks: Optional[int] = None,
+        max_memory_mb: Optional[int] = None,
+        health_check_interval: Optional[int] = None,
+        teardown_timeout: Optional[float] = None,
+        orphan_sweep_interval: Optional[int] = None
+    ):
+        self.factory = factory or ChromiumBrowserFactory()
+        self.size = size if size is not None else settings.BROWSER_POOL_SIZE
+        self.max_tasks = max_tasks if max_tasks is not None else settings.BROWSER_POOL_MAX_TASKS
+        self.max_memory_mb = max_memory_mb if max_memory_mb is not None else settings.BROWSER_POOL_MAX_MEMORY_MB
+        self.health_check_interval = (
+            health_check_interval if health_check_interval is not None
+            else settings.BROWSER_POOL_HEALTH_CHECK_INTERVAL
+        )
+        self.teardown_timeout = teardown_timeout if teardown_timeout is not None else settings.TEARDOWN_TIMEOUT
+        self.orphan_sweep_interval = (
+            orphan_sweep_interval if orphan_sweep_interval is not None
+            else settings.BROWSER_ORPHAN_SWEEP_INTERVAL
+        )
+        self._idle: List[PooledBrowser] = []
+        self._in_use: Dict[str, PooledBrowser] = {}
+        self._launching: Set[str] = set()
+        self._health_check_task: Optional[asyncio.Task] = None
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.launches = 0
+        self.recycled = 0
+        self.unhealthy = 0
+        self.parked = 0
+        self.spilled = 0
+        self.killed = 0
+        self.orphans_killed = 0
+
+    async def start(self):
+        """Kill browsers left over from a previous run, pre-launch browsers and start the maintenance loops."""
+        await self.sweep_orphans()
+        await self._fill()
+        if self.health_check_interval > 0:
+            self._health_check_task = asyncio.create_task(self._health_check_loop())
+        if self.orphan_sweep_interval > 0:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        """Stop the maintenance loops and close every browser."""
+        if self._health_check_task:
+            self._health_check_task.cancel()
+            self._health_check_task = None
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+
+        browsers = self._idle + list(self._in_use.values())
+        self._idle = []
+        self._in_use = {}
+        for pooled in browsers:
+            await self._close_browser(pooled)
+
+    async def acquire(self, **context_options) -> BrowserLease:
+        """Lease a fresh context, reusing an idle browser when one is available."""
+        hit = bool(self._idle)
+        if hit:
+            pooled = self._idle.pop()
+            self.hits += 1
+        else:
+            pooled = await self._launch()
+            self.misses += 1
+
+        self._in_use[pooled.id] = pooled
+        try:
+            context = await self.factory.new_context(pooled.browser, **context_options)
+        except Exception:
+            self._in_use.pop(pooled.id, None)
+            await self._close_browser(pooled)
+            raise
+
+        pooled.tasks_served += 1
+        return BrowserLease(browser=pooled, context=context, hit=hit)
+
+    async def release(self, lease: BrowserLease):
+        """Close a leased context and return its browser to the pool or recycle it."""
+        pooled = lease.browser
+        if lease.parked:
+            lease.parked = False
+            self.parked -= 1
+        if lease.spilled_to is not None:
+            await asyncio.to_thread(lease.spilled_to.unlink, missing_ok=True)
+        try:
+            await asyncio.wait_for(lease.context.close(), timeout=self.teardown_timeout)
+            closed = True
+        except Exception as e:
+            print(f"Browser pool failed to close a context of browser {pooled.id}: {e!r}")
+            closed = False
+
+        if self._in_use.pop(pooled.id, None) is None:
+            return
+
+        if not closed:
+            # The browser may still hold the task's pages, it cannot be reused
+            self.recycled += 1
+            await self._close_browser(pooled)
+            await self._fill()
+        elif await self._needs_recycling(pooled):
+            await self._recycle(pooled)
+        elif len(self._idle) >= self.size:
+            await self._close_browser(pooled)
+        else:
+            self._idle.append(pooled)
+
+    def watch_pages(self, lease: BrowserLease, callback: Callable[[Any], None]):
+        """Call ``callback`` with every page opened in a leased context."""
+        self.factory.watch_pages(lease.context, callback)
+
+    async def park(self, lease: BrowserLease):
+        """Freeze the pages of a paused task's context so the browser stops using CPU."""
+        if lease.parked:
+            return
+        lease.parked = True
+        self.parked += 1
+        await self._bounded(self.factory.freeze(lease.context), "freeze")
+
+    async def spill(self, lease: BrowserLease, path: Path):
+        """Save a parked context to a file and close its pages to release their renderers."""
+        if not lease.parked or lease.spilled_to is not None:
+            return
+        if await self._bounded(self.factory.spill(lease.context, path), "spill"):
+            lease.spilled_to = path
+            self.spilled += 1
+
+    async def unpark(self, lease: BrowserLease):
+        """Reopen spilled pages and let a parked context run again."""
+        if not lease.parked:
+            return
+        if lease.spilled_to is not None:
+            await self._bounded(self.factory.restore(lease.context, lease.spilled_to), "restore")
+            await asyncio.to_thread(lease.spilled_to.unlink, missing_ok=True)
+            lease.spilled_to = None
+        else:
+            await self._bounded(self.factory.thaw(lease.context), "thaw")
+        lease.parked = False
+        self.parked -= 1
+
+    async def check_health(self):
+        """Replace idle browsers that are unresponsive or over the memory limit."""
+        for pooled in list(self._idle):
+            healthy = await self.factory.is_healthy(pooled.browser)
+            if healthy and not await self._over_memory_limit(pooled):
+                continue
+            if pooled not in self._idle:
+                continue
+            self._idle.remove(pooled)
+            if not healthy:
+                self.unhealthy += 1
+            await self._recycle(pooled)
+
+    async def sweep_orphans(self) -> int:
+        """Kill processes of pool browsers that are neither idle, leased nor launching."""
+        known = {pooled.id for pooled in self._idle} | set(self._in_use) | self._launching
+        killed = await asyncio.to_thread(self.factory.kill_orphans, known)
+        if killed:
+            print(f"Browser pool killed {killed} orphaned browser processes")
+        self.orphans_killed += killed
+        return killed
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool occupancy and hit/miss counters."""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": len(self._in_use),
+            "hits": self.hits,
+            "misses": self.misses,
+            "launches": self.launches,
+            "recycled": self.recycled,
+            "unhealthy": self.unhealthy,
+            "parked": self.parked,
+            "spilled": self.spilled,
+            "killed": self.killed,
+            "orphans_killed": self.orphans_killed
+        }
+
+    async def _launch(self) -> PooledBrowser:
+        """Launch a new browser."""
+        browser_id = str(uuid.uuid4())
+        self._launching.add(browser_id)
+        start = time.perf_counter()
+        try:
+            browser = await self.factory.launch(browser_id)
+        finally:
+            self._launching.discard(browser_id)
+        metrics.browser_launch.observe(time.perf_counter() - start)
+        self.launches += 1
+        return PooledBrowser(id=browser_id, browser=browser, launched_at=datetime.utcnow())
+
+    async def _fill(self):
+        """Launch idle browsers until the pool is at its configured size."""
+        while len(self._idle) < self.size:
+            try:
+                self._idle.append(await self._launch())
+            except Exception as e:
+                print(f"Browser pool failed to launch browser: {e}")
+                return
+
+    async def _recycle(self, pooled: PooledBrowser):
+        """Close a browser and launch a replacement if the pool is short."""
+        self.recycled += 1
+        await self._close_browser(pooled)
+        await self._fill()
+
+    async def _needs_recycling(self, pooled: PooledBrowser) -> bool:
+        """Check whether a browser has served too many tasks or uses too much memory."""
+        if pooled.tasks_served >= self.max_tasks:
+            return True
+        return await self._over_memory_limit(pooled)
+
+    async def _over_memory_limit(self, pooled: PooledBrowser) -> bool:
+        """Check a browser's resident memory against the configured limit."""
+        memory = await asyncio.to_thread(self.factory.memory_usage, pooled.id)
+        return memory > self.max_memory_mb * 1024 * 1024
+
+    async def _bounded(self, operation, name: str) -> bool:
+        """Run a best-effort browser operation within the browser timeout, reporting success."""
+        try:
+            await asyncio.wait_for(operation, timeout=settings.BROWSER_TIMEOUT / 1000)
+            return True
+        except Exception as e:
+            print(f"Browser pool failed to {name} a context: {e}")
+            return False
+
+    async def _close_browser(self, pooled: PooledBrowser):
+        """Close a browser, killing its processes if it does not close in time."""
+        try:
+            await asyncio.wait_for(self.factory.close(pooled.browser), timeout=self.teardown_timeout)
+        except Exception:
+            # Timed out or failed, whatever is still running is killed
+            self.killed += await asyncio.to_thread(self.factory.kill, pooled.id)
+
+    async def _sweep_loop(self):
+        """Periodically kill orphaned browser processes."""
+        while True:
+            await asyncio.sleep(self.orphan_sweep_interval)
+            try:
+                await self.sweep_orphans()
+            except Exception as e:
+                print(f"Browser pool orphan sweep failed: {e}")
+
+    async def _health_check_loop(self):
+        """Periodically health check idle browsers."""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"Browser pool health check failed: {e}")
+
+
+# Global browser pool instance
+browser_pool = BrowserPool()
@@ -1,16 +1,27 @@
 import asyncio
 import json
 import os
+import time
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
-from browser_use import Agent
+from browser_use import Agent, BrowserProfile
 
 from ..models.requests import RunTaskRequest
-from ..models.enums import TaskStatusEnum, LLMModel
+from ..models.enums import TaskStatusEnum, LLMCachePolicy, LLMModel
 from ..utils.task_manager import task_manager
 from ..config import settings
+from .browser_pool import BrowserLease, browser_pool
+from .llm_cache import llm_cache
+from .llm_router import llm_router
+from .metrics import metrics
+from .replay_service import ReplayDivergedError, replay_service
+from .resource_tracker import resource_tracker
+from .screenshot_service import screenshot_service
+from .trace_service import trace_service
+from .upload_service import upload_service
+from .watchdog import TaskTimeoutError, TaskWatchdog
 
 
 class BrowserService:
@@ -18,43 +29,68 @@ class BrowserService:
     
     def __init__(self):
         self.active_agents: Dict[str, Agent] = {}
+        self.active_leases: Dict[str, BrowserLease] = {}
+        self.timed_out_tasks = 0
     
     def _get_llm_instance(self, model: Optional[LLMModel] = None):
-        """Get LLM instance based on model type."""
-        # For now, we'll use a mock LLM since we don't have API keys
-        # In production, you would configure actual LLM instances here
-        from browser_use.llm import ChatOpenAI
+        """Get an LLM instance routed to the provider of a model type.
         
-        model_name = model.value if model else "gpt-4o"
-        
-        # This would need proper API key configuration in production
-        try:
-            return ChatOpenAI(model=model_name)
-        except Exception:
-            # Fallback to mock for development
-            return MockLLM(model_name)
+        Raises LLMUnavailableError, failing the task, if no provider is
+        configured for the model or an equivalent one.
+        """
+        return llm_router.get(model or LLMModel.GPT_4O)
     
     async def create_and_run_task(self, task_id: str, request: RunTaskRequest) -> None:
-        """Create and run a browser automation task."""
+        """Create and run a browser automation task.
+        
+        Only the first call for a created task launches an agent, later calls
+        for the same task ID return immediately.
+        """
+        if not await task_manager.start_task(task_id):
+            return
+        started_at = time.monotonic()
+        trace_service.start(task_id)
+        
         try:
-            # Update task status to running
-            await task_manager.update_task_status(task_id, TaskStatusEnum.RUNNING)
-            
             # Get task data
             task_data = await task_manager.get_task(task_id)
             if not task_data:
                 raise ValueError(f"Task {task_id} not found")
             
-            # Get LLM instance
-            llm = self._get_llm_instance(request.llm_model)
+            # Get LLM instance, answering repeated prompts from the cache if the task opted in
+            llm = llm_cache.wrap(
+                self._get_llm_instance(request.llm_model),
+                request.cache_policy or LLMCachePolicy(settings.LLM_CACHE_POLICY)
+            )
+            
+            # Lease a fresh context on a warm browser from the pool
+            acquire_started_at = time.monotonic()
+            lease = await browser_pool.acquire(
+                viewport={"width": request.browser_viewport_width, "height": request.browser_viewport_height}
+            )
+            trace_service.add(
+                task_id, "browser lease" if lease.hit else "browser launch", "browser", acquire_started_at, hit=lease.hit
+            )
+            self.active_leases[task_id] = lease
+            # Shielded so a teardown deadline never leaves the pool's bookkeeping half done
+            resource_tracker.track(task_id, "browser context", lambda: asyncio.shield(browser_pool.release(lease)))
+            browser_pool.watch_pages(lease, lambda page: resource_tracker.track(task_id, "page", page.close))
             
             # Create agent with simplified configuration
+            agent_started_at = time.monotonic()
             agent = Agent(
                 task=request.task,
                 llm=llm,
+                browser_context=lease.context,
+                # The pool owns the browser, the agent must not close it
+                browser_profile=BrowserProfile(keep_alive=True),
                 use_vision=True,
-                save_conversation_path=str(settings.STORAGE_PATH / f"conversation_{task_id}.json")
+                save_conversation_path=str(settings.STORAGE_PATH / f"conversation_{task_id}.json"),
+                register_new_step_callback=self._step_recorder(task_id, started_at),
+                available_file_paths=self._resolve_files(task_data.user_uploaded_files)
             )
+            trace_service.add(task_id, "agent creation", "setup", agent_started_at)
+            trace_service.instrument_agent(task_id, agent)
             
             # Store agent instance
             await task_manager.set_agent_instance(task_id, agent)
@@ -75,27 +111,98 @@ class BrowserService:
             await task_manager.update_task_status(task_id, TaskStatusEnum.STOPPED)
             raise
         except Exception as e:
-            await task_manager.update_task_status(task_id, TaskStatusEnum.FAILED)
+            # Output first, so it is part of the final status event
             await task_manager.set_task_output(task_id, f"Error: {str(e)}")
+            await task_manager.update_task_status(task_id, TaskStatusEnum.FAILED)
             raise
         finally:
             # Clean up
             if task_id in self.active_agents:
                 del self.active_agents[task_id]
+            self.active_leases.pop(task_id, None)
+            async with trace_service.span(task_id, "teardown", "browser"):
+                await resource_tracker.close_task(task_id)
+            trace_service.add(task_id, "task", "task", started_at)
             await task_manager.unregister_running_task(task_id)
     
+    def _resolve_files(self, file_names) -> List[str]:
+        """Resolve uploaded file names to the paths of their stored content."""
+        paths = []
+        for file_name in file_names:
+            path = upload_service.resolve(file_name)
+            if path:
+                paths.append(str(path))
+        return paths
+    
+    def _step_recorder(self, task_id: str, started_at: float):
+        """Create an agent step callback that appends each step to the task as it happens."""
+        first_step = True
+        
+        async def record_step(browser_state, model_output, n_steps: int):
+            nonlocal first_step
+            if first_step:
+                first_step = False
+                metrics.task_first_step.observe(time.monotonic() - started_at)
+            step_data = {
+                "evaluation_previous_goal": model_output.evaluation_previous_goal,
+                "next_goal": model_output.next_goal,
+                "url": browser_state.url
+            }
+            screenshots = await self._save_screenshots(task_id, [browser_state.screenshot])
+            await task_manager.add_task_steps(task_id, [step_data], screenshots)
+        
+        return record_step
+    
     async def _run_agent_with_monitoring(self, task_id: str, agent: Agent, request: RunTaskRequest):
-        """Run agent with step monitoring and pause/resume support."""
+        """Run agent with step monitoring and pause/resume support.
+        
+        Steps and screenshots are recorded by the agent's step callback while
+        it runs. The history is only used for the final result, and for steps
+        if the agent never reported any. A watchdog cancels the run once it
+        exceeds its time limits and fails the task with the reason.
+        
+        Pausing takes effect before the agent's next step: the step hook
+        parks the browser and waits for the task to be resumed, so the agent
+        continues with the same step.
+        
+        Tasks with a ``replay_task_id`` first replay that task's recorded
+        actions, and the agent only runs if the page diverged from the
+        recording. Successful agent runs are saved as scripts to replay.
+        """
         task_data = await task_manager.get_task(task_id)
         if not task_data:
             return
         
         max_steps = request.max_agent_steps or 75
-        step_count = 0
+        watchdog = TaskWatchdog(timeout=request.timeout_seconds, pause_event=task_data.pause_event)
+        step_started_at = None
+        
+        async def before_step(agent: Agent):
+            nonlocal step_started_at
+            if not task_data.pause_event.is_set():
+                async with trace_service.span(task_id, "paused", "pause"):
+                    await self._wait_while_paused(task_id, task_data.pause_event)
+            await watchdog.step_started()
+            step_started_at = time.monotonic()
+        
+        async def after_step(agent: Agent):
+            await watchdog.step_finished()
+            metrics.step_duration.observe(time.monotonic() - step_started_at)
+            trace_service.add(task_id, f"step {watchdog.steps}", "step", step_started_at)
         
         try:
+            if request.replay_task_id and await self._replay(
+                task_id, agent, request.replay_task_id, watchdog, before_step, after_step
+            ):
+                await task_manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
+                return
+            
             # Start the agent execution
-            history = await agent.run(max_steps=max_steps)
+            history = await watchdog.run(agent.run(
+                max_steps=max_steps,
+                on_step_start=before_step,
+                on_step_end=after_step
+            ))
             
             # Process the results
             if history:
@@ -104,21 +211,13 @@ class BrowserService:
                 if final_result:
                     await task_manager.set_task_output(task_id, str(final_result))
                 
-                # Extract screenshots
-                screenshots = history.screenshots() if hasattr(history, 'screenshots') else []
-                for screenshot in screenshots:
-                    await task_manager.add_screenshot(task_id, screenshot)
+                task_data = await task_manager.get_task(task_id)
+                if task_data and not task_data.steps:
+                    await self._record_history(task_id, history)
                 
-                # Extract steps
-                if hasattr(history, 'model_actions'):
-                    actions = history.model_actions()
-                    for i, action in enumerate(actions):
-                        step_data = {
-                            "evaluation_previous_goal": f"Step {i} completed",
-                            "next_goal": f"Execute {action.get('action', 'unknown')}",
-                            "url": action.get('url', 'unknown')
-                        }
-                        await task_manager.add_task_step(task_id, step_data)
+                # A run that took over from a replay only covers the steps after the divergence
+                if not request.replay_task_id and history.is_successful():
+                    await replay_service.save(task_id, request.task, history)
             
             # Mark as finished
             await task_manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
@@ -126,75 +225,107 @@ class BrowserService:
         except asyncio.CancelledError:
             await task_manager.update_task_status(task_id, TaskStatusEnum.STOPPED)
             raise
-        except Exception as e:
+        except TaskTimeoutError as e:
+            print(f"Task {task_id} {e}")
+            self.timed_out_tasks += 1
+            await task_manager.set_task_output(task_id, str(e))
             await task_manager.update_task_status(task_id, TaskStatusEnum.FAILED)
+        except Exception as e:
             await task_manager.set_task_output(task_id, f"Execution error: {str(e)}")
+            await task_manager.update_task_status(task_id, TaskStatusEnum.FAILED)
+    
+    async def _replay(self, task_id: str, agent: Agent, script_task_id: str, watchdog: TaskWatchdog,
+                      before_step, after_step) -> bool:
+        """Replay the script recorded by another task. Returns False if the agent has to take over."""
+        script = await replay_service.load(script_task_id)
+        if script is None:
+            print(f"Task {task_id} has no script of task {script_task_id} to replay")
+            return False
+        
+        async def record_step(browser_state, step, n_steps: int):
+            step_data = {
+                "evaluation_previous_goal": f"Replayed step {n_steps}",
+                "next_goal": step["goal"],
+                "url": browser_state.url
+            }
+            screenshots = await self._save_screenshots(task_id, [browser_state.screenshot])
+            await task_manager.add_task_steps(task_id, [step_data], screenshots)
+        
+        try:
+            async with trace_service.span(task_id, "replay", "replay", script=script_task_id):
+                output = await watchdog.run(replay_service.replay(agent, script, before_step, after_step, record_step))
+        except ReplayDivergedError as e:
+            print(f"Task {task_id} diverged from the script of task {script_task_id}, the agent takes over: {e}")
+            metrics.task_replays.inc(outcome="diverged")
+            return False
+        metrics.task_replays.inc(outcome="replayed")
+        if output:
+            await task_manager.set_task_output(task_id, output)
+        return True
+    
+    async def _record_history(self, task_id: str, history):
+        """Add the steps and screenshots of a finished agent history in one batch."""
+        screenshots = history.screenshots() if hasattr(history, 'screenshots') else []
+        steps = []
+        if hasattr(history, 'model_actions'):
+            for i, action in enumerate(history.model_actions()):
+                steps.append({
+                    "evaluation_previous_goal": f"Step {i} completed",
+                    "next_goal": f"Execute {action.get('action', 'unknown')}",
+                    "url": action.get('url', 'unknown')
+                })
+        screenshots = await self._save_screenshots(task_id, screenshots)
+        if steps or screenshots:
+            await task_manager.add_task_steps(task_id, steps, screenshots)
+    
+    async def _save_screenshots(self, task_id: str, screenshots) -> List[str]:
+        """Write base64 screenshots to disk after the ones the task already has."""
+        screenshots = [s for s in screenshots if s]
+        if not screenshots:
+            return []
+        task_data = await task_manager.get_task(task_id)
+        start = len(task_data.screenshots) if task_data else 0
+        async with trace_service.span(task_id, "save screenshots", "storage", count=len(screenshots)):
+            return await screenshot_service.save(task_id, screenshots, start)
+    
+    async def _wait_while_paused(self, task_id: str, pause_event: asyncio.Event):
+        """Park the task's browser until it is resumed, spilling it to disk if paused for long."""
+        lease = self.active_leases.get(task_id)
+        if lease:
+            await browser_pool.park(lease)
+        if lease and settings.TASK_PAUSE_SPILL_AFTER > 0:
+            try:
+                await asyncio.wait_for(pause_event.wait(), timeout=settings.TASK_PAUSE_SPILL_AFTER)
+            except asyncio.TimeoutError:
+                await browser_pool.spill(lease, settings.BROWSER_STATES_PATH / f"{task_id}.json")
+        # A task stopped while paused is cancelled here, releasing the lease unparks it
+        await pause_event.wait()
+        if lease:
+            await browser_pool.unpark(lease)
     
     async def pause_task(self, task_id: str) -> bool:
-        """Pause a running task."""
+        """Pause a running task before its next step."""
         if task_id in self.active_agents:
-            # Browser-use doesn't have built-in pause/resume, so we simulate it
-            success = await task_manager.pause_task(task_id)
-            if success:
-                # In a real implementation, you might need to pause the browser context
-                pass
-            return success
+            return await task_manager.pause_task(task_id)
         return False
     
     async def resume_task(self, task_id: str) -> bool:
         """Resume a paused task."""
         if task_id in self.active_agents:
-            success = await task_manager.resume_task(task_id)
-            if success:
-                # In a real implementation, you might need to resume the browser context
-                pass
-            return success
+            return await task_manager.resume_task(task_id)
         return False
     
     async def stop_task(self, task_id: str) -> bool:
-        """Stop a running task."""
-        success = await task_manager.stop_task(task_id)
-        
-        # Clean up agent
-        if task_id in self.active_agents:
-            try:
-                agent = self.active_agents[task_id]
-                # Close browser context if available
-                if hasattr(agent, 'browser_context') and agent.browser_context:
-                    await agent.browser_context.close()
-            except Exception:
-                pass  # Ignore cleanup errors
-            
-            del self.active_agents[task_id]
+        """Stop a task and close its browser resources right away.
         
+        The cancelled run closes them as well when it unwinds; closing them
+        here means an agent slow to notice the cancellation cannot keep its
+        browser alive.
+        """
+        success = await task_manager.stop_task(task_id)
+        await resource_tracker.close_task(task_id)
         return success
 
 
-class MockLLM:
-    """Mock LLM for development/testing purposes."""
-    
-    def __init__(self, model_name: str):
-        self.model_name = model_name
-    
-    async def agenerate(self, messages, **kwargs):
-        """Mock LLM response."""
-        return MockResponse("This is a mock response for development. Please configure a real LLM.")
-    
-    def generate(self, messages, **kwargs):
-        """Sync version of generate."""
-        return MockResponse("This is a mock response for development. Please configure a real LLM.")
-
-
-class MockResponse:
-    """Mock LLM response."""
-    
-    def __init__(self, content: str):
-        self.content = content
-        self.text = content
-    
-    def __str__(self):
-        return self.content
-
-
 # Global browser service instance
 browser_service = BrowserService()
@@ -0,0 +1,231 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from ..config import settings
+from ..models.enums import LLMCachePolicy
+from .metrics import metrics
+
+
+# Timestamps browser-use writes into every step prompt
+TIMESTAMP_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def screenshot_hash(url: str) -> str:
+    """Return a perceptual hash of a base64 screenshot, so re-rendered but identical pages match.
+
+    A 64-bit difference hash of the grayscale image scaled to 9x8: each bit
+    tells whether a pixel is brighter than its right neighbour. Images that
+    are not inline data are hashed by URL.
+    """
+    if not url.startswith("data:"):
+        return hashlib.sha256(url.encode()).hexdigest()
+    from PIL import Image
+
+    data = base64.b64decode(url.partition(",")[2])
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            pixels = image.convert("L").resize((9, 8), Image.Resampling.BILINEAR).tobytes()
+    except Exception:
+        return hashlib.sha256(data).hexdigest()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = bits << 1 | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def normalize_text(text: str) -> str:
+    """Drop timestamps and collapse whitespace, which vary between otherwise identical prompts."""
+    return WHITESPACE_PATTERN.sub(" ", TIMESTAMP_PATTERN.sub("<timestamp>", text)).strip()
+
+
+def cache_key(model: str, messages: List[Any], output_format: Any) -> str:
+    """Hash the model, normalized prompt, screenshot hashes and output type of a call."""
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{getattr(output_format, '__name__', '')}\0".encode())
+    for message in messages:
+        digest.update(f"{message.role}\0".encode())
+        content = message.content if isinstance(message.content, list) else [message.content]
+        for part in content:
+            if part is None:
+                continue
+            if isinstance(part, str):
+                digest.update(normalize_text(part).encode())
+            elif getattr(part, "type", None) == "image_url":
+                digest.update(f"\0image:{screenshot_hash(part.image_url.url)}\0".encode())
+            elif getattr(part, "type", None) == "text":
+                digest.update(normalize_text(part.text).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """On-disk cache of LLM responses for repeated agent prompts.
+
+    Responses are keyed by ``cache_key``, so a task replayed against the
+    same pages skips its LLM round trips. Entries live in SQLite, accessed
+    on a single thread like the SQLite task store, expire after
+    ``ttl_seconds`` and are evicted least recently used first beyond
+    ``max_entries``.
+
+    Tasks opt in through ``cache_policy``: ``use`` reads and writes the
+    cache, ``refresh`` only writes fresh responses to it.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        self.path = path or settings.LLM_CACHE_PATH
+        self.max_entries = max_entries if max_entries is not None else settings.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.LLM_CACHE_TTL
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self.entries = 0
+        self.evictions = 0
+
+    def wrap(self, llm: Any, policy: LLMCachePolicy) -> Any:
+        """Serve an agent's LLM calls through the cache according to its policy."""
+        if policy == LLMCachePolicy.OFF:
+            return llm
+        ainvoke = llm.ainvoke
+
+        async def cached_ainvoke(messages, output_format=None):
+            key = await asyncio.to_thread(cache_key, llm.model, messages, output_format)
+            if policy == LLMCachePolicy.USE:
+                cached = await self.get(key)
+                if cached is not None:
+                    result = self._load(cached, output_format)
+                    if result is not None:
+                        metrics.llm_cache_hits.inc()
+                        return result
+            metrics.llm_cache_misses.inc()
+            result = await ainvoke(messages, output_format)
+            await self.put(key, self._dump(result))
+            return result
+
+        setattr(llm, "ainvoke", cached_ainvoke)
+        return llm
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached response that has not expired."""
+        return await self._run(self._get, key, time.time())
+
+    async def put(self, key: str, response: str):
+        """Store a response, evicting the least recently used ones beyond the limit."""
+        await self._run(self._put, key, response, time.time())
+
+    def stats(self):
+        """Return the number of cached responses and evictions."""
+        return {"entries": self.entries, "evictions": self.evictions}
+
+    async def close(self):
+        """Close the database."""
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @staticmethod
+    def _dump(result: Any) -> str:
+        completion = result.completion
+        if hasattr(completion, "model_dump_json"):
+            completion = json.loads(completion.model_dump_json())
+        return json.dumps({"completion": completion, "thinking": result.thinking})
+
+    @staticmethod
+    def _load(cached: str, output_format: Any) -> Optional[Any]:
+        """Rebuild a cached completion, or None if it no longer fits the requested output type."""
+        from browser_use.llm.views import ChatInvokeCompletion
+
+        data = json.loads(cached)
+        completion = data["completion"]
+        if output_format is not None:
+            try:
+                completion = output_format.model_validate(completion)
+            except Exception:
+                # The agent's action schema changed since the response was cached
+                return None
+        # No tokens were spent on a cached answer
+        return ChatInvokeCompletion(completion=completion, thinking=data["thinking"], usage=None)
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        """Run a blocking database call on the cache thread."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self.entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return self._conn
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        response, created_at = row
+        with conn:
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.entries -= 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return response
+
+    def _put(self, key: str, response: str, now: float):
+        conn = self._connect()
+        with conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            ).rowcount
+            if not inserted:
+                conn.execute(
+                    "UPDATE responses SET response = ?, created_at = ?, accessed_at = ? WHERE key = ?",
+                    (response, now, now, key)
+                )
+            self.entries += inserted
+            excess = self.entries - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (excess,)
+                )
+                self.entries -= excess
+                self.evictions += excess
+
+
+# Global LLM response cache instance
+llm_cache = LLMResponseCache()
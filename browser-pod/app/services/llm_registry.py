@@ -0,0 +1,256 @@
+import asyncio
+import copy
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from ..config import settings
+from .metrics import metrics
+
+
+def parse_provider_limits(value: str) -> Dict[str, Tuple[int, int]]:
+    """Parse ``provider=concurrency/requests_per_minute`` pairs, e.g. ``openai=32/600,anthropic=8/120``."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        provider, _, limit = item.partition("=")
+        concurrency, _, rpm = limit.partition("/")
+        limits[provider.strip()] = (int(concurrency), int(rpm or 0))
+    return limits
+
+
+class TokenBucket:
+    """Token bucket allowing ``rate`` calls per second in bursts of up to ``burst``.
+
+    Waiters are served in arrival order, so a burst of agents is spread
+    over time instead of retrying against the provider all at once.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take a token, waiting for one if the bucket is empty. Returns the seconds waited."""
+        async with self._lock:
+            self._refill()
+            waited = 0.0
+            if self._tokens < 1:
+                waited = (1 - self._tokens) / self.rate
+                await asyncio.sleep(waited)
+                self._refill()
+            self._tokens -= 1
+            return waited
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class ProviderLimiter:
+    """Concurrency limit and optional rate limit shared by every model of a provider."""
+
+    def __init__(self, max_concurrency: int, requests_per_minute: int = 0):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # One second worth of calls may go out at once
+        self._bucket = (
+            TokenBucket(requests_per_minute / 60, max(1, requests_per_minute // 60))
+            if requests_per_minute > 0 else None
+        )
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttled = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for the rate limit and a free concurrency slot."""
+        self.waiting += 1
+        try:
+            if self._bucket is not None and await self._bucket.acquire() > 0:
+                self.throttled += 1
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+def _create_openai(model: str, http_client: httpx.AsyncClient, max_retries: int) -> Any:
+    from browser_use.llm import ChatOpenAI
+    return ChatOpenAI(model=model, http_client=http_client, max_retries=max_retries)
+
+
+def _create_anthropic(model: str, http_client: httpx.AsyncClient, max_retries: int) -> Any:
+    from browser_use.llm import ChatAnthropic
+    return ChatAnthropic(model=model, max_retries=max_retries)
+
+
+def _create_google(model: str, http_client: httpx.AsyncClient, max_retries: int) -> Any:
+    from browser_use.llm import ChatGoogle
+    return ChatGoogle(model=model)
+
+
+def _create_groq(model: str, http_client: httpx.AsyncClient, max_retries: int) -> Any:
+    from browser_use.llm import ChatGroq
+    return ChatGroq(model=model, max_retries=max_retries)
+
+
+# Chat model factory of each provider; only the OpenAI SDK accepts a shared
+# HTTP client, the others keep a connection pool in their SDK client per model
+PROVIDERS: Dict[str, Callable[[str, httpx.AsyncClient, int], Any]] = {
+    "openai": _create_openai,
+    "anthropic": _create_anthropic,
+    "google": _create_google,
+    "groq": _create_groq
+}
+
+# Environment variable holding the API key of each provider
+PROVIDER_API_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "google": "GOOGLE_API_KEY",
+    "groq": "GROQ_API_KEY"
+}
+
+
+class LLMClientRegistry:
+    """Shared chat model clients for all tasks.
+
+    browser-use chat models build a new SDK client, and with it a new HTTP
+    connection pool, for every call. The registry keeps one model instance
+    per provider and model, all models of a provider share one pooled
+    ``httpx.AsyncClient``, and the SDK client is built once per model, so
+    calls reuse warm keep-alive connections.
+
+    Calls go through their provider's ``ProviderLimiter``, which bounds
+    in-flight calls and, with a requests per minute limit, spreads them out
+    before the provider starts answering 429.
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        provider_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        max_retries: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.max_connections = max_connections if max_connections is not None else settings.LLM_MAX_CONNECTIONS
+        self.max_concurrency = max_concurrency if max_concurrency is not None else settings.LLM_MAX_CONCURRENCY
+        self.requests_per_minute = (
+            requests_per_minute if requests_per_minute is not None else settings.LLM_REQUESTS_PER_MINUTE
+        )
+        self.provider_limits = (
+            provider_limits if provider_limits is not None else parse_provider_limits(settings.LLM_PROVIDER_LIMITS)
+        )
+        self.max_retries = max_retries if max_retries is not None else settings.LLM_MAX_RETRIES
+        # Lets tests talk to a stub server in-process
+        self.transport = transport
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._limiters: Dict[str, ProviderLimiter] = {}
+
+    def get(self, model: str, provider: str = "openai") -> Any:
+        """Return a chat model for a provider and model backed by the shared client.
+        
+        Each caller gets its own shallow copy: browser-use agents patch
+        ``ainvoke`` on their model to count tokens, which must not pile up
+        on the shared instance task after task.
+        """
+        key = (provider, model)
+        llm = self._clients.get(key)
+        if llm is None:
+            llm = PROVIDERS[provider](model, self._http_client(provider), self.max_retries)
+            self._share_sdk_client(llm)
+            metrics.instrument_llm(llm)
+            self._limit(llm, self.limiter(provider))
+            self._clients[key] = llm
+        return copy.copy(llm)
+
+    @staticmethod
+    def is_configured(provider: str) -> bool:
+        """Check whether the API key of a provider is set."""
+        return bool(os.getenv(PROVIDER_API_KEYS[provider]))
+
+    def limiter(self, provider: str) -> ProviderLimiter:
+        """Return the limiter shared by the models of a provider."""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            concurrency, rpm = self.provider_limits.get(provider, (self.max_concurrency, self.requests_per_minute))
+            limiter = self._limiters[provider] = ProviderLimiter(concurrency, rpm)
+        return limiter
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of shared clients and calls in flight, waiting and throttled."""
+        limiters = self._limiters.values()
+        return {
+            "clients": len(self._clients),
+            "in_flight": sum(limiter.in_flight for limiter in limiters),
+            "waiting": sum(limiter.waiting for limiter in limiters),
+            "throttled": sum(limiter.throttled for limiter in limiters)
+        }
+
+    async def close(self):
+        """Close the pooled HTTP connections."""
+        http_clients = list(self._http_clients.values())
+        self._clients.clear()
+        self._http_clients.clear()
+        for http_client in http_clients:
+            await http_client.aclose()
+
+    def _http_client(self, provider: str) -> httpx.AsyncClient:
+        http_client = self._http_clients.get(provider)
+        if http_client is None:
+            http_client = self._http_clients[provider] = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(600, connect=10),
+                transport=self.transport
+            )
+        return http_client
+
+    @staticmethod
+    def _share_sdk_client(llm: Any):
+        """Build the SDK client of a model once instead of on every call."""
+        get_client = getattr(llm, "get_client", None)
+        if get_client is None:
+            return
+        client = None
+
+        def shared_client():
+            nonlocal client
+            if client is None:
+                client = get_client()
+            return client
+
+        setattr(llm, "get_client", shared_client)
+
+    @staticmethod
+    def _limit(llm: Any, limiter: ProviderLimiter):
+        """Route every call of a model through its provider's limiter."""
+        ainvoke = llm.ainvoke
+
+        async def limited_ainvoke(*args, **kwargs):
+            async with limiter.slot():
+                return await ainvoke(*args, **kwargs)
+
+        setattr(llm, "ainvoke", limited_ainvoke)
+
+
+# Global LLM client registry instance
+llm_registry = LLMClientRegistry()
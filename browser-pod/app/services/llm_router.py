@@ -0,0 +1,259 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..models.enums import LLMModel
+from .llm_registry import PROVIDER_API_KEYS, LLMClientRegistry, llm_registry
+from .metrics import metrics
+
+
+# Provider and provider-side model name of each model
+MODEL_ROUTES: Dict[LLMModel, Tuple[str, str]] = {
+    LLMModel.GPT_4O: ("openai", "gpt-4o"),
+    LLMModel.GPT_4O_MINI: ("openai", "gpt-4o-mini"),
+    LLMModel.GPT_4_1: ("openai", "gpt-4.1"),
+    LLMModel.GPT_4_1_MINI: ("openai", "gpt-4.1-mini"),
+    LLMModel.O4_MINI: ("openai", "o4-mini"),
+    LLMModel.O3: ("openai", "o3"),
+    LLMModel.GEMINI_2_0_FLASH: ("google", "gemini-2.0-flash"),
+    LLMModel.GEMINI_2_0_FLASH_LITE: ("google", "gemini-2.0-flash-lite"),
+    LLMModel.GEMINI_2_5_FLASH_PREVIEW: ("google", "gemini-2.5-flash-preview-04-17"),
+    LLMModel.GEMINI_2_5_FLASH: ("google", "gemini-2.5-flash"),
+    LLMModel.GEMINI_2_5_PRO: ("google", "gemini-2.5-pro"),
+    LLMModel.CLAUDE_3_7_SONNET: ("anthropic", "claude-3-7-sonnet-20250219"),
+    LLMModel.CLAUDE_SONNET_4: ("anthropic", "claude-sonnet-4-20250514"),
+    LLMModel.LLAMA_4_MAVERICK: ("groq", "meta-llama/llama-4-maverick-17b-128e-instruct"),
+}
+
+# Models of similar capability that can stand in for each other, only within
+# the requested model's provider unless cross-provider routing is enabled
+EQUIVALENT_MODELS: List[Tuple[LLMModel, ...]] = [
+    (LLMModel.GPT_4O, LLMModel.GPT_4_1, LLMModel.CLAUDE_SONNET_4, LLMModel.CLAUDE_3_7_SONNET, LLMModel.GEMINI_2_5_PRO),
+    (
+        LLMModel.GPT_4O_MINI, LLMModel.GPT_4_1_MINI, LLMModel.GEMINI_2_5_FLASH,
+        LLMModel.GEMINI_2_5_FLASH_PREVIEW, LLMModel.GEMINI_2_0_FLASH, LLMModel.LLAMA_4_MAVERICK
+    ),
+    (LLMModel.GEMINI_2_0_FLASH_LITE, LLMModel.GEMINI_2_0_FLASH, LLMModel.GPT_4O_MINI),
+    (LLMModel.O3, LLMModel.O4_MINI),
+]
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no provider is configured for a model or any of its equivalents."""
+
+
+class ModelLatency:
+    """Recent call latencies and failures of one model."""
+
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.failed_at: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.calls += 1
+        self.failed_at = None
+
+    def record_failure(self):
+        self.calls += 1
+        self.failures += 1
+        self.failed_at = time.monotonic()
+
+    def percentile(self, fraction: float, min_samples: int = 1) -> Optional[float]:
+        """Return a latency percentile, or None while fewer than ``min_samples`` calls were measured."""
+        if len(self.samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LLMRouter:
+    """Routes each LLMModel to its provider, with failover and hedging.
+
+    A call goes to the requested model first. If it fails, it is retried
+    on an equivalent model; if it has not answered within the model's
+    recent ``hedge_percentile`` latency, an equivalent model is raced
+    against it and the first answer wins. Both are off unless enabled, as
+    hedged calls are billed twice. Equivalents come from the requested
+    model's provider, or from any provider with ``cross_provider``, so
+    prompts only leave it when configured to. They are tried fastest first
+    by their recent median latency, models whose provider has no API key
+    are never tried, and models that just failed are tried last until
+    ``failure_cooldown`` has passed.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[LLMClientRegistry] = None,
+        failover: Optional[bool] = None,
+        hedge: Optional[bool] = None,
+        cross_provider: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        latency_window: Optional[int] = None,
+        failure_cooldown: Optional[int] = None
+    ):
+        self.registry = registry or llm_registry
+        self.failover = failover if failover is not None else settings.LLM_FAILOVER
+        self.hedge = hedge if hedge is not None else settings.LLM_HEDGE
+        self.cross_provider = cross_provider if cross_provider is not None else settings.LLM_CROSS_PROVIDER
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else settings.LLM_HEDGE_PERCENTILE
+        self.hedge_min_samples = (
+            hedge_min_samples if hedge_min_samples is not None else settings.LLM_HEDGE_MIN_SAMPLES
+        )
+        self.latency_window = latency_window if latency_window is not None else settings.LLM_LATENCY_WINDOW
+        self.failure_cooldown = failure_cooldown if failure_cooldown is not None else settings.LLM_FAILURE_COOLDOWN
+        self._latency: Dict[LLMModel, ModelLatency] = {}
+
+    def get(self, model: LLMModel) -> "RoutedLLM":
+        """Return a chat model for an agent that routes its calls through the router."""
+        if not self.candidates(model):
+            raise LLMUnavailableError(
+                f"No API key configured for {model.value}: set {PROVIDER_API_KEYS[MODEL_ROUTES[model][0]]}"
+            )
+        return RoutedLLM(self, model)
+
+    def latency(self, model: LLMModel) -> ModelLatency:
+        latency = self._latency.get(model)
+        if latency is None:
+            latency = self._latency[model] = ModelLatency(self.latency_window)
+        return latency
+
+    def candidates(self, model: LLMModel) -> List[LLMModel]:
+        """Return the models to try for a call, in order."""
+        equivalents = []
+        provider = MODEL_ROUTES[model][0]
+        if self.failover or self.hedge:
+            for group in EQUIVALENT_MODELS:
+                if model in group:
+                    equivalents.extend(
+                        m for m in group
+                        if m != model and m not in equivalents
+                        and (self.cross_provider or MODEL_ROUTES[m][0] == provider)
+                    )
+        models = [m for m in [model, *equivalents] if self.registry.is_configured(MODEL_ROUTES[m][0])]
+        if not models:
+            return []
+
+        now = time.monotonic()
+
+        def cooling_down(m: LLMModel) -> bool:
+            failed_at = self.latency(m).failed_at
+            return failed_at is not None and now - failed_at < self.failure_cooldown
+
+        def median(m: LLMModel) -> float:
+            p50 = self.latency(m).percentile(0.5)
+            return p50 if p50 is not None else float("inf")
+
+        first = [m for m in models[:1] if not cooling_down(m)]
+        rest = sorted(models[len(first):], key=lambda m: (cooling_down(m), median(m)))
+        return first + rest
+
+    def hedge_delay(self, model: LLMModel) -> Optional[float]:
+        """Return how long to wait for a model before hedging, or None if it should not be hedged."""
+        if not self.hedge:
+            return None
+        return self.latency(model).percentile(self.hedge_percentile, self.hedge_min_samples)
+
+    async def call(self, model: LLMModel, llm: Any, messages: Any, output_format: Any) -> Any:
+        """Call one model and record its latency or failure."""
+        start = time.monotonic()
+        try:
+            result = await llm.ainvoke(messages, output_format)
+        except Exception:
+            self.latency(model).record_failure()
+            raise
+        self.latency(model).record(time.monotonic() - start)
+        return result
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Return the provider, availability and recent latency of every model."""
+        stats = []
+        for model, (provider, _) in MODEL_ROUTES.items():
+            latency = self.latency(model)
+            stats.append({
+                "model": model.value,
+                "provider": provider,
+                "available": self.registry.is_configured(provider),
+                "calls": latency.calls,
+                "failures": latency.failures,
+                "p50_seconds": latency.percentile(0.5),
+                "p95_seconds": latency.percentile(0.95)
+            })
+        return stats
+
+
+class RoutedLLM:
+    """Chat model handed to an agent, sending each call through the router."""
+
+    def __init__(self, router: LLMRouter, model: LLMModel):
+        self.router = router
+        self.requested = model
+        self.model = model.value
+        self.provider = MODEL_ROUTES[model][0]
+        self._llms: Dict[LLMModel, Any] = {}
+
+    @property
+    def name(self) -> str:
+        return self.model
+
+    @property
+    def model_name(self) -> str:
+        return self.model
+
+    async def ainvoke(self, messages: Any, output_format: Any = None) -> Any:
+        """Call the requested model, failing over and hedging on equivalent models."""
+        candidates = iter(self.router.candidates(self.requested))
+        pending: Dict[asyncio.Future, LLMModel] = {}
+        hedged = False
+        errors: List[Exception] = []
+
+        def launch() -> bool:
+            model = next(candidates, None)
+            if model is None:
+                return False
+            call = self.router.call(model, self._llm(model), messages, output_format)
+            pending[asyncio.ensure_future(call)] = model
+            return True
+
+        if not launch():
+            raise LLMUnavailableError(f"No API key configured for {self.model} or an equivalent model")
+        first_model = next(iter(pending.values()))
+        try:
+            while pending:
+                hedge_after = None if hedged else self.router.hedge_delay(first_model)
+                done, _ = await asyncio.wait(pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        metrics.llm_hedged.inc()
+                    continue
+                for future in done:
+                    model = pending.pop(future)
+                    if future.exception() is None:
+                        if model != first_model and hedged:
+                            metrics.llm_hedge_wins.inc()
+                        return future.result()
+                    errors.append(future.exception())
+                    print(f"LLM call to {model.value} failed: {future.exception()!r}")
+                if not pending and self.router.failover and launch():
+                    metrics.llm_failovers.inc()
+            raise errors[-1]
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _llm(self, model: LLMModel) -> Any:
+        llm = self._llms.get(model)
+        if llm is None:
+            provider, provider_model = MODEL_ROUTES[model]
+            llm = self._llms[model] = self.router.registry.get(provider_model, provider)
+        return llm
+
+
+# Global LLM router instance
+llm_router = LLMRouter()
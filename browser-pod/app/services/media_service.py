@@ -0,0 +1,195 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import shutil
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from ..config import settings
+
+try:
+    import brotli
+except ImportError:  # Optional, only gzip variants are served without it
+    brotli = None
+
+
+Compressor = Callable[[BinaryIO, BinaryIO], None]
+
+# Types worth compressing; images, videos and archives are compressed already
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/xml", "application/javascript",
+    "image/svg+xml", "text/csv", "text/plain", "text/html", "text/markdown", "text/xml"
+}
+
+# Bytes read per compression step, so large outputs are never loaded whole
+COMPRESS_CHUNK_SIZE = 256 * 1024
+
+
+def _gzip(source: BinaryIO, target: BinaryIO):
+    with gzip.GzipFile(fileobj=target, mode="wb", compresslevel=9, mtime=0) as compressed:
+        shutil.copyfileobj(source, compressed, COMPRESS_CHUNK_SIZE)
+
+
+def _brotli(source: BinaryIO, target: BinaryIO):
+    compressor = brotli.Compressor()
+    for block in iter(lambda: source.read(COMPRESS_CHUNK_SIZE), b""):
+        target.write(compressor.process(block))
+    target.write(compressor.finish())
+
+
+class MediaService:
+    """Serves stored files with HTTP caching and partial content.
+
+    Responses carry an ``ETag`` and ``Last-Modified`` derived from the file
+    stat, so revalidating clients get a bodyless 304. Bodies go through
+    ``FileResponse``, which answers ``Range`` requests with 206 and hands
+    the file path to servers supporting the ASGI ``pathsend`` extension
+    for zero-copy transfer.
+
+    Text files can also be served precompressed: the first request
+    accepting gzip (or brotli, when the ``brotli`` package is installed)
+    writes a compressed copy under ``compressed_path`` and later requests
+    serve that file directly. Copies are named after the source path and
+    its ETag, so a changed file never gets a stale copy.
+    """
+
+    def __init__(
+        self,
+        compressed_path: Optional[Path] = None,
+        max_age: Optional[int] = None,
+        compress_min_size: Optional[int] = None
+    ):
+        self.compressed_path = compressed_path or settings.COMPRESSED_PATH
+        self.max_age = max_age if max_age is not None else settings.MEDIA_CACHE_MAX_AGE
+        self.compress_min_size = (
+            compress_min_size if compress_min_size is not None else settings.MEDIA_COMPRESS_MIN_SIZE
+        )
+        self.encodings: List[Tuple[str, str, Compressor]] = [("gzip", "gz", _gzip)]
+        if brotli is not None:
+            self.encodings.insert(0, ("br", "br", _brotli))
+
+    async def response(
+        self,
+        request: Request,
+        path: Path,
+        filename: Optional[str] = None,
+        media_type: Optional[str] = None,
+        immutable: bool = False
+    ) -> Response:
+        """Build the response for a GET of a file that is known to exist.
+
+        Files that are never rewritten can be marked ``immutable`` so clients
+        cache them for a year without revalidating.
+        """
+        stat = await asyncio.to_thread(os.stat, path)
+        media_type = media_type or guess_type(filename or path.name)[0] or "application/octet-stream"
+        etag = self.etag(stat)
+        if immutable:
+            cache_control = "public, max-age=31536000, immutable"
+        elif self.max_age:
+            cache_control = f"public, max-age={self.max_age}"
+        else:
+            cache_control = "no-cache"
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Cache-Control": cache_control
+        }
+        compressible = media_type in COMPRESSIBLE_TYPES and stat.st_size >= self.compress_min_size
+        if compressible:
+            headers["Vary"] = "Accept-Encoding"
+
+        if self._not_modified(request, stat, etag):
+            return Response(status_code=304, headers=headers)
+
+        if compressible and "range" not in request.headers:
+            encoding = self._negotiate(request.headers.get("accept-encoding", ""))
+            if encoding is not None:
+                name, suffix, compress = encoding
+                variant = await asyncio.to_thread(self._variant, path, etag, suffix, compress)
+                # Representations differ, so they must not share an ETag
+                headers["ETag"] = f'{etag[:-1]}-{suffix}"'
+                headers["Content-Encoding"] = name
+                return FileResponse(
+                    variant,
+                    headers=headers,
+                    media_type=media_type,
+                    filename=filename,
+                    stat_result=await asyncio.to_thread(os.stat, variant)
+                )
+
+        return FileResponse(path, headers=headers, media_type=media_type, filename=filename, stat_result=stat)
+
+    @staticmethod
+    def etag(stat: os.stat_result) -> str:
+        """Strong validator of a file version, the same one FileResponse would send."""
+        base = f"{stat.st_mtime}-{stat.st_size}"
+        return f'"{hashlib.md5(base.encode(), usedforsecurity=False).hexdigest()}"'
+
+    @staticmethod
+    def _not_modified(request: Request, stat: os.stat_result, etag: str) -> bool:
+        """Whether the client's cached copy is still current."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            # Weak comparison, also matching the ETags of compressed copies
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return any(tag == etag or tag.startswith(etag[:-1] + "-") for tag in tags)
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(stat.st_mtime) <= since
+        return False
+
+    def _negotiate(self, accept_encoding: str) -> Optional[Tuple[str, str, Compressor]]:
+        """Pick the preferred available encoding the client accepts."""
+        accepted: Dict[str, float] = {}
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            quality = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    continue
+            accepted[name.strip().lower()] = quality
+        for encoding in self.encodings:
+            if accepted.get(encoding[0], accepted.get("*", 0)) > 0:
+                return encoding
+        return None
+
+    def _variant(self, path: Path, etag: str, suffix: str, compress: Compressor) -> Path:
+        """Return the compressed copy of a file version, writing it on first use."""
+        key = hashlib.sha1(str(path.resolve()).encode(), usedforsecurity=False).hexdigest()
+        version = etag.strip('"')
+        variant = self.compressed_path / f"{key}.{version}.{suffix}"
+        if variant.exists():
+            return variant
+
+        # Copies of older versions of the file are useless from now on
+        for stale in self.compressed_path.glob(f"{key}.*.{suffix}"):
+            stale.unlink(missing_ok=True)
+        temp = self.compressed_path / f".{variant.name}.{uuid.uuid4().hex}"
+        try:
+            with open(path, "rb") as source, open(temp, "wb") as target:
+                compress(source, target)
+            os.replace(temp, variant)
+        finally:
+            temp.unlink(missing_ok=True)
+        return variant
+
+
+# Global media service instance
+media_service = MediaService()
@@ -0,0 +1,210 @@
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+
+# Bucket upper bounds in seconds for latencies from milliseconds to minutes
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Bucket upper bounds for LLM token counts per call
+TOKEN_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(value)
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets.
+
+    Observing is a binary search and two additions, cheap enough for every
+    step and LLM call; counts are only made cumulative when rendered.
+    """
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self._counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(float(bound))}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class Gauge:
+    """Value read from its source whenever metrics are scraped."""
+
+    def __init__(self, name: str, description: str, read: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.read())}"
+        ]
+
+
+class Metrics:
+    """Process-wide metrics exposed in the Prometheus text format.
+
+    Histograms and counters are fed by the services on their hot paths;
+    gauges read the current state of the scheduler, browser pool and task
+    manager only when ``/metrics`` is scraped, so they cost nothing in
+    between.
+    """
+
+    def __init__(self):
+        self.task_queue_wait = Histogram(
+            "browser_pod_task_queue_wait_seconds", "Time tasks waited in the queue for a worker slot"
+        )
+        self.task_first_step = Histogram(
+            "browser_pod_task_first_step_seconds", "Time from a task starting to its agent's first step"
+        )
+        self.step_duration = Histogram(
+            "browser_pod_step_duration_seconds", "Duration of agent steps"
+        )
+        self.llm_call_duration = Histogram(
+            "browser_pod_llm_call_duration_seconds", "Duration of LLM calls"
+        )
+        self.llm_prompt_tokens = Histogram(
+            "browser_pod_llm_prompt_tokens", "Prompt tokens per LLM call", TOKEN_BUCKETS
+        )
+        self.llm_completion_tokens = Histogram(
+            "browser_pod_llm_completion_tokens", "Completion tokens per LLM call", TOKEN_BUCKETS
+        )
+        self.llm_call_failures = Counter(
+            "browser_pod_llm_call_failures_total", "LLM calls that raised an error"
+        )
+        self.llm_failovers = Counter(
+            "browser_pod_llm_failovers_total", "LLM calls retried on an equivalent model after a failure"
+        )
+        self.llm_hedged = Counter(
+            "browser_pod_llm_hedged_total", "Slow LLM calls raced against an equivalent model"
+        )
+        self.llm_hedge_wins = Counter(
+            "browser_pod_llm_hedge_wins_total", "Hedged LLM calls answered first by the equivalent model"
+        )
+        self.llm_cache_hits = Counter(
+            "browser_pod_llm_cache_hits_total", "LLM calls answered from the response cache"
+        )
+        self.llm_cache_misses = Counter(
+            "browser_pod_llm_cache_misses_total", "Cacheable LLM calls sent to a provider"
+        )
+        self.task_replays = Counter(
+            "browser_pod_task_replays_total", "Tasks replaying a recorded action script", ("outcome",)
+        )
+        self.browser_launch = Histogram(
+            "browser_pod_browser_launch_seconds", "Time to launch a browser"
+        )
+        self.tasks_finished = Counter(
+            "browser_pod_tasks_finished_total", "Tasks that reached a terminal status", ("status",)
+        )
+        self._gauges: List[Gauge] = []
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]):
+        """Register a gauge read at scrape time."""
+        self._gauges.append(Gauge(name, description, read))
+
+    def instrument_llm(self, llm: Any) -> Any:
+        """Time every ``ainvoke`` call of an LLM and record its token usage."""
+        ainvoke = getattr(llm, "ainvoke", None)
+        if ainvoke is None:
+            return llm
+
+        async def timed_ainvoke(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await ainvoke(*args, **kwargs)
+            except Exception:
+                self.llm_call_failures.inc()
+                raise
+            finally:
+                self.llm_call_duration.observe(time.perf_counter() - start)
+            usage = getattr(result, "usage", None)
+            if usage is not None:
+                self.llm_prompt_tokens.observe(usage.prompt_tokens)
+                self.llm_completion_tokens.observe(usage.completion_tokens)
+            return result
+
+        # Patched on the instance, the same way browser-use tracks token costs
+        setattr(llm, "ainvoke", timed_ainvoke)
+        return llm
+
+    async def timed(self, histogram: Histogram, awaitable: Awaitable[Any]) -> Any:
+        """Await something and observe how long it took."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics():
+            lines.extend(metric.render())
+        for gauge in self._gauges:
+            try:
+                lines.extend(gauge.render())
+            except Exception as e:
+                print(f"Failed to read metric {gauge.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+    def _metrics(self) -> List[Any]:
+        return [value for value in vars(self).values() if isinstance(value, (Counter, Histogram))]
+
+
+# Global metrics instance
+metrics = Metrics()
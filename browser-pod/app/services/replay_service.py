@@ -0,0 +1,154 @@
+import asyncio
+import json
+import re
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urldefrag
+
+from ..config import settings
+
+
+# Fields of a recorded element used to find it again on the replayed page
+ELEMENT_FIELDS = ("tag_name", "xpath", "highlight_index", "entire_parent_branch_path", "attributes", "shadow_root")
+
+# Task IDs that are safe to use as script file names
+TASK_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+# Pages a fresh browser tab may start on
+BLANK_URLS = {"", "about:blank", "chrome://newtab/", "chrome://new-tab-page/"}
+
+
+class ReplayDivergedError(Exception):
+    """Raised when the replayed page no longer matches the recorded run."""
+
+
+def normalize_url(url: Optional[str]) -> str:
+    """Drop the fragment and trailing slash, which do not change the page an action runs on."""
+    url = urldefrag(url or "")[0].rstrip("/")
+    return "" if url in BLANK_URLS else url
+
+
+class ReplayService:
+    """Saves successful agent runs as action scripts and replays them without the LLM.
+
+    A script holds, per agent step, the page URL the step started on and
+    its actions with the element each one interacted with. Replaying runs
+    the actions through the agent's controller on its own browser session,
+    re-locating each element by its DOM path and attributes. When the page
+    is on a different URL than recorded, an element cannot be found or an
+    action fails, ``ReplayDivergedError`` is raised and the agent takes over
+    from the current page.
+    """
+
+    def __init__(self, scripts_path: Optional[Path] = None):
+        self.scripts_path = scripts_path or settings.SCRIPTS_PATH
+
+    @staticmethod
+    def is_valid_task_id(task_id: str) -> bool:
+        """Check that a task ID cannot point outside the scripts directory."""
+        return bool(TASK_ID_PATTERN.fullmatch(task_id or ""))
+
+    def path(self, task_id: str) -> Path:
+        if not self.is_valid_task_id(task_id):
+            raise ValueError(f"Invalid task ID: {task_id!r}")
+        return self.scripts_path / f"{task_id}.json"
+
+    def exists(self, task_id: str) -> bool:
+        """Check whether a task left a replayable script."""
+        return self.is_valid_task_id(task_id) and self.path(task_id).is_file()
+
+    async def save(self, task_id: str, task: str, history: Any) -> bool:
+        """Save the actions of a finished agent history. Returns False if it had none."""
+        steps = []
+        for item in history.history:
+            if not item.model_output or not item.model_output.action:
+                continue
+            elements = list(item.state.interacted_element or [])
+            actions = []
+            for i, action in enumerate(item.model_output.action):
+                element = elements[i] if i < len(elements) else None
+                actions.append({
+                    "action": action.model_dump(exclude_none=True),
+                    "element": {field: getattr(element, field) for field in ELEMENT_FIELDS} if element else None
+                })
+            steps.append({"url": item.state.url, "goal": item.model_output.next_goal, "actions": actions})
+        if not steps:
+            return False
+        script = {"task_id": task_id, "task": task, "steps": steps}
+        await asyncio.to_thread(self._write, self.path(task_id), script)
+        return True
+
+    async def load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Load the script saved by a task, or None if it has none."""
+        if not self.exists(task_id):
+            return None
+        path = self.path(task_id)
+        return await asyncio.to_thread(lambda: json.loads(path.read_text()))
+
+    async def delete(self, task_id: str):
+        """Delete the script saved by a task, if any."""
+        if self.is_valid_task_id(task_id):
+            await asyncio.to_thread(self.path(task_id).unlink, missing_ok=True)
+
+    async def replay(
+        self,
+        agent: Any,
+        script: Dict[str, Any],
+        on_step_start: Optional[Callable[[Any], Awaitable[None]]] = None,
+        on_step_end: Optional[Callable[[Any], Awaitable[None]]] = None,
+        on_step: Optional[Callable[[Any, Dict[str, Any], int], Awaitable[None]]] = None
+    ) -> Optional[str]:
+        """Run a script's actions with the agent's browser session, without calling its LLM.
+
+        ``on_step_start`` and ``on_step_end`` are called like the agent's step
+        hooks, ``on_step`` with the browser state each step started on. Returns
+        the final result of the recorded run's ``done`` action.
+        """
+        from browser_use.dom.history_tree_processor.view import DOMHistoryElement
+
+        session = agent.browser_session
+        await session.start()
+        result = None
+        for n_steps, step in enumerate(script["steps"], 1):
+            if on_step_start:
+                await on_step_start(agent)
+            page = await session.get_current_page()
+            if normalize_url(page.url) != normalize_url(step["url"]):
+                raise ReplayDivergedError(f"step {n_steps} expected {step['url']} but the page is at {page.url}")
+            state = await session.get_state_summary(cache_clickable_elements_hashes=False)
+            if on_step:
+                await on_step(state, step, n_steps)
+            for i, recorded in enumerate(step["actions"]):
+                if i > 0:
+                    # Earlier actions of the step may have changed the page
+                    page = await session.get_current_page()
+                    state = await session.get_state_summary(cache_clickable_elements_hashes=False)
+                action = agent.ActionModel.model_validate(recorded["action"])
+                if recorded["element"] is not None:
+                    element = recorded["element"]
+                    action = await agent._update_action_indices(DOMHistoryElement(**element), action, state)
+                    if action is None:
+                        raise ReplayDivergedError(
+                            f"step {n_steps} could not find <{element['tag_name']}> at {element['xpath']} on {page.url}"
+                        )
+                try:
+                    results = await agent.multi_act([action])
+                except Exception as e:
+                    raise ReplayDivergedError(f"step {n_steps} failed: {e}") from e
+                result = results[-1] if results else None
+                if result is None or result.error:
+                    raise ReplayDivergedError(f"step {n_steps} failed: {result.error if result else 'no result'}")
+            if on_step_end:
+                await on_step_end(agent)
+        if result is None or not result.is_done or result.success is False:
+            raise ReplayDivergedError("script ended before the task was done")
+        return result.extracted_content
+
+    @staticmethod
+    def _write(path: Path, script: Dict[str, Any]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(script))
+
+
+# Global replay service instance
+replay_service = ReplayService()
@@ -0,0 +1,70 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+
+
+Closer = Callable[[], Awaitable[None]]
+
+
+class ResourceTracker:
+    """Registry of the browser resources opened for each task.
+
+    Whatever a task opens (its browser context, every page in it) is
+    registered with a close callback. ``close_task`` closes them
+    concurrently within a single deadline, so teardown always finishes in
+    bounded time and one hung page cannot keep the context open. Resources
+    that fail or run out of time are counted as leaked and left to the
+    browser pool, which kills browsers it cannot close and sweeps orphaned
+    Chromium processes.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout if timeout is not None else settings.TEARDOWN_TIMEOUT
+        self._resources: Dict[str, List[Tuple[str, Closer]]] = {}
+        self.registered = 0
+        self.closed = 0
+        self.close_failures = 0
+        self.close_timeouts = 0
+
+    def track(self, task_id: str, kind: str, close: Closer):
+        """Register a resource of a task and how to close it."""
+        self._resources.setdefault(task_id, []).append((kind, close))
+        self.registered += 1
+
+    async def close_task(self, task_id: str) -> int:
+        """Close every resource of a task and return how many could not be closed."""
+        resources = self._resources.pop(task_id, [])
+        if not resources:
+            return 0
+        closing = {asyncio.ensure_future(close()): kind for kind, close in resources}
+        done, pending = await asyncio.wait(closing, timeout=self.timeout)
+
+        leaked = 0
+        for future in pending:
+            future.cancel()
+            self.close_timeouts += 1
+            leaked += 1
+            print(f"Timed out closing {closing[future]} of task {task_id}")
+        for future in done:
+            if future.exception() is None:
+                self.closed += 1
+                continue
+            self.close_failures += 1
+            leaked += 1
+            print(f"Failed to close {closing[future]} of task {task_id}: {future.exception()!r}")
+        return leaked
+
+    def stats(self) -> Dict[str, int]:
+        """Return open resource and teardown counters."""
+        return {
+            "open_resources": sum(len(resources) for resources in self._resources.values()),
+            "registered_resources": self.registered,
+            "closed_resources": self.closed,
+            "close_failures": self.close_failures,
+            "close_timeouts": self.close_timeouts
+        }
+
+
+# Global resource tracker instance
+resource_tracker = ResourceTracker()
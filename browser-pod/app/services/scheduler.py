@@ -0,0 +1,170 @@
+import asyncio
+import bisect
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ..models.requests import RunTaskRequest
+from ..utils.task_manager import task_manager
+from ..config import settings
+from .browser_service import browser_service
+from .metrics import metrics
+
+
+TaskRunner = Callable[[str, RunTaskRequest], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue has reached its configured depth."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Task queue is full")
+        self.retry_after = retry_after
+
+
+class TaskScheduler:
+    """Admission control and bounded dispatch of tasks to a worker pool.
+
+    Tasks are queued by priority and dispatched in submission order within a
+    priority level. Each priority level is worth ``priority_stride`` queue
+    slots, so urgent tasks jump ahead without starving older ones. The
+    queue is kept sorted, so a task's position is a binary search away.
+    
+    Paused tasks are parked and give up their worker slot until resumed, so
+    more tasks can be running than ``max_workers`` while humans inspect
+    paused ones.
+    """
+
+    def __init__(
+        self,
+        runner: TaskRunner,
+        max_workers: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        priority_stride: Optional[int] = None
+    ):
+        self._runner = runner
+        self.max_workers = max_workers if max_workers is not None else settings.MAX_CONCURRENT_TASKS
+        self.max_queue_size = max_queue_size if max_queue_size is not None else settings.MAX_QUEUED_TASKS
+        self.priority_stride = priority_stride if priority_stride is not None else settings.SCHEDULER_PRIORITY_STRIDE
+        self._queue: List[Tuple[int, int, int, str]] = []
+        self._entries: Dict[str, Tuple[int, int, int, str]] = {}
+        self._requests: Dict[str, RunTaskRequest] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._parked: Set[str] = set()
+        self._submitted_at: Dict[str, float] = {}
+        self._counter = itertools.count()
+
+    @property
+    def queued_count(self) -> int:
+        """Number of tasks waiting for a worker."""
+        return len(self._requests)
+
+    @property
+    def parked_count(self) -> int:
+        """Number of paused tasks that gave up their worker slot."""
+        return len(self._parked)
+
+    @property
+    def running_count(self) -> int:
+        """Number of tasks currently holding a worker slot."""
+        return len(self._running) - len(self._parked)
+
+    def ensure_capacity(self):
+        """Raise QueueFullError if no more tasks can be admitted."""
+        if self.running_count < self.max_workers:
+            return
+        if self.queued_count >= self.max_queue_size:
+            raise QueueFullError(settings.QUEUE_RETRY_AFTER)
+
+    def submit(self, task_id: str, request: RunTaskRequest) -> int:
+        """Queue a task for execution and return its queue position (0 if dispatched).
+        
+        Submitting a task that is already queued or running is a no-op.
+        """
+        self._enqueue(task_id, request)
+        self._dispatch()
+        return self.queue_position(task_id)
+
+    def submit_many(self, tasks: List[Tuple[str, RunTaskRequest]]):
+        """Queue a batch of tasks, dispatching once after all of them are queued.
+        
+        A batch admitted by ``ensure_capacity`` is queued whole, even past
+        ``max_queue_size``.
+        """
+        for task_id, request in tasks:
+            self._enqueue(task_id, request)
+        self._dispatch()
+
+    def discard(self, task_id: str) -> bool:
+        """Remove a task from the queue before it is dispatched."""
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return False
+        del self._queue[bisect.bisect_left(self._queue, entry)]
+        self._submitted_at.pop(task_id, None)
+        del self._requests[task_id]
+        return True
+
+    def park(self, task_id: str):
+        """Free the worker slot of a paused task for queued tasks."""
+        if task_id in self._running and task_id not in self._parked:
+            self._parked.add(task_id)
+            self._dispatch()
+
+    def unpark(self, task_id: str):
+        """Let a resumed task hold a worker slot again."""
+        self._parked.discard(task_id)
+
+    def queue_position(self, task_id: str) -> int:
+        """Return the 1-based queue position of a task, or 0 if it is not queued."""
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return 0
+        return bisect.bisect_left(self._queue, entry) + 1
+
+    def _enqueue(self, task_id: str, request: RunTaskRequest):
+        """Push a task onto the queue unless it is already queued or running."""
+        if task_id in self._requests or task_id in self._running:
+            return
+        seq = next(self._counter)
+        priority = request.priority or 0
+        entry = (seq - priority * self.priority_stride, -priority, seq, task_id)
+        bisect.insort(self._queue, entry)
+        self._entries[task_id] = entry
+        self._requests[task_id] = request
+        self._submitted_at[task_id] = time.monotonic()
+
+    def _dispatch(self):
+        """Start queued tasks while worker slots are free."""
+        while self._queue and self.running_count < self.max_workers:
+            *_, task_id = self._queue.pop(0)
+            del self._entries[task_id]
+            request = self._requests.pop(task_id)
+            submitted_at = self._submitted_at.pop(task_id, None)
+            if submitted_at is not None:
+                metrics.task_queue_wait.observe(time.monotonic() - submitted_at)
+
+            task = asyncio.create_task(self._run(task_id, request))
+            self._running[task_id] = task
+            task.add_done_callback(lambda _, task_id=task_id: self._on_done(task_id))
+
+    async def _run(self, task_id: str, request: RunTaskRequest):
+        """Run a dispatched task, keeping failures inside the worker slot."""
+        await task_manager.register_running_task(task_id, asyncio.current_task())
+        try:
+            await self._runner(task_id, request)
+        except Exception:
+            # The runner records failures on the task itself
+            pass
+        finally:
+            await task_manager.unregister_running_task(task_id)
+
+    def _on_done(self, task_id: str):
+        """Release the worker slot of a finished task and dispatch the next one."""
+        self._running.pop(task_id, None)
+        self._parked.discard(task_id)
+        self._dispatch()
+
+
+# Global task scheduler instance
+task_scheduler = TaskScheduler(browser_service.create_and_run_task)
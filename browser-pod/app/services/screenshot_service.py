@@ -0,0 +1,87 @@
+import asyncio
+import base64
+import binascii
+import io
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from ..config import settings
+
+
+# Leading bytes of the image formats browsers produce screenshots in
+IMAGE_SIGNATURES = ((b"\x89PNG", ".png"), (b"\xff\xd8", ".jpg"), (b"RIFF", ".webp"))
+
+THUMBNAIL_SUFFIX = ".thumb.webp"
+
+
+def screenshot_url(screenshot: str) -> str:
+    """URL of a stored screenshot."""
+    return f"/api/v1/screenshots/{screenshot}"
+
+
+def thumbnail_url(screenshot: str) -> str:
+    """URL of the thumbnail of a stored screenshot."""
+    return screenshot_url(str(Path(screenshot).with_suffix(THUMBNAIL_SUFFIX)))
+
+
+class ScreenshotService:
+    """Stores agent screenshots on disk instead of in task data.
+
+    browser-use hands screenshots over as base64 strings of several hundred
+    kilobytes. Each one is decoded once, written as-is to
+    ``<screenshots_path>/<task_id>/<position><ext>`` together with a small
+    WebP thumbnail, and tasks only keep the path relative to
+    ``screenshots_path``.
+    """
+
+    def __init__(self, screenshots_path: Optional[Path] = None, thumbnail_width: Optional[int] = None):
+        self.screenshots_path = screenshots_path or settings.SCREENSHOTS_PATH
+        self.thumbnail_width = (
+            thumbnail_width if thumbnail_width is not None else settings.SCREENSHOT_THUMBNAIL_WIDTH
+        )
+
+    def path(self, screenshot: str) -> Path:
+        """Absolute path of a stored screenshot."""
+        return self.screenshots_path / screenshot
+
+    async def save(self, task_id: str, screenshots: Sequence[str], start: int) -> List[str]:
+        """Write base64 screenshots for a task, numbered from ``start``, and return their paths."""
+        if not screenshots:
+            return []
+        return await asyncio.to_thread(self._save, task_id, screenshots, start)
+
+    def _save(self, task_id: str, screenshots: Sequence[str], start: int) -> List[str]:
+        task_dir = self.screenshots_path / task_id
+        task_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for position, screenshot in enumerate(screenshots, start):
+            try:
+                data = base64.b64decode(screenshot, validate=True)
+            except (binascii.Error, ValueError):
+                print(f"Skipping screenshot {position} of task {task_id}: not valid base64")
+                continue
+            extension = next((ext for signature, ext in IMAGE_SIGNATURES if data.startswith(signature)), ".png")
+            name = f"{position:04d}{extension}"
+            temp = task_dir / f".{name}"
+            temp.write_bytes(data)
+            os.replace(temp, task_dir / name)
+            if self.thumbnail_width:
+                self._write_thumbnail(data, task_dir / f"{position:04d}{THUMBNAIL_SUFFIX}")
+            paths.append(f"{task_id}/{name}")
+        return paths
+
+    def _write_thumbnail(self, data: bytes, target: Path):
+        """Write a downscaled WebP copy of a screenshot, skipping data Pillow cannot read."""
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.thumbnail((self.thumbnail_width, self.thumbnail_width * 4))
+                image.save(target, format="WEBP", quality=75)
+        except (UnidentifiedImageError, OSError) as e:
+            print(f"Could not create thumbnail {target.name}: {e}")
+
+
+# Global screenshot service instance
+screenshot_service = ScreenshotService()
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from ..config import settings
+
+
+# Animation formats and the Pillow writer for each
+TIMELINE_FORMATS = {"gif": "GIF", "webp": "WEBP"}
+
+
+def _frame_path(frames_dir: Path, index: int) -> Path:
+    return frames_dir / f"{index:06d}.png"
+
+
+def render_frames(screenshots: Sequence[Path], frames_dir: Path, start: int, max_width: int, colors: int):
+    """Downscale and palette-quantize screenshot files into frame files.
+
+    Runs in a worker process. Frames are numbered from ``start`` so a
+    running task only ever renders its new screenshots.
+    """
+    from PIL import Image
+
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    for offset, screenshot in enumerate(screenshots):
+        with Image.open(screenshot) as source:
+            image = source.convert("RGB")
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.Resampling.LANCZOS)
+        # Browser pages are mostly flat colors, dithering would only add noise
+        frame = image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        target = _frame_path(frames_dir, start + offset)
+        temp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+        frame.save(temp, format="PNG")
+        os.replace(temp, target)
+
+
+def sample_frames(count: int, max_frames: int) -> List[int]:
+    """Pick at most ``max_frames`` evenly spaced frame indexes, keeping the first and last."""
+    if count <= max_frames:
+        return list(range(count))
+    if max_frames < 2:
+        return [count - 1]
+    step = (count - 1) / (max_frames - 1)
+    return [round(i * step) for i in range(max_frames)]
+
+
+def encode_animation(frames_dir: Path, count: int, target: Path, image_format: str, duration: int, max_frames: int):
+    """Join the first ``count`` frames, sampled down to ``max_frames``, into an animation.
+
+    Runs in a worker process. Frames are read one at a time and their files
+    closed once loaded, so open handles do not grow with the task's steps.
+    """
+    from PIL import Image
+
+    def load(index: int) -> Image.Image:
+        with Image.open(_frame_path(frames_dir, index)) as frame:
+            frame.load()
+            return frame
+
+    indexes = sample_frames(count, max_frames)
+    first = load(indexes[0])
+
+    def rest():
+        for index in indexes[1:]:
+            frame = load(index)
+            # Animations need a single canvas size, pages of different heights are scaled to the first
+            yield frame if frame.size == first.size else frame.resize(first.size)
+
+    temp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+    try:
+        first.save(
+            temp,
+            format=image_format,
+            save_all=True,
+            append_images=rest(),
+            duration=duration,
+            loop=0
+        )
+        os.replace(temp, target)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+class TimelineService:
+    """Builds GIF or animated WebP timelines of task screenshots.
+
+    Encoding runs in a process pool, so large animations never block the
+    event loop. Timelines are built on first request and cached on disk as
+    ``<task_id>/<screenshot count>.<format>``; the downscaled, quantized
+    frames are kept next to them, so a timeline requested again while the
+    task is still running only renders the screenshots taken since. Tasks
+    with more than ``max_frames`` screenshots are sampled evenly. A new
+    timeline replaces the older ones of its format, which ``latest`` maps
+    their names to.
+    """
+
+    def __init__(
+        self,
+        timelines_path: Optional[Path] = None,
+        max_width: Optional[int] = None,
+        colors: Optional[int] = None,
+        frame_duration: Optional[int] = None,
+        workers: Optional[int] = None,
+        max_frames: Optional[int] = None
+    ):
+        self.timelines_path = timelines_path or settings.TIMELINES_PATH
+        self.max_width = max_width if max_width is not None else settings.TIMELINE_MAX_WIDTH
+        self.colors = colors if colors is not None else settings.TIMELINE_COLORS
+        self.frame_duration = frame_duration if frame_duration is not None else settings.TIMELINE_FRAME_DURATION
+        self.workers = workers if workers is not None else settings.TIMELINE_WORKERS
+        self.max_frames = max_frames if max_frames is not None else settings.TIMELINE_MAX_FRAMES
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Coroutines holding or waiting for each task's lock
+        self._lock_users: Dict[str, int] = {}
+
+    async def timeline(self, task_id: str, screenshots: Sequence[Path], extension: str = "gif") -> Optional[Path]:
+        """Return the timeline of a task's screenshot files, building it if needed."""
+        if not screenshots:
+            return None
+        task_dir = self.timelines_path / task_id
+        target = task_dir / f"{len(screenshots)}.{extension}"
+        if target.exists():
+            return target
+
+        lock = self._locks.setdefault(task_id, asyncio.Lock())
+        self._lock_users[task_id] = self._lock_users.get(task_id, 0) + 1
+        try:
+            async with lock:
+                if not target.exists():
+                    await self._build(task_dir, list(screenshots), target, TIMELINE_FORMATS[extension])
+        finally:
+            # A released lock reports unlocked before its waiters wake, so count them instead
+            self._lock_users[task_id] -= 1
+            if not self._lock_users[task_id]:
+                del self._lock_users[task_id]
+                del self._locks[task_id]
+        return target
+
+    def latest(self, task_id: str, file_name: str) -> Optional[Path]:
+        """Return the timeline that replaced an outdated one, or None if there is no newer one."""
+        count, _, extension = file_name.partition(".")
+        task_dir = self.timelines_path / task_id
+        if not count.isdigit() or extension not in TIMELINE_FORMATS or Path(task_id).name != task_id:
+            return None
+        counts = [int(path.stem) for path in task_dir.glob(f"*.{extension}") if path.stem.isdigit()]
+        if not counts or max(counts) <= int(count):
+            return None
+        return task_dir / f"{max(counts)}.{extension}"
+
+    async def _build(self, task_dir: Path, screenshots: List[Path], target: Path, image_format: str):
+        """Render missing frames, encode the animation and drop outdated ones."""
+        frames_dir = task_dir / "frames"
+        rendered = 0
+        while _frame_path(frames_dir, rendered).exists():
+            rendered += 1
+        rendered = min(rendered, len(screenshots))
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        if rendered < len(screenshots):
+            await loop.run_in_executor(
+                executor, render_frames, screenshots[rendered:], frames_dir, rendered, self.max_width, self.colors
+            )
+        await loop.run_in_executor(
+            executor, encode_animation, frames_dir, len(screenshots), target, image_format, self.frame_duration,
+            self.max_frames
+        )
+
+        for old in task_dir.glob(f"*{target.suffix}"):
+            if old != target:
+                old.unlink(missing_ok=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def close(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global timeline service instance
+timeline_service = TimelineService()
@@ -0,0 +1,126 @@
+import functools
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from ..config import settings
+
+
+# Agent actions whose time is spent loading pages
+NAVIGATION_ACTIONS = {"go_to_url", "go_back", "search_google", "open_tab", "switch_tab"}
+
+
+class TaskTrace:
+    """Ring buffer of the spans recorded for one task.
+
+    Spans are stored as Chrome trace "complete" events; once ``max_events``
+    are held the oldest are dropped, so long tasks keep their latest steps.
+    """
+
+    def __init__(self, task_id: str, max_events: int):
+        self.task_id = task_id
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.dropped = 0
+
+    def add(self, name: str, category: str, start: float, end: float, args: Optional[Dict[str, Any]] = None):
+        """Record a span between two ``time.monotonic()`` readings."""
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(start * 1_000_000),
+            "dur": round((end - start) * 1_000_000),
+            "pid": os.getpid(),
+            "tid": 1
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Return the trace in the Chrome trace event format."""
+        metadata = {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": 1, "args": {"name": self.task_id}}
+        return {
+            "traceEvents": [metadata, *self.events],
+            "displayTimeUnit": "ms",
+            "otherData": {"task_id": self.task_id, "dropped_events": self.dropped}
+        }
+
+
+class TraceService:
+    """Records span timelines of task execution.
+
+    Traces are kept for the ``max_tasks`` most recently started tasks, each
+    bounded to ``max_events`` spans. Agent phases are traced by wrapping the
+    agent's browser state, LLM and action methods on the instance, so the
+    agent itself needs no changes.
+    """
+
+    def __init__(self, max_events: Optional[int] = None, max_tasks: Optional[int] = None):
+        self.max_events = max_events if max_events is not None else settings.TRACE_MAX_EVENTS
+        self.max_tasks = max_tasks if max_tasks is not None else settings.TRACE_MAX_TASKS
+        self._traces: "OrderedDict[str, TaskTrace]" = OrderedDict()
+
+    def start(self, task_id: str) -> TaskTrace:
+        """Begin a new trace for a task, dropping the oldest one if too many are kept."""
+        trace = TaskTrace(task_id, self.max_events)
+        self._traces[task_id] = trace
+        self._traces.move_to_end(task_id)
+        while len(self._traces) > self.max_tasks:
+            self._traces.popitem(last=False)
+        return trace
+
+    def get(self, task_id: str) -> Optional[TaskTrace]:
+        """Return the trace of a task, if it is still kept."""
+        return self._traces.get(task_id)
+
+    def add(self, task_id: str, name: str, category: str, start: float, end: Optional[float] = None, **args: Any):
+        """Record a span of a task that has a trace; ``end`` defaults to now."""
+        trace = self._traces.get(task_id)
+        if trace is not None:
+            trace.add(name, category, start, end if end is not None else time.monotonic(), args)
+
+    @asynccontextmanager
+    async def span(self, task_id: str, name: str, category: str, **args: Any):
+        """Record the time spent inside the block as a span."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(task_id, name, category, start, **args)
+
+    def instrument_agent(self, task_id: str, agent: Any):
+        """Trace the browser state, LLM and action phases of every agent step."""
+        self._wrap(agent, "_get_browser_state_with_recovery", task_id, lambda *_, **__: ("browser state", "extract"))
+        self._wrap(agent, "_get_model_output_with_retry", task_id, lambda *_, **__: ("llm", "llm"))
+        controller = getattr(agent, "controller", None)
+        if controller is not None:
+            self._wrap(controller, "act", task_id, self._action_span)
+
+    @staticmethod
+    def _action_span(action: Any, *_: Any, **__: Any):
+        names = [name for name, params in action.model_dump(exclude_unset=True).items() if params is not None]
+        name = names[0] if names else "action"
+        return name, "navigate" if name in NAVIGATION_ACTIONS else "action"
+
+    def _wrap(self, owner: Any, method_name: str, task_id: str, describe):
+        """Replace an async method on an instance with one recording a span per call."""
+        method = getattr(owner, method_name, None)
+        if method is None:
+            return
+
+        @functools.wraps(method)
+        async def traced(*args, **kwargs):
+            name, category = describe(*args, **kwargs)
+            async with self.span(task_id, name, category):
+                return await method(*args, **kwargs)
+
+        setattr(owner, method_name, traced)
+
+
+# Global trace service instance
+trace_service = TraceService()
@@ -0,0 +1,350 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+from ..config import settings
+
+
+class UploadError(Exception):
+    """Base class for rejected uploads."""
+
+
+class UploadTooLargeError(UploadError):
+    """Raised as soon as an upload exceeds the maximum file size."""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File too large. Maximum size is {max_size // (1024*1024)}MB")
+
+
+class UploadOffsetError(UploadError):
+    """Raised when a resumed upload does not continue where the stored part ends."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload must resume at offset {offset}")
+        self.offset = offset
+
+
+class ChecksumMismatchError(UploadError):
+    """Raised when the received file does not match the checksum sent by the client."""
+
+    def __init__(self):
+        super().__init__("Checksum mismatch")
+
+
+@dataclass
+class UploadResult:
+    """Outcome of writing an upload or one part of it."""
+    filename: str
+    size: int
+    complete: bool
+    sha256: Optional[str] = None
+
+
+@dataclass
+class UploadChallenge:
+    """Byte range of a stored blob a client must hash to prove it has the content."""
+    sha256: str
+    offset: int
+    length: int
+    nonce: str
+    expires_at: float
+
+
+class UploadService:
+    """Streams uploads to disk in fixed-size chunks.
+
+    Bodies are never held in memory: chunks are buffered up to
+    ``chunk_size`` and written from a worker thread, the SHA-256 is computed
+    as data arrives, and the size limit is enforced while streaming. Files
+    are written under ``partial_path`` and renamed into ``uploads_path``
+    only once complete, so readers never see a half-written upload.
+
+    Uploads sent in several requests with ``Content-Range`` are appended to
+    a ``.part`` file that survives restarts; the hash state of the parts
+    received so far is kept in memory and rebuilt from disk if lost.
+
+    Contents are stored once, as blobs named by their SHA-256 under
+    ``blobs_path``. Each upload name is a hard link to its blob, so the
+    blob's link count is its reference count and names keep working as
+    plain files. A blob is deleted once replacing an upload name leaves it
+    unreferenced. A client only gets a new name for a stored blob after
+    answering a challenge: hashing a random byte range of the content with
+    a nonce, so knowing a file's SHA-256 is not enough to read it.
+    """
+
+    def __init__(
+        self,
+        uploads_path: Optional[Path] = None,
+        partial_path: Optional[Path] = None,
+        blobs_path: Optional[Path] = None,
+        max_size: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        proof_size: Optional[int] = None,
+        proof_ttl: Optional[int] = None
+    ):
+        self.uploads_path = uploads_path or settings.UPLOADS_PATH
+        self.partial_path = partial_path or settings.PARTIAL_UPLOADS_PATH
+        self.blobs_path = blobs_path or settings.BLOBS_PATH
+        self.max_size = max_size if max_size is not None else settings.MAX_FILE_SIZE
+        self.chunk_size = chunk_size if chunk_size is not None else settings.UPLOAD_CHUNK_SIZE
+        self.proof_size = proof_size if proof_size is not None else settings.UPLOAD_PROOF_SIZE
+        self.proof_ttl = proof_ttl if proof_ttl is not None else settings.UPLOAD_PROOF_TTL
+        self._challenges: Dict[str, UploadChallenge] = {}
+        self._hashes: Dict[str, Any] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Serializes linking and sweeping so a new blob is never swept before it is linked
+        self._blob_lock = asyncio.Lock()
+
+    def validate_filename(self, filename: str) -> str:
+        """Reject file names that would escape the uploads directory."""
+        if not filename or Path(filename).name != filename or filename.startswith("."):
+            raise UploadError("Invalid file name")
+        return filename
+
+    def resolve(self, filename: str) -> Optional[Path]:
+        """Return the path of an uploaded file, or None if there is no such upload."""
+        try:
+            path = self.uploads_path / self.validate_filename(filename)
+        except UploadError:
+            return None
+        return path if path.is_file() else None
+
+    def blob_path(self, sha256: str) -> Path:
+        """Path of the blob holding content with a SHA-256."""
+        return self.blobs_path / sha256[:2] / sha256
+
+    def refcount(self, sha256: str) -> int:
+        """Number of upload names referencing a blob."""
+        blob = self.blob_path(sha256.lower())
+        return blob.stat().st_nlink - 1 if blob.exists() else 0
+
+    def challenge(self, sha256: str, filename: str) -> Optional[UploadChallenge]:
+        """Pick the byte range a client must hash to link an upload name to a stored blob.
+
+        Returns None if no blob holds the content.
+        """
+        self.validate_filename(filename)
+        blob = self.blob_path(sha256.lower())
+        if not blob.exists():
+            return None
+        now = time.monotonic()
+        for name in [name for name, pending in self._challenges.items() if pending.expires_at <= now]:
+            del self._challenges[name]
+        size = blob.stat().st_size
+        length = min(size, self.proof_size)
+        challenge = UploadChallenge(
+            sha256=sha256.lower(),
+            offset=secrets.randbelow(size - length + 1),
+            length=length,
+            nonce=secrets.token_hex(16),
+            expires_at=now + self.proof_ttl
+        )
+        self._challenges[filename] = challenge
+        return challenge
+
+    async def link_proven(self, filename: str, proof: str) -> bool:
+        """Link an upload name to the blob of its challenge if ``proof`` answers it.
+
+        ``proof`` is the SHA-256 of the nonce followed by the challenged bytes.
+        A challenge can be answered once; False means the file must be uploaded.
+        """
+        self.validate_filename(filename)
+        challenge = self._challenges.pop(filename, None)
+        if challenge is None or challenge.expires_at <= time.monotonic():
+            return False
+        blob = self.blob_path(challenge.sha256)
+        async with self._blob_lock:
+            if not blob.exists():
+                return False
+            expected = await asyncio.to_thread(self._proof, blob, challenge)
+            if not hmac.compare_digest(expected, proof.lower()):
+                return False
+            await asyncio.to_thread(self._link, blob, filename)
+        return True
+
+    def received(self, filename: str) -> int:
+        """Return how many bytes of a resumable upload have been stored."""
+        part = self._part_path(self.validate_filename(filename))
+        return part.stat().st_size if part.exists() else 0
+
+    async def write(
+        self,
+        filename: str,
+        chunks: AsyncIterator[bytes],
+        expected_sha256: Optional[str] = None
+    ) -> UploadResult:
+        """Stream a whole file to disk and move it into place."""
+        self.validate_filename(filename)
+        temp_path = self.partial_path / f"{filename}.{uuid.uuid4().hex}.tmp"
+        try:
+            size, hasher = await self._stream(temp_path, chunks, 0, hashlib.sha256())
+            return await self._complete(filename, temp_path, size, hasher, expected_sha256)
+        finally:
+            await asyncio.to_thread(temp_path.unlink, missing_ok=True)
+
+    async def write_range(
+        self,
+        filename: str,
+        chunks: AsyncIterator[bytes],
+        start: int,
+        end: int,
+        total: Optional[int],
+        expected_sha256: Optional[str] = None
+    ) -> UploadResult:
+        """Append one ``Content-Range`` part of a resumable upload.
+
+        The part must start where the stored data ends and span ``start`` to
+        ``end`` inclusive. The file is moved into place once ``total`` bytes
+        have been received.
+        """
+        self.validate_filename(filename)
+        if total is not None and total > self.max_size:
+            raise UploadTooLargeError(self.max_size)
+
+        lock = self._locks.setdefault(filename, asyncio.Lock())
+        async with lock:
+            part_path = self._part_path(filename)
+            offset = self.received(filename)
+            if start != offset:
+                raise UploadOffsetError(offset)
+
+            hasher = self._hashes.pop(filename, None)
+            if hasher is None:
+                hasher = await asyncio.to_thread(self._hash_file, part_path)
+
+            try:
+                size, hasher = await self._stream(part_path, chunks, offset, hasher)
+            except UploadTooLargeError:
+                await asyncio.to_thread(part_path.unlink, missing_ok=True)
+                raise
+
+            if size != end + 1 or (total is not None and size > total):
+                await asyncio.to_thread(os.truncate, part_path, offset)
+                raise UploadError("Content-Range does not match the request body")
+
+            if total is None or size < total:
+                self._hashes[filename] = hasher
+                return UploadResult(filename=filename, size=size, complete=False)
+
+            try:
+                return await self._complete(filename, part_path, size, hasher, expected_sha256)
+            finally:
+                await asyncio.to_thread(part_path.unlink, missing_ok=True)
+                self._locks.pop(filename, None)
+
+    async def _stream(self, path: Path, chunks: AsyncIterator[bytes], offset: int, hasher: Any) -> Tuple[int, Any]:
+        """Append chunks to a file off the event loop and return the new size and hash."""
+        size = offset
+        buffer = bytearray()
+        file = await asyncio.to_thread(open, path, "ab")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > self.max_size:
+                    raise UploadTooLargeError(self.max_size)
+                hasher.update(chunk)
+                buffer += chunk
+                if len(buffer) >= self.chunk_size:
+                    await asyncio.to_thread(file.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(file.write, bytes(buffer))
+        except BaseException:
+            # Whatever reached the file stays, the hash is rebuilt from disk on resume
+            await asyncio.to_thread(file.close)
+            raise
+        await asyncio.to_thread(self._close, file)
+        return size, hasher
+
+    async def _complete(
+        self,
+        filename: str,
+        path: Path,
+        size: int,
+        hasher: Any,
+        expected_sha256: Optional[str]
+    ) -> UploadResult:
+        """Verify the checksum, store the file as a blob unless it exists and link the name to it."""
+        digest = hasher.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != digest:
+            raise ChecksumMismatchError()
+        async with self._blob_lock:
+            await asyncio.to_thread(self._store_blob, path, digest, filename)
+        return UploadResult(filename=filename, size=size, complete=True, sha256=digest)
+
+    def _store_blob(self, path: Path, sha256: str, filename: str):
+        """Move a finished file into the blob store and link an upload name to it."""
+        blob = self.blob_path(sha256)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, blob)
+        self._link(blob, filename)
+
+    def _link(self, blob: Path, filename: str):
+        """Atomically point an upload name at a blob, deleting the blob it replaced if now unreferenced."""
+        target = self.uploads_path / filename
+        if target.exists() and os.path.samefile(blob, target):
+            return
+        # Keeps the replaced blob open, so it can be found by content once the name is gone
+        replaced = open(target, "rb") if target.exists() else None
+        temp = self.uploads_path / f".{filename}.{uuid.uuid4().hex}"
+        try:
+            os.link(blob, temp)
+            os.replace(temp, target)
+        finally:
+            if temp.exists():
+                temp.unlink()
+        if replaced is not None:
+            with replaced:
+                self._sweep(replaced)
+
+    def _sweep(self, file: BinaryIO):
+        """Delete the blob of a replaced upload if no upload name links to it any more."""
+        if os.fstat(file.fileno()).st_nlink != 1:
+            return
+        hasher = hashlib.sha256()
+        for block in iter(lambda: file.read(self.chunk_size), b""):
+            hasher.update(block)
+        blob = self.blob_path(hasher.hexdigest())
+        if blob.exists() and os.stat(blob).st_ino == os.fstat(file.fileno()).st_ino:
+            blob.unlink()
+
+    @staticmethod
+    def _proof(blob: Path, challenge: UploadChallenge) -> str:
+        """Hash the nonce and byte range of a challenge."""
+        hasher = hashlib.sha256(challenge.nonce.encode())
+        with open(blob, "rb") as f:
+            f.seek(challenge.offset)
+            hasher.update(f.read(challenge.length))
+        return hasher.hexdigest()
+
+    def _part_path(self, filename: str) -> Path:
+        """Path of the stored parts of a resumable upload."""
+        return self.partial_path / f"{filename}.part"
+
+    def _hash_file(self, path: Path) -> Any:
+        """Rebuild the hash of a stored part, e.g. after a restart."""
+        hasher = hashlib.sha256()
+        if path.exists():
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(self.chunk_size), b""):
+                    hasher.update(block)
+        return hasher
+
+    @staticmethod
+    def _close(file: BinaryIO):
+        """Flush a file to disk and close it."""
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+
+
+# Global upload service instance
+upload_service = UploadService()
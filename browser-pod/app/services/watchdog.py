@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Optional
+
+from ..config import settings
+
+
+# Seconds a cancelled agent gets to unwind before the watchdog gives up on it
+CANCEL_GRACE_SECONDS = 10
+
+
+class TaskTimeoutError(Exception):
+    """Raised when a task exceeds one of its time limits."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Timed out: {reason}")
+        self.reason = reason
+
+
+class TaskWatchdog:
+    """Enforces the time limits of one agent run.
+
+    Three limits apply, each disabled when 0:
+
+    - ``timeout``: wall-clock time of the whole run, paused time included,
+      so a task can never hold a worker slot longer than this.
+    - ``step_timeout``: time spent inside a single agent step.
+    - ``idle_timeout``: time spent outside any step without the agent
+      starting the next one, e.g. stuck in setup or between steps.
+
+    The agent reports steps through ``step_started`` and ``step_finished``,
+    which fit its ``on_step_start``/``on_step_end`` hooks. While
+    ``pause_event`` is cleared the step and idle clocks stand still.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        step_timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        check_interval: Optional[float] = None,
+        pause_event: Optional[asyncio.Event] = None
+    ):
+        self.timeout = timeout if timeout is not None else settings.TASK_TIMEOUT
+        self.step_timeout = step_timeout if step_timeout is not None else settings.TASK_STEP_TIMEOUT
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.TASK_IDLE_TIMEOUT
+        self.check_interval = check_interval if check_interval is not None else settings.TASK_WATCHDOG_INTERVAL
+        self.pause_event = pause_event
+        self.started_at = time.monotonic()
+        self.steps = 0
+        self._in_step = False
+        self._since = self.started_at
+
+    async def step_started(self, *_: Any):
+        """Agent hook called before each step."""
+        self._in_step = True
+        self._since = time.monotonic()
+
+    async def step_finished(self, *_: Any):
+        """Agent hook called after each step."""
+        self._in_step = False
+        self.steps += 1
+        self._since = time.monotonic()
+
+    def expired(self, now: Optional[float] = None) -> Optional[str]:
+        """Return why the run has exceeded a limit, or None while it is within them."""
+        now = now if now is not None else time.monotonic()
+        if self.timeout and now - self.started_at > self.timeout:
+            return f"task exceeded its {self.timeout:g}s time limit after {self.steps} steps"
+        if self.pause_event is not None and not self.pause_event.is_set():
+            self._since = now
+            return None
+        if self._in_step and self.step_timeout and now - self._since > self.step_timeout:
+            return f"step {self.steps + 1} exceeded the {self.step_timeout:g}s step time limit"
+        if not self._in_step and self.idle_timeout and now - self._since > self.idle_timeout:
+            return f"no progress for {self.idle_timeout:g}s after {self.steps} steps"
+        return None
+
+    async def run(self, awaitable: Awaitable[Any]) -> Any:
+        """Await an agent run, cancelling it and raising TaskTimeoutError once a limit is hit."""
+        run = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                done, _ = await asyncio.wait({run}, timeout=self.check_interval)
+                if done:
+                    return run.result()
+                reason = self.expired()
+                if reason:
+                    run.cancel()
+                    await asyncio.wait({run}, timeout=CANCEL_GRACE_SECONDS)
+                    raise TaskTimeoutError(reason)
+        except asyncio.CancelledError:
+            # Stopping the task must stop the agent too
+            run.cancel()
+            raise
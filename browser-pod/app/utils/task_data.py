@@ -0,0 +1,167 @@
+import asyncio
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
+from ..models.enums import TaskStatusEnum
+
+
+# Statuses a task never leaves once reached
+TERMINAL_STATUSES = (TaskStatusEnum.FINISHED, TaskStatusEnum.STOPPED, TaskStatusEnum.FAILED)
+
+
+@dataclass(slots=True, frozen=True)
+class TaskStep:
+    """One step of a task execution."""
+    evaluation_previous_goal: str = ""
+    next_goal: str = ""
+    url: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TaskStep":
+        """Build a step from a step dict, ignoring unknown keys."""
+        return cls(
+            evaluation_previous_goal=data.get("evaluation_previous_goal", ""),
+            next_goal=data.get("next_goal", ""),
+            url=data.get("url", "")
+        )
+
+    def to_dict(self) -> Dict[str, str]:
+        """Return the step as a dict."""
+        return {
+            "evaluation_previous_goal": self.evaluation_previous_goal,
+            "next_goal": self.next_goal,
+            "url": self.url
+        }
+
+
+class StepLog:
+    """Append-only, column-oriented log of task steps.
+
+    Steps are stored as three parallel columns of strings with URLs
+    interned, since consecutive steps usually stay on the same page.
+    Snapshots share the columns: appending to the newest log extends them
+    in place and returns a longer view, so older snapshots keep seeing
+    only their own steps.
+    """
+
+    __slots__ = ("_columns", "_length")
+
+    def __init__(self, steps: Iterable[TaskStep] = ()):
+        self._columns: Optional[Tuple[List[str], List[str], List[str]]] = None
+        self._length = 0
+        for step in steps:
+            self._extend(step)
+
+    def append(self, step: TaskStep) -> "StepLog":
+        """Return a new log with a step added at the end."""
+        log = StepLog.__new__(StepLog)
+        if self._columns is not None and len(self._columns[0]) == self._length:
+            log._columns = self._columns
+        else:
+            # Another log already appended to the shared columns, so fork them
+            log._columns = tuple(column[:self._length] for column in self._columns or ([], [], []))
+        log._length = self._length
+        log._extend(step)
+        return log
+
+    def _extend(self, step: TaskStep):
+        """Add a step to the columns."""
+        if self._columns is None:
+            self._columns = ([], [], [])
+        evaluations, goals, urls = self._columns
+        evaluations.append(step.evaluation_previous_goal)
+        goals.append(step.next_goal)
+        urls.append(sys.intern(step.url))
+        self._length += 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> TaskStep:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("step index out of range")
+        evaluations, goals, urls = self._columns
+        return TaskStep(evaluations[index], goals[index], urls[index])
+
+    def __iter__(self) -> Iterator[TaskStep]:
+        if self._columns is None:
+            return iter(())
+        evaluations, goals, urls = self._columns
+        return (
+            TaskStep(evaluations[i], goals[i], urls[i])
+            for i in range(self._length)
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (StepLog, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"StepLog({list(self)!r})"
+
+
+@dataclass(slots=True)
+class TaskData:
+    """In-memory task data snapshot, replaced rather than mutated on update.
+
+    Snapshots share everything they did not change, so file lists are
+    tuples and steps an append-only StepLog.
+    """
+    id: str
+    task: str
+    status: TaskStatusEnum
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    output: Optional[str] = None
+    steps: StepLog = field(default_factory=StepLog)
+    screenshots: Tuple[str, ...] = ()
+    recordings: Tuple[str, ...] = ()
+    output_files: Tuple[str, ...] = ()
+    user_uploaded_files: Tuple[str, ...] = ()
+    browser_data: Optional[Dict[str, Any]] = None
+    live_url: Optional[str] = None
+    public_share_url: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    batch_id: Optional[str] = None
+    agent_instance: Optional[Any] = None  # Browser-use Agent instance
+    cancel_event: Optional[asyncio.Event] = None
+    pause_event: Optional[asyncio.Event] = None
+
+
+@dataclass(slots=True)
+class TaskBatch:
+    """Tasks submitted together, with how many of them are in each status."""
+    id: str
+    created_at: datetime
+    task_ids: Tuple[str, ...]
+    status_counts: Counter = field(default_factory=Counter)
+    finished_at: Optional[datetime] = None
+
+    @property
+    def done(self) -> bool:
+        """Whether every task of the batch reached a terminal status."""
+        return sum(self.status_counts[status] for status in TERMINAL_STATUSES) == len(self.task_ids)
+
+
+def compact_task(task_data: TaskData) -> TaskData:
+    """Return a summary of a finished task without its steps, screenshots or live objects."""
+    return TaskData(
+        id=task_data.id,
+        task=task_data.task,
+        status=task_data.status,
+        created_at=task_data.created_at,
+        finished_at=task_data.finished_at,
+        output=task_data.output,
+        recordings=task_data.recordings,
+        output_files=task_data.output_files,
+        user_uploaded_files=task_data.user_uploaded_files,
+        live_url=task_data.live_url,
+        public_share_url=task_data.public_share_url,
+        idempotency_key=task_data.idempotency_key,
+        batch_id=task_data.batch_id
+    )
@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..models.responses import TaskStepResponse
+from ..services.screenshot_service import screenshot_url
+from .task_data import TaskData, TERMINAL_STATUSES
+
+
+# Comment frame sent while no events arrive, keeping proxies from closing the stream
+KEEP_ALIVE = b": keep-alive\n\n"
+END = b"event: end\ndata: {}\n\n"
+
+TERMINAL_STATUS_VALUES = {status.value for status in TERMINAL_STATUSES}
+
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> bytes:
+    """Encode an event as a Server-Sent Events frame."""
+    frame = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    if event_id is not None:
+        frame = f"id: {event_id}\n{frame}"
+    return frame.encode()
+
+
+class TaskEventChannel:
+    """Recent events of one task, shared by everyone watching it.
+
+    Events are encoded once when published and every viewer reads the same
+    frames. ``origin`` is the last event ID issued before the channel was
+    created and ``floor`` the newest ID no longer in the history, so a
+    viewer can only catch up from an ID at or after the floor.
+    """
+
+    def __init__(self, history: int, origin: int):
+        self.events: Deque[Tuple[int, bytes]] = deque(maxlen=history)
+        self.origin = origin
+        self.floor = origin
+        self.last_id = origin
+        self.closed = False
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+
+    def publish(self, event_id: int, frame: bytes):
+        """Append an event and wake every viewer."""
+        if len(self.events) == self.events.maxlen:
+            self.floor = self.events[0][0]
+        self.events.append((event_id, frame))
+        self.last_id = event_id
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def since(self, event_id: int) -> Optional[List[Tuple[int, bytes]]]:
+        """Return events after an ID, or None if the history no longer reaches back to it."""
+        if event_id < self.floor or event_id > self.last_id:
+            return None
+        return [event for event in self.events if event[0] > event_id]
+
+
+class TaskEventBroadcaster:
+    """Fans out task changes to Server-Sent Events viewers.
+
+    Channels only exist for tasks someone has watched, so unwatched tasks
+    cost nothing. Event IDs are unique across tasks, which lets a viewer
+    resume with ``Last-Event-ID`` as long as the event is still in the
+    channel history, and fall back to a full snapshot otherwise.
+    """
+
+    def __init__(self, history: Optional[int] = None, heartbeat: Optional[float] = None):
+        self.history = history if history is not None else settings.TASK_EVENTS_HISTORY
+        self.heartbeat = heartbeat if heartbeat is not None else settings.TASK_EVENTS_HEARTBEAT
+        self._channels: Dict[str, TaskEventChannel] = {}
+        self._ids = itertools.count(1)
+        self._last_id = 0
+
+    def publish_changes(self, old: TaskData, new: TaskData):
+        """Publish the differences between two snapshots of a task to its viewers."""
+        channel = self._channels.get(new.id)
+        if channel is None or channel.closed:
+            return
+
+        for position in range(len(old.steps), len(new.steps)):
+            step = new.steps[position]
+            self._publish(channel, "step", TaskStepResponse(
+                id=str(position),
+                step=position + 1,
+                evaluation_previous_goal=step.evaluation_previous_goal,
+                next_goal=step.next_goal,
+                url=step.url
+            ).model_dump())
+        for position in range(len(old.screenshots), len(new.screenshots)):
+            self._publish(channel, "screenshot", {
+                "index": position,
+                "url": screenshot_url(new.screenshots[position])
+            })
+        if new.output != old.output and new.status == old.status:
+            self._publish(channel, "output", {"output": new.output})
+        if new.status != old.status:
+            self._publish(channel, "status", {
+                "status": new.status.value,
+                "finished_at": new.finished_at.isoformat() if new.finished_at else None,
+                "output": new.output
+            })
+            if new.status in TERMINAL_STATUSES:
+                channel.closed = True
+                channel.changed.set()
+                self._release(new.id, channel)
+
+    async def stream(
+        self,
+        task_id: str,
+        snapshot: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        last_event_id: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield SSE frames for a task until it reaches a terminal status.
+
+        Viewers resuming from a ``last_event_id`` still in the history get the
+        events they missed; everyone else starts with a ``snapshot`` event
+        holding the full task. Deltas may repeat what a snapshot already
+        contains, steps carry their number so clients can skip duplicates.
+        """
+        channel = self._channels.get(task_id)
+        if channel is None:
+            channel = self._channels[task_id] = TaskEventChannel(self.history, self._last_id)
+        channel.subscribers += 1
+        try:
+            # Only IDs issued by this channel can be resumed from
+            missed = None
+            if last_event_id is not None and last_event_id > channel.origin:
+                missed = channel.since(last_event_id)
+            if missed is None:
+                cursor = channel.last_id
+                data = await snapshot()
+                if data is None:
+                    return
+                yield format_event("snapshot", data, cursor)
+                if data["status"] in TERMINAL_STATUS_VALUES:
+                    # Nothing will be published for this task any more
+                    channel.closed = True
+                    yield END
+                    return
+            else:
+                cursor = last_event_id
+
+            while True:
+                changed = channel.changed
+                pending = channel.since(cursor)
+                if pending is None:
+                    # Fell further behind than the history, start over from a snapshot
+                    cursor = channel.last_id
+                    data = await snapshot()
+                    if data is None:
+                        return
+                    yield format_event("snapshot", data, cursor)
+                    continue
+
+                for event_id, frame in pending:
+                    yield frame
+                    cursor = event_id
+                if channel.closed and cursor == channel.last_id:
+                    yield END
+                    return
+                if not pending:
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=self.heartbeat)
+                    except asyncio.TimeoutError:
+                        yield KEEP_ALIVE
+        finally:
+            channel.subscribers -= 1
+            self._release(task_id, channel)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of watched tasks and viewers."""
+        return {
+            "channels": len(self._channels),
+            "subscribers": sum(channel.subscribers for channel in self._channels.values())
+        }
+
+    def _publish(self, channel: TaskEventChannel, event: str, data: Dict[str, Any]):
+        """Encode an event once and add it to a channel."""
+        event_id = next(self._ids)
+        self._last_id = event_id
+        channel.publish(event_id, format_event(event, data, event_id))
+
+    def _release(self, task_id: str, channel: TaskEventChannel):
+        """Drop a finished task's channel once nobody is watching it."""
+        if channel.closed and channel.subscribers == 0 and self._channels.get(task_id) is channel:
+            del self._channels[task_id]
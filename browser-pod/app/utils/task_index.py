@@ -0,0 +1,93 @@
+import bisect
+import itertools
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ..models.enums import TaskStatusEnum
+
+
+IndexKey = Tuple[datetime, int, str]
+
+
+class TaskIndex:
+    """Creation-ordered index of task IDs with secondary indexes by status.
+
+    Every index is a list of ``(created_at, sequence, task_id)`` keys kept in
+    ascending order, so a page is a slice and a cursor is a binary search.
+    New tasks are almost always appended at the end.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, IndexKey] = {}
+        self._statuses: Dict[str, TaskStatusEnum] = {}
+        self._all: List[IndexKey] = []
+        self._by_status: Dict[TaskStatusEnum, List[IndexKey]] = defaultdict(list)
+        self._counter = itertools.count()
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._keys
+
+    def add(self, task_id: str, created_at: datetime, status: TaskStatusEnum):
+        """Index a new task."""
+        key = (created_at, next(self._counter), task_id)
+        self._keys[task_id] = key
+        self._statuses[task_id] = status
+        bisect.insort(self._all, key)
+        bisect.insort(self._by_status[status], key)
+
+    def remove(self, task_id: str):
+        """Drop a task from every index."""
+        key = self._keys.pop(task_id, None)
+        if key is None:
+            return
+        status = self._statuses.pop(task_id)
+        self._discard(self._all, key)
+        self._discard(self._by_status[status], key)
+
+    def set_status(self, task_id: str, status: TaskStatusEnum):
+        """Move a task to the index of its new status."""
+        key = self._keys.get(task_id)
+        old_status = self._statuses.get(task_id)
+        if key is None or old_status == status:
+            return
+        self._discard(self._by_status[old_status], key)
+        bisect.insort(self._by_status[status], key)
+        self._statuses[task_id] = status
+
+    def count(self, status: Optional[TaskStatusEnum] = None) -> int:
+        """Number of indexed tasks, optionally only those with a status."""
+        return len(self._index(status))
+
+    def page(self, offset: int, limit: int, status: Optional[TaskStatusEnum] = None) -> List[str]:
+        """Return task IDs newest first, skipping ``offset`` tasks."""
+        keys = self._index(status)
+        end = len(keys) - offset
+        if end <= 0:
+            return []
+        return [key[2] for key in reversed(keys[max(end - limit, 0):end])]
+
+    def before(self, task_id: str, limit: int, status: Optional[TaskStatusEnum] = None) -> List[str]:
+        """Return task IDs newest first that were created before the cursor task."""
+        keys = self._index(status)
+        end = bisect.bisect_left(keys, self._keys[task_id])
+        return [key[2] for key in reversed(keys[max(end - limit, 0):end])]
+
+    def created_before(self, created_at: datetime, limit: int, status: Optional[TaskStatusEnum] = None) -> List[str]:
+        """Return task IDs newest first that were created before a time, e.g. of a task no longer indexed."""
+        keys = self._index(status)
+        end = bisect.bisect_left(keys, (created_at,))
+        return [key[2] for key in reversed(keys[max(end - limit, 0):end])]
+
+    def _index(self, status: Optional[TaskStatusEnum]) -> List[IndexKey]:
+        """Return the index for a status, or the index of all tasks."""
+        if status is None:
+            return self._all
+        return self._by_status.get(status, [])
+
+    @staticmethod
+    def _discard(keys: List[IndexKey], key: IndexKey):
+        """Remove a key from a sorted index."""
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
@@ -1,176 +1,414 @@
 import asyncio
+import time
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field
+import zlib
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from dataclasses import replace
 from ..models.enums import TaskStatusEnum
+from ..config import settings
 from ..models.responses import TaskResponse, TaskSimpleResponse, TaskStepResponse
+from ..services.metrics import metrics
+from ..services.replay_service import replay_service
+from .task_data import TaskBatch, TaskData, TaskStep, TERMINAL_STATUSES
+from .task_events import TaskEventBroadcaster
+from .task_store import TaskStore, create_task_store
 
 
-@dataclass
-class TaskData:
-    """In-memory task data structure."""
-    id: str
-    task: str
-    status: TaskStatusEnum
-    created_at: datetime
-    finished_at: Optional[datetime] = None
-    output: Optional[str] = None
-    steps: List[Dict[str, Any]] = field(default_factory=list)
-    screenshots: List[str] = field(default_factory=list)
-    recordings: List[str] = field(default_factory=list)
-    output_files: List[str] = field(default_factory=list)
-    user_uploaded_files: List[str] = field(default_factory=list)
-    browser_data: Optional[Dict[str, Any]] = None
-    live_url: Optional[str] = None
-    public_share_url: Optional[str] = None
-    agent_instance: Optional[Any] = None  # Browser-use Agent instance
-    cancel_event: Optional[asyncio.Event] = None
-    pause_event: Optional[asyncio.Event] = None
+# Number of lock shards serializing task updates
+LOCK_SHARDS = 64
 
 
 class TaskManager:
-    """In-memory task manager for handling task lifecycle."""
+    """Task manager for handling task lifecycle.
     
-    def __init__(self):
-        self._tasks: Dict[str, TaskData] = {}
+    Tasks are stored as snapshots that are never mutated in place: every
+    update publishes a new TaskData, so reads need no lock and always see a
+    consistent task. Updates are serialized by one of a fixed set of
+    sharded locks, so agents writing different tasks rarely wait on each
+    other. Snapshots live in a pluggable TaskStore.
+    
+    A background reaper evicts finished tasks from memory once they are
+    older than ``retention_seconds`` or more than ``retention_max_count``
+    finished tasks are held in full, and deletes evicted summaries after
+    ``summary_retention_seconds``.
+    
+    Every update is also published to ``events``, which streams it to
+    anyone watching the task.
+    
+    Tasks created together by ``create_batch`` share a batch ID; the
+    manager keeps a count of the batch's tasks per status as they change,
+    so batch progress costs O(1) however many tasks it has. Batches are
+    held in memory only and dropped with the summaries of their tasks.
+    """
+    
+    def __init__(
+        self,
+        store: Optional[TaskStore] = None,
+        retention_seconds: Optional[int] = None,
+        retention_max_count: Optional[int] = None,
+        summary_retention_seconds: Optional[int] = None,
+        reaper_interval: Optional[int] = None
+    ):
+        self._store = store or create_task_store()
+        self.retention_seconds = retention_seconds if retention_seconds is not None else settings.TASK_RETENTION_SECONDS
+        self.retention_max_count = (
+            retention_max_count if retention_max_count is not None else settings.TASK_RETENTION_MAX_COUNT
+        )
+        self.summary_retention_seconds = (
+            summary_retention_seconds if summary_retention_seconds is not None
+            else settings.TASK_SUMMARY_RETENTION_SECONDS
+        )
+        self.reaper_interval = reaper_interval if reaper_interval is not None else settings.TASK_REAPER_INTERVAL
         self._lock = asyncio.Lock()
+        self._shard_locks = [asyncio.Lock() for _ in range(LOCK_SHARDS)]
         self._running_tasks: Dict[str, asyncio.Task] = {}
+        self._batches: Dict[str, TaskBatch] = {}
+        self.events = TaskEventBroadcaster()
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.lock_acquisitions = 0
+        self.lock_contentions = 0
+        self.lock_wait_seconds = 0.0
+        self.evicted_tasks = 0
+        self.deleted_tasks = 0
     
-    async def create_task(self, task_description: str, **kwargs) -> str:
-        """Create a new task and return its ID."""
-        task_id = str(uuid.uuid4())
+    def _lock_for(self, task_id: str) -> asyncio.Lock:
+        """Return the lock shard guarding updates to a task."""
+        return self._shard_locks[zlib.crc32(task_id.encode()) % LOCK_SHARDS]
+    
+    @asynccontextmanager
+    async def _acquire(self, lock: asyncio.Lock):
+        """Acquire a lock, recording whether it had to wait and for how long."""
+        self.lock_acquisitions += 1
+        if lock.locked():
+            self.lock_contentions += 1
+            start = time.perf_counter()
+            await lock.acquire()
+            self.lock_wait_seconds += time.perf_counter() - start
+        else:
+            await lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+    
+    async def _update(self, task_id: str, changes: Callable[[TaskData], Optional[Dict[str, Any]]]) -> Optional[TaskData]:
+        """Publish a new snapshot of a task under its lock.
         
-        async with self._lock:
-            task_data = TaskData(
-                id=task_id,
-                task=task_description,
-                status=TaskStatusEnum.CREATED,
-                created_at=datetime.utcnow(),
-                cancel_event=asyncio.Event(),
-                pause_event=asyncio.Event()
-            )
+        ``changes`` receives the current snapshot and returns the fields to
+        replace, or None to leave the task untouched. Returns the new
+        snapshot, or None if nothing was changed.
+        """
+        async with self._acquire(self._lock_for(task_id)):
+            task_data = await self._store.get(task_id)
+            if task_data is None:
+                return None
+            fields = changes(task_data)
+            if fields is None:
+                return None
+            if fields.get("status", task_data.status) in TERMINAL_STATUSES:
+                # Finished tasks must not keep their agent and its history alive
+                fields["agent_instance"] = None
+            updated = replace(task_data, **fields)
+            await self._store.save(task_data, updated)
+            if updated.status in TERMINAL_STATUSES and task_data.status not in TERMINAL_STATUSES:
+                metrics.tasks_finished.inc(status=updated.status.value)
+            if updated.status != task_data.status and updated.batch_id:
+                self._count_batch_status(updated.batch_id, task_data.status, updated.status)
+            self.events.publish_changes(task_data, updated)
+            return updated
+    
+    async def create_task(self, task_description: str, idempotency_key: Optional[str] = None, **kwargs) -> str:
+        """Create a new task and return its ID.
+        
+        If a task was already created with the same idempotency key, its ID is
+        returned instead of creating a new task.
+        """
+        async with self._acquire(self._lock):
+            if idempotency_key:
+                existing_id = await self._store.find_by_idempotency_key(idempotency_key)
+                if existing_id:
+                    return existing_id
             
-            # Set pause event initially (task starts paused until run)
-            task_data.pause_event.set()
+            task_data = self._new_task(task_description, idempotency_key, **kwargs)
+            await self._store.add(task_data)
+        
+        return task_data.id
+    
+    async def create_batch(self, tasks: List[Dict[str, Any]]) -> Tuple[TaskBatch, List[str]]:
+        """Create tasks under a shared batch ID with a single lock acquisition and bulk insert.
+        
+        Each item holds the ``create_task`` arguments, ``task`` and
+        optionally ``idempotency_key`` and further task fields. Returns the
+        batch, which holds the tasks it created, and the task ID of every
+        item in order: items repeating an idempotency key get the ID of the
+        original task instead.
+        """
+        batch_id = str(uuid.uuid4())
+        task_ids = []
+        created: List[TaskData] = []
+        
+        async with self._acquire(self._lock):
+            # One lookup for the whole batch, then keys of tasks created below are added
+            keys = await self._store.find_by_idempotency_keys(
+                [item["idempotency_key"] for item in tasks if item.get("idempotency_key")]
+            )
+            for item in tasks:
+                fields = dict(item)
+                task_description = fields.pop("task")
+                idempotency_key = fields.pop("idempotency_key", None)
+                if idempotency_key:
+                    existing_id = keys.get(idempotency_key)
+                    if existing_id:
+                        task_ids.append(existing_id)
+                        continue
+                task_data = self._new_task(task_description, idempotency_key, batch_id=batch_id, **fields)
+                if idempotency_key:
+                    keys[idempotency_key] = task_data.id
+                created.append(task_data)
+                task_ids.append(task_data.id)
             
-            self._tasks[task_id] = task_data
+            await self._store.add_many(created)
+            batch = TaskBatch(
+                id=batch_id,
+                created_at=datetime.utcnow(),
+                task_ids=tuple(task_data.id for task_data in created),
+                status_counts=Counter({TaskStatusEnum.CREATED: len(created)})
+            )
+            if batch.done:
+                batch.finished_at = batch.created_at
+            self._batches[batch_id] = batch
+        
+        return batch, task_ids
+    
+    def get_batch(self, batch_id: str) -> Optional[TaskBatch]:
+        """Get a batch with the status counts of its tasks."""
+        return self._batches.get(batch_id)
+    
+    @staticmethod
+    def _new_task(task_description: str, idempotency_key: Optional[str], **kwargs) -> TaskData:
+        """Build the snapshot of a newly created task."""
+        task_data = TaskData(
+            id=str(uuid.uuid4()),
+            task=task_description,
+            status=TaskStatusEnum.CREATED,
+            created_at=datetime.utcnow(),
+            idempotency_key=idempotency_key,
+            cancel_event=asyncio.Event(),
+            pause_event=asyncio.Event(),
+            **kwargs
+        )
         
-        return task_id
+        # Set pause event initially (task starts paused until run)
+        task_data.pause_event.set()
+        return task_data
+    
+    def _count_batch_status(self, batch_id: str, old: TaskStatusEnum, new: TaskStatusEnum):
+        """Move a task of a batch from one status count to another."""
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return
+        batch.status_counts[old] -= 1
+        batch.status_counts[new] += 1
+        if batch.finished_at is None and batch.done:
+            batch.finished_at = datetime.utcnow()
     
     async def get_task(self, task_id: str) -> Optional[TaskData]:
-        """Get task data by ID."""
-        async with self._lock:
-            return self._tasks.get(task_id)
+        """Get a snapshot of task data by ID."""
+        return await self._store.get(task_id)
+    
+    async def get_task_id_by_idempotency_key(self, idempotency_key: str) -> Optional[str]:
+        """Get the ID of the task created with an idempotency key."""
+        return await self._store.find_by_idempotency_key(idempotency_key)
+    
+    async def start_task(self, task_id: str) -> bool:
+        """Move a created task to running, exactly once per task."""
+        updated = await self._update(
+            task_id,
+            lambda t: {"status": TaskStatusEnum.RUNNING} if t.status == TaskStatusEnum.CREATED else None
+        )
+        return updated is not None
     
     async def update_task_status(self, task_id: str, status: TaskStatusEnum):
         """Update task status."""
-        async with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].status = status
-                if status in [TaskStatusEnum.FINISHED, TaskStatusEnum.STOPPED, TaskStatusEnum.FAILED]:
-                    self._tasks[task_id].finished_at = datetime.utcnow()
+        def changes(task_data: TaskData) -> Dict[str, Any]:
+            if status in TERMINAL_STATUSES:
+                return {"status": status, "finished_at": datetime.utcnow()}
+            return {"status": status}
+        
+        await self._update(task_id, changes)
     
     async def add_task_step(self, task_id: str, step_data: Dict[str, Any]):
         """Add a step to task execution history."""
-        async with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].steps.append(step_data)
+        await self._update(task_id, lambda t: {"steps": t.steps.append(TaskStep.from_dict(step_data))})
+    
+    async def add_task_steps(self, task_id: str, steps: List[Dict[str, Any]], screenshots: List[str] = ()):
+        """Add a batch of steps and screenshots to a task in a single update."""
+        def changes(task_data: TaskData) -> Dict[str, Any]:
+            step_log = task_data.steps
+            for step_data in steps:
+                step_log = step_log.append(TaskStep.from_dict(step_data))
+            return {"steps": step_log, "screenshots": task_data.screenshots + tuple(screenshots)}
+        
+        await self._update(task_id, changes)
     
     async def set_task_output(self, task_id: str, output: str):
         """Set task output."""
-        async with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].output = output
+        await self._update(task_id, lambda t: {"output": output})
     
     async def add_screenshot(self, task_id: str, screenshot_path: str):
         """Add screenshot to task."""
-        async with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].screenshots.append(screenshot_path)
+        await self._update(task_id, lambda t: {"screenshots": t.screenshots + (screenshot_path,)})
     
     async def add_recording(self, task_id: str, recording_path: str):
         """Add recording to task."""
-        async with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].recordings.append(recording_path)
+        await self._update(task_id, lambda t: {"recordings": t.recordings + (recording_path,)})
     
     async def add_output_file(self, task_id: str, file_path: str):
         """Add output file to task."""
-        async with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].output_files.append(file_path)
+        await self._update(task_id, lambda t: {"output_files": t.output_files + (file_path,)})
     
     async def set_agent_instance(self, task_id: str, agent: Any):
         """Set the browser-use agent instance for the task."""
-        async with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].agent_instance = agent
+        await self._update(task_id, lambda t: {"agent_instance": agent})
     
     async def pause_task(self, task_id: str) -> bool:
         """Pause a running task."""
-        async with self._lock:
-            if task_id in self._tasks and self._tasks[task_id].status == TaskStatusEnum.RUNNING:
-                self._tasks[task_id].status = TaskStatusEnum.PAUSED
-                if self._tasks[task_id].pause_event:
-                    self._tasks[task_id].pause_event.clear()
-                return True
+        updated = await self._update(
+            task_id,
+            lambda t: {"status": TaskStatusEnum.PAUSED} if t.status == TaskStatusEnum.RUNNING else None
+        )
+        if updated is None:
             return False
+        if updated.pause_event:
+            updated.pause_event.clear()
+        return True
     
     async def resume_task(self, task_id: str) -> bool:
         """Resume a paused task."""
-        async with self._lock:
-            if task_id in self._tasks and self._tasks[task_id].status == TaskStatusEnum.PAUSED:
-                self._tasks[task_id].status = TaskStatusEnum.RUNNING
-                if self._tasks[task_id].pause_event:
-                    self._tasks[task_id].pause_event.set()
-                return True
+        updated = await self._update(
+            task_id,
+            lambda t: {"status": TaskStatusEnum.RUNNING} if t.status == TaskStatusEnum.PAUSED else None
+        )
+        if updated is None:
             return False
+        if updated.pause_event:
+            updated.pause_event.set()
+        return True
     
     async def stop_task(self, task_id: str) -> bool:
-        """Stop a running or paused task."""
-        async with self._lock:
-            if task_id in self._tasks:
-                task_data = self._tasks[task_id]
-                if task_data.status in [TaskStatusEnum.RUNNING, TaskStatusEnum.PAUSED]:
-                    task_data.status = TaskStatusEnum.STOPPED
-                    task_data.finished_at = datetime.utcnow()
-                    
-                    # Signal cancellation
-                    if task_data.cancel_event:
-                        task_data.cancel_event.set()
-                    
-                    # Cancel the running task
-                    if task_id in self._running_tasks:
-                        self._running_tasks[task_id].cancel()
-                        del self._running_tasks[task_id]
-                    
-                    return True
+        """Stop a queued, running or paused task."""
+        stoppable = [TaskStatusEnum.CREATED, TaskStatusEnum.RUNNING, TaskStatusEnum.PAUSED]
+        updated = await self._update(
+            task_id,
+            lambda t: {"status": TaskStatusEnum.STOPPED, "finished_at": datetime.utcnow()} if t.status in stoppable else None
+        )
+        if updated is None:
             return False
+        
+        # Signal cancellation
+        if updated.cancel_event:
+            updated.cancel_event.set()
+        
+        # Cancel the running task
+        running_task = self._running_tasks.pop(task_id, None)
+        if running_task:
+            running_task.cancel()
+        
+        return True
     
     async def register_running_task(self, task_id: str, task: asyncio.Task):
         """Register a running asyncio task."""
-        async with self._lock:
-            self._running_tasks[task_id] = task
+        self._running_tasks[task_id] = task
     
     async def unregister_running_task(self, task_id: str):
         """Unregister a completed asyncio task."""
-        async with self._lock:
-            if task_id in self._running_tasks:
-                del self._running_tasks[task_id]
-    
-    async def list_tasks(self, page: int = 1, limit: int = 10) -> tuple[List[TaskData], int]:
-        """List tasks with pagination."""
-        async with self._lock:
-            all_tasks = list(self._tasks.values())
-            # Sort by creation time, newest first
-            all_tasks.sort(key=lambda x: x.created_at, reverse=True)
-            
-            total_count = len(all_tasks)
-            start_idx = (page - 1) * limit
-            end_idx = start_idx + limit
+        self._running_tasks.pop(task_id, None)
+    
+    async def list_tasks(
+        self,
+        page: int = 1,
+        limit: int = 10,
+        status: Optional[TaskStatusEnum] = None,
+        after: Optional[str] = None
+    ) -> tuple[List[TaskData], int]:
+        """List tasks newest first with pagination.
+        
+        Tasks come from the store's creation-time index, so a page costs
+        O(limit) regardless of how many tasks exist. When ``after`` is a task ID, the
+        page starts right after that task instead of at ``page``; with the SQLite
+        store, prefer it over deep pages, which are skipped row by row on disk.
+        """
+        tasks = await self._store.list(limit, offset=(page - 1) * limit, status=status, before=after)
+        return tasks, await self._store.count(status)
+    
+    async def reap_finished_tasks(self, now: Optional[datetime] = None) -> int:
+        """Evict finished tasks past retention and delete expired summaries.
+        
+        Deleting a summary also deletes the action script saved by the task.
+        Returns the number of tasks evicted or deleted.
+        """
+        now = now or datetime.utcnow()
+        reaped = 0
+        
+        expired = self._store.expired_tasks(now - timedelta(seconds=self.retention_seconds), self.retention_max_count)
+        for task_id in expired:
+            async with self._acquire(self._lock_for(task_id)):
+                if await self._store.evict(task_id):
+                    self.evicted_tasks += 1
+                    reaped += 1
+        
+        if self.summary_retention_seconds > 0:
+            expired = self._store.expired_summaries(now - timedelta(seconds=self.summary_retention_seconds))
+            for task_id in expired:
+                async with self._acquire(self._lock_for(task_id)):
+                    await self._store.delete(task_id)
+                    await replay_service.delete(task_id)
+                    self.deleted_tasks += 1
+                    reaped += 1
             
-            return all_tasks[start_idx:end_idx], total_count
+            finished_before = now - timedelta(seconds=self.summary_retention_seconds)
+            for batch in list(self._batches.values()):
+                if batch.finished_at and batch.finished_at < finished_before:
+                    del self._batches[batch.id]
+        
+        return reaped
+    
+    async def start(self):
+        """Start the background reaper of finished tasks."""
+        if self.reaper_interval > 0 and self._reaper_task is None:
+            self._reaper_task = asyncio.create_task(self._reaper_loop())
+    
+    async def close(self):
+        """Stop the reaper, then flush and close the task store."""
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        await self._store.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return task counts, lock contention and eviction counters."""
+        return {
+            "tasks": self._store.resident_count(),
+            "running": len(self._running_tasks),
+            "lock_acquisitions": self.lock_acquisitions,
+            "lock_contentions": self.lock_contentions,
+            "lock_wait_seconds": self.lock_wait_seconds,
+            "evicted_tasks": self.evicted_tasks,
+            "deleted_tasks": self.deleted_tasks,
+            **{f"event_{key}": value for key, value in self.events.stats().items()}
+        }
+    
+    async def _reaper_loop(self):
+        """Periodically reap finished tasks."""
+        while True:
+            await asyncio.sleep(self.reaper_interval)
+            try:
+                await self.reap_finished_tasks()
+            except Exception as e:
+                print(f"Task reaper failed: {e}")
     
     def to_task_response(self, task_data: TaskData) -> TaskResponse:
         """Convert TaskData to TaskResponse."""
@@ -178,9 +416,9 @@ class TaskManager:
             TaskStepResponse(
                 id=str(i),
                 step=i + 1,
-                evaluation_previous_goal=step.get("evaluation_previous_goal", ""),
-                next_goal=step.get("next_goal", ""),
-                url=step.get("url", "")
+                evaluation_previous_goal=step.evaluation_previous_goal,
+                next_goal=step.next_goal,
+                url=step.url
             )
             for i, step in enumerate(task_data.steps)
         ]
@@ -197,7 +435,8 @@ class TaskManager:
             browser_data=task_data.browser_data,
             user_uploaded_files=task_data.user_uploaded_files,
             output_files=task_data.output_files,
-            public_share_url=task_data.public_share_url
+            public_share_url=task_data.public_share_url,
+            batch_id=task_data.batch_id
         )
     
     def to_simple_response(self, task_data: TaskData) -> TaskSimpleResponse:
@@ -0,0 +1,589 @@
+import asyncio
+import json
+import sqlite3
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..models.enums import TaskStatusEnum
+from ..config import settings
+from .task_data import StepLog, TaskData, TaskStep, TERMINAL_STATUSES, compact_task
+from .task_index import TaskIndex
+
+
+class TaskStore:
+    """Storage backend for the task snapshots managed by TaskManager.
+
+    ``save`` receives the previous and the new snapshot of a task so that
+    backends can persist only what changed.
+    """
+
+    async def add(self, task_data: TaskData):
+        """Store a newly created task."""
+        raise NotImplementedError
+
+    async def add_many(self, tasks: List[TaskData]):
+        """Store newly created tasks in one bulk insert."""
+        for task_data in tasks:
+            await self.add(task_data)
+
+    async def get(self, task_id: str) -> Optional[TaskData]:
+        """Get the latest snapshot of a task."""
+        raise NotImplementedError
+
+    async def save(self, old: TaskData, new: TaskData):
+        """Replace a task snapshot with an updated one."""
+        raise NotImplementedError
+
+    async def delete(self, task_id: str):
+        """Remove a task."""
+        raise NotImplementedError
+
+    async def list(
+        self,
+        limit: int,
+        offset: int = 0,
+        status: Optional[TaskStatusEnum] = None,
+        before: Optional[str] = None
+    ) -> List[TaskData]:
+        """List tasks newest first, optionally only those created before another task."""
+        raise NotImplementedError
+
+    async def count(self, status: Optional[TaskStatusEnum] = None) -> int:
+        """Count tasks, optionally only those with a status."""
+        raise NotImplementedError
+
+    async def find_by_idempotency_key(self, idempotency_key: str) -> Optional[str]:
+        """Get the ID of the task created with an idempotency key."""
+        raise NotImplementedError
+
+    async def find_by_idempotency_keys(self, idempotency_keys: List[str]) -> Dict[str, str]:
+        """Get the IDs of the tasks created with any of several idempotency keys, by key."""
+        found = {}
+        for idempotency_key in idempotency_keys:
+            task_id = await self.find_by_idempotency_key(idempotency_key)
+            if task_id:
+                found[idempotency_key] = task_id
+        return found
+
+    def resident_count(self) -> int:
+        """Number of task snapshots held in memory."""
+        raise NotImplementedError
+
+    def expired_tasks(self, finished_before: datetime, keep: int) -> List[str]:
+        """IDs of finished tasks held in full that finished before a time or exceed ``keep``, oldest first."""
+        raise NotImplementedError
+
+    async def evict(self, task_id: str) -> bool:
+        """Release the memory held by a finished task while keeping it retrievable."""
+        raise NotImplementedError
+
+    def expired_summaries(self, finished_before: datetime) -> List[str]:
+        """IDs of evicted tasks that finished before a time and can be deleted."""
+        return []
+
+    async def flush(self):
+        """Write out any buffered changes."""
+
+    async def close(self):
+        """Flush and release the backend."""
+
+
+class InMemoryTaskStore(TaskStore):
+    """Keeps every task in memory, indexed by creation time and status.
+
+    Evicted tasks are compacted to a summary, and summaries are only removed
+    by ``delete``. Finished tasks are tracked in finishing order so that
+    retention only ever looks at the tasks it expires.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, TaskData] = {}
+        self._index = TaskIndex()
+        self._idempotency_keys: Dict[str, str] = {}
+        self._finished: "OrderedDict[str, datetime]" = OrderedDict()
+        self._summaries: "OrderedDict[str, datetime]" = OrderedDict()
+
+    async def add(self, task_data: TaskData):
+        self._tasks[task_data.id] = task_data
+        self._index.add(task_data.id, task_data.created_at, task_data.status)
+        if task_data.idempotency_key:
+            self._idempotency_keys[task_data.idempotency_key] = task_data.id
+
+    async def get(self, task_id: str) -> Optional[TaskData]:
+        return self._tasks.get(task_id)
+
+    async def save(self, old: TaskData, new: TaskData):
+        self._tasks[new.id] = new
+        if new.status != old.status:
+            self._index.set_status(new.id, new.status)
+            if new.status in TERMINAL_STATUSES and new.id not in self._summaries:
+                self._finished[new.id] = new.finished_at or datetime.utcnow()
+
+    async def delete(self, task_id: str):
+        task_data = self._tasks.pop(task_id, None)
+        if task_data is None:
+            return
+        self._index.remove(task_id)
+        self._finished.pop(task_id, None)
+        self._summaries.pop(task_id, None)
+        if task_data.idempotency_key:
+            self._idempotency_keys.pop(task_data.idempotency_key, None)
+
+    async def list(self, limit, offset=0, status=None, before=None) -> List[TaskData]:
+        if before:
+            task_ids = self._index.before(before, limit, status)
+        else:
+            task_ids = self._index.page(offset, limit, status)
+        return [self._tasks[task_id] for task_id in task_ids]
+
+    async def count(self, status: Optional[TaskStatusEnum] = None) -> int:
+        return self._index.count(status)
+
+    async def find_by_idempotency_key(self, idempotency_key: str) -> Optional[str]:
+        return self._idempotency_keys.get(idempotency_key)
+
+    async def find_by_idempotency_keys(self, idempotency_keys: List[str]) -> Dict[str, str]:
+        return {key: self._idempotency_keys[key] for key in idempotency_keys if key in self._idempotency_keys}
+
+    def resident_count(self) -> int:
+        return len(self._tasks)
+
+    def expired_tasks(self, finished_before: datetime, keep: int) -> List[str]:
+        return _expired(self._finished, finished_before, keep)
+
+    async def evict(self, task_id: str) -> bool:
+        finished_at = self._finished.pop(task_id, None)
+        if finished_at is None:
+            return False
+        self._tasks[task_id] = compact_task(self._tasks[task_id])
+        self._summaries[task_id] = finished_at
+        return True
+
+    def expired_summaries(self, finished_before: datetime) -> List[str]:
+        return _expired(self._summaries, finished_before, len(self._summaries))
+
+
+class SQLiteTaskStore(TaskStore):
+    """Persists tasks to SQLite in WAL mode.
+
+    Unfinished tasks stay resident because they carry live objects (agent,
+    events). Finished tasks are flushed to disk and only kept in a bounded
+    LRU cache. Task rows, steps and screenshots are buffered and written in
+    batches from a single background thread that owns the connection.
+
+    Reads never force a flush. Rows of finished tasks are always on disk,
+    while unfinished tasks are indexed in memory by creation time, status
+    and idempotency key. Listing merges the new tasks not written yet, all
+    newer than any row, in front of rows paged by rowid.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            task TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            finished_at TEXT,
+            output TEXT,
+            idempotency_key TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+        CREATE INDEX IF NOT EXISTS tasks_idempotency_key ON tasks (idempotency_key);
+        CREATE TABLE IF NOT EXISTS task_steps (
+            task_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (task_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS task_screenshots (
+            task_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            PRIMARY KEY (task_id, position)
+        );
+    """
+
+    # Rowids follow insertion order, which is creation order
+    UPSERT_TASK = """
+        INSERT INTO tasks (id, task, status, created_at, finished_at, output, idempotency_key, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            status = excluded.status,
+            finished_at = excluded.finished_at,
+            output = excluded.output,
+            data = excluded.data
+    """
+    INSERT_STEP = "INSERT OR REPLACE INTO task_steps (task_id, position, data) VALUES (?, ?, ?)"
+    INSERT_SCREENSHOT = "INSERT OR REPLACE INTO task_screenshots (task_id, position, path) VALUES (?, ?, ?)"
+    SELECT_TASK = """
+        SELECT id, task, status, created_at, finished_at, output, idempotency_key, data
+        FROM tasks WHERE id = ?
+    """
+    SELECT_IDEMPOTENCY_KEYS = "SELECT idempotency_key, id FROM tasks WHERE idempotency_key IN ({})"
+    SELECT_STEPS = "SELECT data FROM task_steps WHERE task_id = ? ORDER BY position"
+    SELECT_SCREENSHOTS = "SELECT path FROM task_screenshots WHERE task_id = ? ORDER BY position"
+
+    def __init__(
+        self,
+        path: Path,
+        cache_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.path = path
+        self.cache_size = cache_size if cache_size is not None else settings.TASK_STORE_CACHE_SIZE
+        self.batch_size = batch_size if batch_size is not None else settings.TASK_STORE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.TASK_STORE_FLUSH_INTERVAL
+        self._live: Dict[str, TaskData] = {}
+        self._live_index = TaskIndex()
+        self._idempotency_keys: Dict[str, str] = {}
+        # New tasks whose rows are not written yet, in creation order
+        self._unwritten: Dict[str, None] = {}
+        self._cache: "OrderedDict[str, TaskData]" = OrderedDict()
+        self._pending_tasks: Dict[str, TaskData] = {}
+        self._pending_steps: List[Tuple[str, int, str]] = []
+        self._pending_screenshots: List[Tuple[str, int, str]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+        self._conn = self._executor.submit(self._open).result()
+        self._counts: Counter = self._executor.submit(self._load_counts).result()
+
+    def _open(self) -> sqlite3.Connection:
+        """Open the database and mark tasks interrupted by a restart as failed."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.SCHEMA)
+        with conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, finished_at = ?, output = COALESCE(output, ?) "
+                "WHERE status IN (?, ?, ?)",
+                (
+                    TaskStatusEnum.FAILED.value, datetime.utcnow().isoformat(), "Interrupted by pod restart",
+                    TaskStatusEnum.CREATED.value, TaskStatusEnum.RUNNING.value, TaskStatusEnum.PAUSED.value
+                )
+            )
+        return conn
+
+    def _load_counts(self) -> Counter:
+        """Load the number of tasks per status."""
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return Counter({TaskStatusEnum(status): count for status, count in rows})
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        """Run a blocking database call on the store thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def add(self, task_data: TaskData):
+        self._buffer_new(task_data)
+        await self._schedule_flush()
+
+    async def add_many(self, tasks: List[TaskData]):
+        for task_data in tasks:
+            self._buffer_new(task_data)
+        # All rows go out in one transaction instead of one flush per batch_size rows
+        await self.flush()
+
+    async def get(self, task_id: str) -> Optional[TaskData]:
+        task_data = self._live.get(task_id) or self._cache_get(task_id)
+        if task_data is not None:
+            return task_data
+
+        task_data = await self._run(self._load, task_id)
+        if task_data is not None:
+            self._cache_put(task_data)
+        return task_data
+
+    async def save(self, old: TaskData, new: TaskData):
+        if new.status != old.status:
+            self._counts[old.status] -= 1
+            self._counts[new.status] += 1
+
+        self._pending_tasks[new.id] = new
+        if new.steps is not old.steps:
+            self._pending_steps.extend(self._step_rows(new, len(old.steps)))
+        if new.screenshots is not old.screenshots:
+            self._pending_screenshots.extend(self._screenshot_rows(new, len(old.screenshots)))
+
+        if new.status in TERMINAL_STATUSES:
+            # Finished tasks leave memory, so they must be on disk first
+            self._forget_live(new)
+            self._cache_put(new)
+            await self.flush()
+        else:
+            self._live[new.id] = new
+            self._live_index.set_status(new.id, new.status)
+            await self._schedule_flush()
+
+    async def delete(self, task_id: str):
+        task_data = await self.get(task_id)
+        if task_data is None:
+            return
+        self._counts[task_data.status] -= 1
+        self._forget_live(task_data)
+        self._cache.pop(task_id, None)
+        await self.flush()
+        await self._run(self._delete, task_id)
+
+    async def list(self, limit, offset=0, status=None, before=None) -> List[TaskData]:
+        if status is not None and status not in TERMINAL_STATUSES:
+            # Every unfinished task is resident, while its row may be stale
+            if before is None:
+                task_ids = self._live_index.page(offset, limit, status)
+            elif before in self._live_index:
+                task_ids = self._live_index.before(before, limit, status)
+            else:
+                cursor = await self.get(before)
+                task_ids = self._live_index.created_before(cursor.created_at, limit, status) if cursor else []
+            return [self._live[task_id] for task_id in task_ids]
+
+        # Unwritten tasks are unfinished and newer than every row
+        newer = list(reversed(self._unwritten)) if status is None else []
+        if before is not None and before in self._unwritten:
+            newer = newer[newer.index(before) + 1:] if before in newer else []
+            before, offset = None, 0
+        elif before is not None:
+            newer = []
+        else:
+            skipped = min(offset, len(newer))
+            newer, offset = newer[skipped:], offset - skipped
+        tasks = [self._live[task_id] for task_id in newer[:limit]]
+        if len(tasks) < limit:
+            rows = await self._run(self._select_page, limit - len(tasks), 0 if before else offset, status, before)
+            tasks.extend(
+                self._live.get(row[0]) or self._cache.get(row[0]) or self._row_to_task(row)
+                for row in rows
+            )
+        return tasks
+
+    async def count(self, status: Optional[TaskStatusEnum] = None) -> int:
+        if status is None:
+            return sum(self._counts.values())
+        return self._counts[status]
+
+    async def find_by_idempotency_key(self, idempotency_key: str) -> Optional[str]:
+        found = await self.find_by_idempotency_keys([idempotency_key])
+        return found.get(idempotency_key)
+
+    async def find_by_idempotency_keys(self, idempotency_keys: List[str]) -> Dict[str, str]:
+        found = {key: self._idempotency_keys[key] for key in idempotency_keys if key in self._idempotency_keys}
+        # Tasks that are not resident are finished, so their rows are on disk
+        missing = list(dict.fromkeys(key for key in idempotency_keys if key not in found))
+        if missing:
+            found.update(await self._run(self._select_idempotency_keys, missing))
+        return found
+
+    def resident_count(self) -> int:
+        return len(self._live) + len(self._cache)
+
+    def expired_tasks(self, finished_before: datetime, keep: int) -> List[str]:
+        # The cache is in LRU order, so rarely read tasks are evicted first
+        excess = len(self._cache) - keep
+        return [
+            task_id for i, (task_id, task_data) in enumerate(self._cache.items())
+            if i < excess or (task_data.finished_at or finished_before) < finished_before
+        ]
+
+    async def evict(self, task_id: str) -> bool:
+        if task_id not in self._cache:
+            return False
+        # Finished tasks are already archived on disk once flushed
+        await self.flush()
+        del self._cache[task_id]
+        return True
+
+    async def flush(self):
+        if not (self._pending_tasks or self._pending_steps or self._pending_screenshots):
+            return
+        tasks = [self._task_row(task_data) for task_data in self._pending_tasks.values()]
+        for task_id in self._pending_tasks:
+            self._unwritten.pop(task_id, None)
+        steps, screenshots = self._pending_steps, self._pending_screenshots
+        self._pending_tasks, self._pending_steps, self._pending_screenshots = {}, [], []
+        # Submitted before any later read, which the store thread runs in order
+        await self._run(self._write_batch, tasks, steps, screenshots)
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+
+    def _buffer_new(self, task_data: TaskData):
+        """Buffer the rows of a newly created task."""
+        self._live[task_data.id] = task_data
+        self._live_index.add(task_data.id, task_data.created_at, task_data.status)
+        if task_data.idempotency_key:
+            self._idempotency_keys[task_data.idempotency_key] = task_data.id
+        self._unwritten[task_data.id] = None
+        self._counts[task_data.status] += 1
+        self._pending_tasks[task_data.id] = task_data
+        self._pending_steps.extend(self._step_rows(task_data, 0))
+        self._pending_screenshots.extend(self._screenshot_rows(task_data, 0))
+
+    def _forget_live(self, task_data: TaskData):
+        """Drop a task that finished or was deleted from the in-memory indexes."""
+        self._live.pop(task_data.id, None)
+        self._live_index.remove(task_data.id)
+        self._unwritten.pop(task_data.id, None)
+        if self._idempotency_keys.get(task_data.idempotency_key) == task_data.id:
+            del self._idempotency_keys[task_data.idempotency_key]
+
+    async def _schedule_flush(self):
+        """Flush now if the batch is full, otherwise within the flush interval."""
+        if len(self._pending_tasks) + len(self._pending_steps) + len(self._pending_screenshots) >= self.batch_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        """Flush buffered writes after the flush interval."""
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _cache_get(self, task_id: str) -> Optional[TaskData]:
+        """Get a finished task from the LRU cache."""
+        task_data = self._cache.get(task_id)
+        if task_data is not None:
+            self._cache.move_to_end(task_id)
+        return task_data
+
+    def _cache_put(self, task_data: TaskData):
+        """Cache a finished task, evicting the least recently used ones."""
+        self._cache[task_data.id] = task_data
+        self._cache.move_to_end(task_data.id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _write_batch(self, tasks: List[tuple], steps: List[tuple], screenshots: List[tuple]):
+        """Write buffered rows in a single transaction."""
+        with self._conn:
+            self._conn.executemany(self.UPSERT_TASK, tasks)
+            self._conn.executemany(self.INSERT_STEP, steps)
+            self._conn.executemany(self.INSERT_SCREENSHOT, screenshots)
+
+    def _load(self, task_id: str) -> Optional[TaskData]:
+        """Load a task with its steps and screenshots."""
+        row = self._conn.execute(self.SELECT_TASK, (task_id,)).fetchone()
+        if row is None:
+            return None
+        task_data = self._row_to_task(row)
+        task_data.steps = StepLog(
+            TaskStep.from_dict(json.loads(data)) for (data,) in self._conn.execute(self.SELECT_STEPS, (task_id,))
+        )
+        task_data.screenshots = tuple(path for (path,) in self._conn.execute(self.SELECT_SCREENSHOTS, (task_id,)))
+        return task_data
+
+    def _select_page(self, limit, offset, status, before) -> List[tuple]:
+        """Select task rows newest first."""
+        query = "SELECT id, task, status, created_at, finished_at, output, idempotency_key, data FROM tasks"
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status.value)
+        if before is not None:
+            conditions.append("rowid < (SELECT rowid FROM tasks WHERE id = ?)")
+            params.append(before)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY rowid DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        return self._conn.execute(query, params).fetchall()
+
+    def _select_idempotency_keys(self, idempotency_keys: List[str]) -> Dict[str, str]:
+        """Look up task IDs by idempotency key, in chunks within SQLite's parameter limit."""
+        found = {}
+        for start in range(0, len(idempotency_keys), 500):
+            chunk = idempotency_keys[start:start + 500]
+            query = self.SELECT_IDEMPOTENCY_KEYS.format(", ".join("?" * len(chunk)))
+            found.update(self._conn.execute(query, chunk).fetchall())
+        return found
+
+    def _delete(self, task_id: str):
+        """Delete a task and its steps and screenshots."""
+        with self._conn:
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._conn.execute("DELETE FROM task_steps WHERE task_id = ?", (task_id,))
+            self._conn.execute("DELETE FROM task_screenshots WHERE task_id = ?", (task_id,))
+
+    @staticmethod
+    def _task_row(task_data: TaskData) -> tuple:
+        """Serialize a task to a tasks table row."""
+        data = {
+            "recordings": list(task_data.recordings),
+            "output_files": list(task_data.output_files),
+            "user_uploaded_files": list(task_data.user_uploaded_files),
+            "browser_data": task_data.browser_data,
+            "live_url": task_data.live_url,
+            "public_share_url": task_data.public_share_url,
+            "batch_id": task_data.batch_id
+        }
+        return (
+            task_data.id,
+            task_data.task,
+            task_data.status.value,
+            task_data.created_at.isoformat(),
+            task_data.finished_at.isoformat() if task_data.finished_at else None,
+            task_data.output,
+            task_data.idempotency_key,
+            json.dumps(data)
+        )
+
+    @staticmethod
+    def _row_to_task(row: tuple) -> TaskData:
+        """Build a task without steps or screenshots from a tasks table row."""
+        task_id, task, status, created_at, finished_at, output, idempotency_key, data = row
+        data = json.loads(data)
+        for key in ("recordings", "output_files", "user_uploaded_files"):
+            data[key] = tuple(data[key])
+        return TaskData(
+            id=task_id,
+            task=task,
+            status=TaskStatusEnum(status),
+            created_at=datetime.fromisoformat(created_at),
+            finished_at=datetime.fromisoformat(finished_at) if finished_at else None,
+            output=output,
+            idempotency_key=idempotency_key,
+            **data
+        )
+
+    @staticmethod
+    def _step_rows(task_data: TaskData, start: int) -> List[Tuple[str, int, str]]:
+        """Serialize the steps of a task from a position onwards."""
+        return [
+            (task_data.id, position, json.dumps(task_data.steps[position].to_dict()))
+            for position in range(start, len(task_data.steps))
+        ]
+
+    @staticmethod
+    def _screenshot_rows(task_data: TaskData, start: int) -> List[Tuple[str, int, str]]:
+        """Serialize the screenshots of a task from a position onwards."""
+        return [
+            (task_data.id, position, path)
+            for position, path in enumerate(task_data.screenshots[start:], start)
+        ]
+
+
+def _expired(finished: "OrderedDict[str, datetime]", finished_before: datetime, keep: int) -> List[str]:
+    """Return IDs from the front of a finishing-order dict past the time or count limit."""
+    excess = len(finished) - keep
+    task_ids = []
+    for i, (task_id, finished_at) in enumerate(finished.items()):
+        if i >= excess and finished_at >= finished_before:
+            break
+        task_ids.append(task_id)
+    return task_ids
+
+
+def create_task_store() -> TaskStore:
+    """Create the task store selected by settings.TASK_STORE."""
+    if settings.TASK_STORE == "sqlite":
+        return SQLiteTaskStore(settings.TASK_STORE_PATH)
+    return InMemoryTaskStore()
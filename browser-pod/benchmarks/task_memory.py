@@ -0,0 +1,97 @@
+"""Measure the memory held per task by TaskData.
+
+Compares the current slotted TaskData with an append-only StepLog against
+the previous representation, a plain dataclass with lists of step dicts.
+
+Usage: python -m benchmarks.task_memory [tasks] [steps_per_task]
+"""
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models.enums import TaskStatusEnum
+from app.utils.task_data import StepLog, TaskData, TaskStep
+
+
+@dataclass
+class LegacyTaskData:
+    """TaskData as it was before slots and the step log."""
+    id: str
+    task: str
+    status: TaskStatusEnum
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    output: Optional[str] = None
+    steps: List[Dict[str, Any]] = field(default_factory=list)
+    screenshots: List[str] = field(default_factory=list)
+    recordings: List[str] = field(default_factory=list)
+    output_files: List[str] = field(default_factory=list)
+    user_uploaded_files: List[str] = field(default_factory=list)
+    browser_data: Optional[Dict[str, Any]] = None
+    live_url: Optional[str] = None
+    public_share_url: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    agent_instance: Optional[Any] = None
+    cancel_event: Optional[Any] = None
+    pause_event: Optional[Any] = None
+
+
+def step_fields(task_index: int, step_index: int) -> Dict[str, str]:
+    """Return step values as they arrive from an agent, as fresh strings."""
+    return {
+        "evaluation_previous_goal": f"Step {step_index} completed",
+        "next_goal": "Execute click_element_by_index",
+        "url": "".join(["https://example.com/", f"page/{task_index % 10}"])
+    }
+
+
+def build_legacy(tasks: int, steps: int) -> list:
+    """Build tasks in the previous representation."""
+    result = []
+    for i in range(tasks):
+        task_data = LegacyTaskData(
+            id=f"{i:036d}", task=f"Task number {i}", status=TaskStatusEnum.FINISHED, created_at=datetime.utcnow()
+        )
+        task_data.steps = [step_fields(i, j) for j in range(steps)]
+        result.append(task_data)
+    return result
+
+
+def build_current(tasks: int, steps: int) -> list:
+    """Build tasks in the current representation."""
+    result = []
+    for i in range(tasks):
+        step_log = StepLog()
+        for j in range(steps):
+            step_log = step_log.append(TaskStep.from_dict(step_fields(i, j)))
+        result.append(TaskData(
+            id=f"{i:036d}", task=f"Task number {i}", status=TaskStatusEnum.FINISHED,
+            created_at=datetime.utcnow(), steps=step_log
+        ))
+    return result
+
+
+def measure(build, tasks: int, steps: int) -> float:
+    """Return the bytes allocated per task by a builder."""
+    tracemalloc.start()
+    data = build(tasks, steps)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size / tasks
+
+
+def main():
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    legacy = measure(build_legacy, tasks, steps)
+    current = measure(build_current, tasks, steps)
+    print(f"{tasks} tasks with {steps} steps each")
+    print(f"before: {legacy:,.0f} bytes/task")
+    print(f"after:  {current:,.0f} bytes/task ({current / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
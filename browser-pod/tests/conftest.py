@@ -1,10 +1,15 @@
 import pytest
 import asyncio
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
-from httpx import AsyncClient
+from httpx import AsyncClient, ASGITransport
 
 from app.main import app
 from app.utils.task_manager import task_manager
+from app.utils.task_events import TaskEventBroadcaster
+from app.utils.task_store import InMemoryTaskStore
+from app.services.scheduler import task_scheduler
+from app.services.browser_pool import browser_pool
 
 
 @pytest.fixture
@@ -16,18 +21,209 @@ def client():
 @pytest.fixture
 async def async_client():
     """Create an async test client."""
-    async with AsyncClient(app=app, base_url="http://test") as ac:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
 
 
+class FakeHistory:
+    """Minimal stand-in for browser-use's AgentHistoryList."""
+    
+    history = []
+    
+    def final_result(self):
+        return "done"
+    
+    def screenshots(self):
+        return []
+    
+    def model_actions(self):
+        return []
+    
+    def is_successful(self):
+        return True
+
+
+class FakeAgent:
+    """Stand-in for browser_use.Agent so tests never launch Chromium.
+    
+    ``steps`` are reported through the step callback while running; when
+    ``step_gate`` is set, the agent waits on it at the end of each step.
+    """
+    
+    instances = []
+    steps = []
+    step_gate = None
+    
+    def __init__(self, task, llm, **kwargs):
+        self.task = task
+        self.llm = llm
+        self.kwargs = kwargs
+        FakeAgent.instances.append(self)
+    
+    async def run(self, max_steps=100, on_step_start=None, on_step_end=None):
+        callback = self.kwargs.get("register_new_step_callback")
+        for n_steps, step in enumerate(FakeAgent.steps[:max_steps], 1):
+            if on_step_start:
+                await on_step_start(self)
+            if callback:
+                browser_state = SimpleNamespace(url=step.get("url", ""), screenshot=step.get("screenshot"))
+                model_output = SimpleNamespace(
+                    evaluation_previous_goal=step.get("evaluation_previous_goal", ""),
+                    next_goal=step.get("next_goal", "")
+                )
+                await callback(browser_state, model_output, n_steps)
+            gate = FakeAgent.step_gate
+            if gate:
+                await gate.wait()
+                gate.clear()
+            if on_step_end:
+                await on_step_end(self)
+        return FakeHistory()
+
+
+class FakeContext:
+    """Stand-in for a Playwright browser context."""
+    
+    def __init__(self, options):
+        self.options = options
+        self.closed = False
+        self.frozen = False
+        self.spilled = False
+        self.close_delay = 0
+        self.page_callbacks = []
+    
+    async def close(self):
+        await asyncio.sleep(self.close_delay)
+        self.closed = True
+
+
+class FakeBrowser:
+    """Stand-in for a Playwright browser."""
+    
+    def __init__(self, browser_id):
+        self.id = browser_id
+        self.contexts = []
+        self.closed = False
+        self.healthy = True
+        self.memory = 0
+
+
+class FakeBrowserFactory:
+    """Browser factory for the browser pool that never launches Chromium."""
+    
+    def __init__(self):
+        self.browsers = []
+        self.killed = []
+        self.orphans = {}
+    
+    async def launch(self, browser_id):
+        browser = FakeBrowser(browser_id)
+        self.browsers.append(browser)
+        return browser
+    
+    async def new_context(self, browser, **options):
+        context = FakeContext(options)
+        browser.contexts.append(context)
+        return context
+    
+    async def is_healthy(self, browser):
+        return browser.healthy
+    
+    async def freeze(self, context):
+        context.frozen = True
+    
+    async def thaw(self, context):
+        context.frozen = False
+    
+    async def spill(self, context, path):
+        path.write_text("{}")
+        context.spilled = True
+    
+    async def restore(self, context, path):
+        context.spilled = False
+        context.frozen = False
+    
+    def watch_pages(self, context, callback):
+        context.page_callbacks.append(callback)
+    
+    def kill(self, browser_id):
+        self.killed.append(browser_id)
+        return 1
+    
+    def kill_orphans(self, known_ids):
+        """Kill the fake processes in ``orphans`` whose browser ID is unknown."""
+        orphans = [browser_id for browser_id in self.orphans if browser_id not in known_ids]
+        for browser_id in orphans:
+            self.killed.append(browser_id)
+        return sum(self.orphans.pop(browser_id) for browser_id in orphans)
+    
+    def memory_usage(self, browser_id):
+        return next(browser.memory for browser in self.browsers if browser.id == browser_id)
+    
+    async def close(self, browser):
+        browser.closed = True
+
+
+@pytest.fixture
+def fake_browser_factory():
+    """Create a fake browser factory."""
+    return FakeBrowserFactory()
+
+
+@pytest.fixture(autouse=True)
+def fake_browser_pool(monkeypatch):
+    """Point the global browser pool at a fake browser factory."""
+    monkeypatch.setattr(browser_pool, "factory", FakeBrowserFactory())
+    monkeypatch.setattr(browser_pool, "_idle", [])
+    monkeypatch.setattr(browser_pool, "_in_use", {})
+    return browser_pool
+
+
+@pytest.fixture(autouse=True)
+def llm_api_key(monkeypatch):
+    """Configure the OpenAI provider so tasks can get an LLM."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+
+@pytest.fixture(autouse=True)
+def fake_agent(monkeypatch):
+    """Replace the browser-use Agent with a fake for every test."""
+    FakeAgent.instances = []
+    FakeAgent.steps = []
+    FakeAgent.step_gate = None
+    monkeypatch.setattr("app.services.browser_service.Agent", FakeAgent)
+    return FakeAgent
+
+
 @pytest.fixture(autouse=True)
 async def cleanup_tasks():
     """Clean up tasks after each test."""
     yield
     # Clear all tasks from the task manager
     async with task_manager._lock:
-        task_manager._tasks.clear()
+        task_manager._store = InMemoryTaskStore()
+        task_manager.events = TaskEventBroadcaster()
         task_manager._running_tasks.clear()
+        task_manager._batches.clear()
+    task_scheduler._queue.clear()
+    task_scheduler._entries.clear()
+    task_scheduler._requests.clear()
+    task_scheduler._running.clear()
+    task_scheduler._parked.clear()
+    task_scheduler._submitted_at.clear()
+
+
+@pytest.fixture(autouse=True)
+def upload_dirs(tmp_path, monkeypatch):
+    """Point the upload service at temporary directories, so tests never write into storage."""
+    from app.services.upload_service import upload_service
+    uploads, partial = tmp_path / "uploads", tmp_path / "partial"
+    uploads.mkdir()
+    partial.mkdir()
+    monkeypatch.setattr(upload_service, "uploads_path", uploads)
+    monkeypatch.setattr(upload_service, "partial_path", partial)
+    monkeypatch.setattr(upload_service, "blobs_path", tmp_path / "blobs")
+    return uploads, partial
 
 
 @pytest.fixture
@@ -0,0 +1,123 @@
+import pytest
+import asyncio
+import json
+
+from app.config import settings
+from app.services.scheduler import task_scheduler
+
+
+async def wait_for_batch(async_client, batch_id):
+    for _ in range(200):
+        data = (await async_client.get(f"/api/v1/batch/{batch_id}")).json()
+        if data["finished_at"]:
+            break
+        await asyncio.sleep(0.01)
+    return data
+
+
+@pytest.mark.asyncio
+async def test_run_tasks_creates_batch(async_client, sample_task_request):
+    """Test that a JSON array of requests is created and run as one batch."""
+    requests = [
+        {**sample_task_request, "task": "First"},
+        {**sample_task_request, "task": "Second", "idempotency_key": "batch-key"},
+        {**sample_task_request, "task": "Second again", "idempotency_key": "batch-key"}
+    ]
+    response = await async_client.post("/api/v1/run-tasks", json=requests)
+    assert response.status_code == 200
+    batch = response.json()
+    assert batch["created"] == 2
+    assert len(batch["task_ids"]) == 3 and batch["task_ids"][1] == batch["task_ids"][2]
+
+    data = await wait_for_batch(async_client, batch["id"])
+    assert data["total"] == 2
+    assert data["finished"] == 2
+    assert data["created"] == data["running"] == data["failed"] == 0
+
+    task = (await async_client.get(f"/api/v1/task/{batch['task_ids'][0]}")).json()
+    assert task["batch_id"] == batch["id"] and task["task"] == "First"
+
+    # Retrying the batch returns the original task for the repeated key
+    response = await async_client.post("/api/v1/run-tasks", json=requests[1:])
+    assert response.json()["task_ids"] == batch["task_ids"][1:]
+    assert response.json()["created"] == 0
+    assert (await async_client.get("/api/v1/batch/unknown")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_run_tasks_ndjson(async_client, sample_task_request):
+    """Test that requests can be streamed as NDJSON and invalid lines are reported by index."""
+    headers = {"Content-Type": "application/x-ndjson"}
+    lines = [json.dumps({**sample_task_request, "task": f"Task {i}"}) for i in range(3)]
+
+    response = await async_client.post(
+        "/api/v1/run-tasks", content="\n".join([lines[0], "", '{"priority": 1}', lines[1]]), headers=headers
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", 1, "task"]
+
+    response = await async_client.post("/api/v1/run-tasks", content="\n".join(lines) + "\n", headers=headers)
+    assert response.status_code == 200
+    data = await wait_for_batch(async_client, response.json()["id"])
+    assert data["total"] == data["finished"] == 3
+
+
+@pytest.mark.asyncio
+async def test_run_tasks_rejects_oversize_body_while_reading(async_client, sample_task_request, monkeypatch):
+    """Test that oversize batches get 413 before the rest of the body is read."""
+    monkeypatch.setattr(settings, "MAX_BATCH_SIZE", 2)
+    sent = []
+
+    async def lines():
+        for i in range(1000):
+            sent.append(i)
+            yield (json.dumps(sample_task_request) + "\n").encode()
+
+    response = await async_client.post(
+        "/api/v1/run-tasks", content=lines(), headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Batch of 3 tasks exceeds the limit of 2 tasks"
+    assert len(sent) < 10
+
+    monkeypatch.setattr(settings, "MAX_BATCH_BODY_SIZE", 1024)
+    response = await async_client.post("/api/v1/run-tasks", json=[sample_task_request] * 2 + [{"task": "x" * 2000}])
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Request body exceeds the limit of 1024 bytes"
+    assert (await async_client.get("/api/v1/tasks")).json()["total_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_tasks_queues_beyond_queue_limit(async_client, sample_task_request, monkeypatch):
+    """Test that an admitted batch is queued whole even when it is larger than the queue limit."""
+    monkeypatch.setattr(task_scheduler, "max_queue_size", 5)
+    response = await async_client.post("/api/v1/run-tasks", json=[sample_task_request] * 50)
+    assert response.status_code == 200
+    assert response.json()["created"] == 50
+
+    data = await wait_for_batch(async_client, response.json()["id"])
+    assert data["total"] == data["finished"] == 50
+
+
+@pytest.mark.asyncio
+async def test_run_tasks_rejected_as_a_whole(async_client, sample_task_request, monkeypatch):
+    """Test that a batch is rejected without creating tasks if any request or the queue cannot take it."""
+    response = await async_client.post("/api/v1/run-tasks", json=[
+        sample_task_request, {**sample_task_request, "included_file_names": ["missing.txt"]}
+    ])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Task 1: Unknown files: missing.txt"
+
+    monkeypatch.setattr(settings, "MAX_BATCH_SIZE", 2)
+    response = await async_client.post("/api/v1/run-tasks", json=[sample_task_request] * 3)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Batch of 3 tasks exceeds the limit of 2 tasks"
+
+    monkeypatch.setattr(task_scheduler, "max_workers", 0)
+    monkeypatch.setattr(task_scheduler, "max_queue_size", 0)
+    response = await async_client.post("/api/v1/run-tasks", json=[sample_task_request])
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+    assert (await async_client.post("/api/v1/run-tasks", json=[])).status_code == 400
+    assert (await async_client.get("/api/v1/tasks")).json()["total_count"] == 0
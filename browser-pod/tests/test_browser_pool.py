@@ -0,0 +1,204 @@
+import pytest
+import asyncio
+import os
+from types import SimpleNamespace
+
+import psutil
+
+from app.services.browser_pool import (
+    BROWSER_ID_ARG, BROWSER_OWNER_ARG, BrowserPool, ChromiumBrowserFactory, process_owner_id
+)
+from app.services.resource_tracker import resource_tracker
+
+
+@pytest.mark.asyncio
+async def test_pool_prelaunches_browsers(fake_browser_factory):
+    """Test that starting the pool launches its configured number of browsers."""
+    pool = BrowserPool(fake_browser_factory, size=2, health_check_interval=0)
+    await pool.start()
+    
+    assert len(fake_browser_factory.browsers) == 2
+    assert pool.stats()["idle"] == 2
+    await pool.close()
+    assert all(browser.closed for browser in fake_browser_factory.browsers)
+
+
+@pytest.mark.asyncio
+async def test_pool_hits_and_misses(fake_browser_factory):
+    """Test that warm browsers are reused and extra leases launch new ones."""
+    pool = BrowserPool(fake_browser_factory, size=1, health_check_interval=0)
+    await pool.start()
+    
+    first = await pool.acquire(viewport={"width": 800, "height": 600})
+    second = await pool.acquire()
+    assert first.hit
+    assert not second.hit
+    assert first.context.options == {"viewport": {"width": 800, "height": 600}}
+    assert first.context is not second.context
+    
+    await pool.release(first)
+    await pool.release(second)
+    assert first.context.closed and second.context.closed
+    
+    stats = pool.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 0
+    
+    # Surplus browsers beyond the pool size are closed on release
+    assert second.browser.browser.closed
+    third = await pool.acquire()
+    assert third.hit
+    assert third.browser is first.browser
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_after_max_tasks(fake_browser_factory):
+    """Test that a browser is replaced after serving max_tasks leases."""
+    pool = BrowserPool(fake_browser_factory, size=1, max_tasks=2, health_check_interval=0)
+    await pool.start()
+    
+    for _ in range(2):
+        lease = await pool.acquire()
+        await pool.release(lease)
+    
+    assert lease.browser.browser.closed
+    assert pool.stats()["recycled"] == 1
+    assert pool.stats()["idle"] == 1
+    assert len(fake_browser_factory.browsers) == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_over_memory_limit(fake_browser_factory):
+    """Test that a browser over the memory limit is recycled on release."""
+    pool = BrowserPool(fake_browser_factory, size=1, max_memory_mb=100, health_check_interval=0)
+    await pool.start()
+    
+    lease = await pool.acquire()
+    lease.browser.browser.memory = 200 * 1024 * 1024
+    await pool.release(lease)
+    
+    assert lease.browser.browser.closed
+    assert pool.stats()["recycled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_health_check_replaces_unhealthy(fake_browser_factory):
+    """Test that unhealthy idle browsers are replaced."""
+    pool = BrowserPool(fake_browser_factory, size=2, health_check_interval=0)
+    await pool.start()
+    
+    fake_browser_factory.browsers[0].healthy = False
+    await pool.check_health()
+    
+    assert fake_browser_factory.browsers[0].closed
+    assert pool.stats()["unhealthy"] == 1
+    assert pool.stats()["idle"] == 2
+    assert len(fake_browser_factory.browsers) == 3
+
+
+@pytest.mark.asyncio
+async def test_task_runs_on_pooled_context(sample_task_request, fake_agent, fake_browser_pool):
+    """Test that tasks run agents on a leased context and return it afterwards."""
+    from app.models.requests import RunTaskRequest
+    from app.services.browser_service import browser_service
+    from app.utils.task_manager import task_manager
+    
+    request = RunTaskRequest(**sample_task_request)
+    task_id = await task_manager.create_task(request.task)
+    await browser_service.create_and_run_task(task_id, request)
+    
+    context = fake_agent.instances[0].kwargs["browser_context"]
+    assert context.options == {"viewport": {"width": 1280, "height": 960}}
+    assert context.closed
+    assert fake_browser_pool.stats()["in_use"] == 0
+
+
+def test_browser_pool_stats_endpoint(client):
+    """Test the browser pool statistics endpoint."""
+    response = client.get("/api/v1/browser-pool")
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert "hits" in data
+    assert "misses" in data
+
+
+@pytest.mark.asyncio
+async def test_pool_kills_browser_when_context_hangs(fake_browser_factory):
+    """Test that a context that does not close in time takes its browser down with it."""
+    pool = BrowserPool(fake_browser_factory, size=1, health_check_interval=0, teardown_timeout=0.01)
+    await pool.start()
+    lease = await pool.acquire()
+    lease.context.close_delay = 1
+    
+    await pool.release(lease)
+    
+    assert lease.browser.browser.closed
+    assert lease.browser.browser not in [pooled.browser for pooled in pool._idle]
+    assert pool.stats()["idle"] == 1
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_sweeps_orphaned_browsers(fake_browser_factory):
+    """Test that processes of browsers the pool does not know are killed."""
+    pool = BrowserPool(fake_browser_factory, size=1, health_check_interval=0, orphan_sweep_interval=0)
+    fake_browser_factory.orphans = {"previous-run": 3}
+    await pool.start()
+    lease = await pool.acquire()
+    fake_browser_factory.orphans[lease.browser.id] = 2
+    
+    assert await pool.sweep_orphans() == 0
+    assert pool.stats()["orphans_killed"] == 3
+    assert fake_browser_factory.killed == ["previous-run"]
+    await pool.close()
+
+
+def test_orphan_sweep_spares_other_server_processes(monkeypatch):
+    """Test that browsers of another live server process on the host are not killed."""
+    factory = ChromiumBrowserFactory()
+    killed = []
+
+    def process(pid, browser_id, owner=None):
+        args = ["chromium", f"{BROWSER_ID_ARG}{browser_id}"] + ([f"{BROWSER_OWNER_ARG}{owner}"] if owner else [])
+        return SimpleNamespace(
+            pid=pid, info={"cmdline": args}, children=lambda recursive: [], kill=lambda: killed.append(browser_id)
+        )
+
+    processes = [
+        process(1, "mine-known", factory.owner),
+        process(2, "mine-lost", factory.owner),
+        process(3, "other-worker", process_owner_id(psutil.Process(os.getppid()))),
+        process(4, "crashed-worker", "999999999-1.000"),
+        process(5, "untagged")
+    ]
+    monkeypatch.setattr(psutil, "process_iter", lambda attrs: iter(processes))
+
+    assert factory.kill_orphans({"mine-known"}) == 2
+    assert killed == ["mine-lost", "crashed-worker"]
+
+
+@pytest.mark.asyncio
+async def test_stop_task_closes_context(async_client, sample_task_request, fake_agent, fake_browser_pool):
+    """Test that stopping a running task closes its context and every page opened in it."""
+    fake_agent.steps = [{"next_goal": "Wait"}]
+    fake_agent.step_gate = asyncio.Event()
+    
+    task_id = (await async_client.post("/api/v1/run-task", json=sample_task_request)).json()["id"]
+    while not fake_agent.instances or not resource_tracker.stats()["open_resources"]:
+        await asyncio.sleep(0.01)
+    context = fake_browser_pool.factory.browsers[-1].contexts[-1]
+    page = SimpleNamespace(closed=False)
+    async def close_page():
+        page.closed = True
+    page.close = close_page
+    context.page_callbacks[0](page)
+    
+    response = await async_client.put(f"/api/v1/stop-task?task_id={task_id}")
+    
+    assert response.status_code == 200
+    assert context.closed and page.closed
+    assert resource_tracker.stats()["open_resources"] == 0
+    assert fake_browser_pool.stats()["in_use"] == 0
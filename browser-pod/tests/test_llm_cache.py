@@ -0,0 +1,127 @@
+import pytest
+import asyncio
+import base64
+import io
+
+from browser_use.llm.messages import ContentPartImageParam, ContentPartTextParam, ImageURL, SystemMessage, UserMessage
+from browser_use.llm.views import ChatInvokeCompletion, ChatInvokeUsage
+from PIL import Image
+from pydantic import BaseModel
+
+from app.models.enums import LLMCachePolicy
+from app.services.llm_cache import LLMResponseCache, cache_key
+from app.services.metrics import metrics
+
+
+class Answer(BaseModel):
+    action: str
+
+
+class CountingLLM:
+    """Chat model counting its calls."""
+
+    model = "gpt-4o"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages, output_format=None):
+        self.calls += 1
+        usage = ChatInvokeUsage(
+            prompt_tokens=10, prompt_cached_tokens=None, prompt_cache_creation_tokens=None,
+            prompt_image_tokens=None, completion_tokens=2, total_tokens=12
+        )
+        completion = Answer(action=f"click {self.calls}") if output_format else f"answer {self.calls}"
+        return ChatInvokeCompletion(completion=completion, usage=usage)
+
+
+def screenshot(color, noise=False) -> str:
+    image = Image.new("RGB", (640, 480), color)
+    if noise:
+        image.putpixel((10, 10), (0, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def prompt(text, image):
+    return [
+        SystemMessage(content="You are a browser agent"),
+        UserMessage(content=[
+            ContentPartTextParam(text=text),
+            ContentPartImageParam(image_url=ImageURL(url=image))
+        ])
+    ]
+
+
+@pytest.fixture
+async def cache(tmp_path):
+    cache = LLMResponseCache(path=tmp_path / "llm_cache.db", max_entries=2, ttl_seconds=3600)
+    yield cache
+    await cache.close()
+
+
+def test_cache_key_normalization():
+    """Test that keys ignore timestamps, whitespace and invisible screenshot changes."""
+    key = cache_key("gpt-4o", prompt("Step 1\nCurrent date and time: 2025-01-01 10:00", screenshot("white")), Answer)
+
+    assert key == cache_key(
+        "gpt-4o", prompt("Step 1   Current date and time: 2025-06-30 17:45", screenshot("white", noise=True)), Answer
+    )
+    assert key != cache_key("gpt-4o", prompt("Step 2 Current date and time: 2025-01-01 10:00", screenshot("white")), Answer)
+    assert key != cache_key(
+        "gpt-4o", prompt("Step 1 Current date and time: 2025-01-01 10:00", screenshot("white").replace("data:", "")),
+        Answer
+    )
+    assert key != cache_key("gpt-4o-mini", prompt("Step 1 Current date and time: 2025-01-01 10:00", screenshot("white")), Answer)
+
+
+@pytest.mark.asyncio
+async def test_cache_replays_responses(cache):
+    """Test that a repeated prompt is answered from the cache without calling the model."""
+    llm = CountingLLM()
+    cache.wrap(llm, LLMCachePolicy.USE)
+    hits, misses = metrics.llm_cache_hits.value(), metrics.llm_cache_misses.value()
+
+    first = await llm.ainvoke(prompt("Find the price", screenshot("white")), Answer)
+    second = await llm.ainvoke(prompt("Find  the price", screenshot("white")), Answer)
+
+    assert second.completion == first.completion == Answer(action="click 1")
+    assert second.usage is None
+    assert metrics.llm_cache_hits.value() == hits + 1
+    assert metrics.llm_cache_misses.value() == misses + 1
+
+    refreshing = CountingLLM()
+    cache.wrap(refreshing, LLMCachePolicy.REFRESH)
+    await refreshing.ainvoke(prompt("Find the price", screenshot("white")), Answer)
+    assert refreshing.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_and_expires(cache):
+    """Test least recently used eviction and expiry of cached responses."""
+    await cache.put("a", "1")
+    await cache.put("b", "2")
+    assert await cache.get("a") == "1"
+    await cache.put("c", "3")
+
+    assert await cache.get("b") is None
+    assert cache.stats() == {"entries": 2, "evictions": 1}
+
+    cache.ttl_seconds = 0.01
+    await asyncio.sleep(0.02)
+    assert await cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_task_cache_policy(async_client, sample_task_request, fake_agent):
+    """Test that only tasks opting in get a cached LLM."""
+    await async_client.post("/api/v1/run-task", json={**sample_task_request, "cache_policy": "use"})
+    await async_client.post("/api/v1/run-task", json=sample_task_request)
+    for _ in range(100):
+        if len(fake_agent.instances) == 2:
+            break
+        await asyncio.sleep(0.01)
+
+    wrapped = [agent.llm.ainvoke.__name__ == "cached_ainvoke" for agent in fake_agent.instances]
+    assert sorted(wrapped) == [False, True]
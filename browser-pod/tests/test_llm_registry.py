@@ -0,0 +1,99 @@
+import pytest
+import asyncio
+import time
+
+import httpx
+from browser_use.llm.messages import UserMessage
+
+from app.services.llm_registry import LLMClientRegistry, TokenBucket, parse_provider_limits
+
+
+class StubOpenAIServer:
+    """In-process stand-in for the OpenAI chat completions API."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return httpx.Response(200, json={
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "stub answer"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}
+        })
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return StubOpenAIServer(delay=0.02)
+
+
+@pytest.fixture
+async def registry(stub_server):
+    registry = LLMClientRegistry(
+        max_concurrency=2, requests_per_minute=0, provider_limits={}, max_retries=0,
+        transport=httpx.MockTransport(stub_server.handle)
+    )
+    yield registry
+    await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_registry_shares_clients(registry):
+    """Test that tasks reuse one model instance, SDK client and connection pool."""
+    llm = registry.get("gpt-4o")
+    other = registry.get("gpt-4o")
+    assert other is not llm
+    assert other.get_client() is llm.get_client()
+    assert registry.get("gpt-4o-mini").http_client is llm.http_client
+    assert registry.stats()["clients"] == 2
+
+    # Agents wrap ainvoke on their own copy only
+    setattr(llm, "ainvoke", None)
+    assert registry.get("gpt-4o").ainvoke is not None
+
+
+@pytest.mark.asyncio
+async def test_registry_limits_concurrency(registry, stub_server):
+    """Test that parallel agents never have more calls in flight than the provider limit."""
+    llm = registry.get("gpt-4o")
+
+    results = await asyncio.gather(*(llm.ainvoke([UserMessage(content="hi")]) for _ in range(6)))
+
+    assert [result.completion for result in results] == ["stub answer"] * 6
+    assert stub_server.requests == 6
+    assert stub_server.max_in_flight == 2
+    assert registry.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_spreads_calls():
+    """Test that calls beyond the burst wait for the refill rate."""
+    bucket = TokenBucket(rate=20, burst=1)
+    start = time.monotonic()
+    waits = [await bucket.acquire() for _ in range(3)]
+    assert waits[0] == 0
+    assert time.monotonic() - start >= 0.09
+
+
+def test_parse_provider_limits():
+    """Test parsing per-provider concurrency and rate limits."""
+    assert parse_provider_limits("openai=32/600, anthropic=8") == {"openai": (32, 600), "anthropic": (8, 0)}
+    assert parse_provider_limits("") == {}
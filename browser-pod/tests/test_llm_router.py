@@ -0,0 +1,142 @@
+import pytest
+import asyncio
+
+from app.models.enums import LLMModel, TaskStatusEnum
+from app.services.llm_router import LLMRouter, LLMUnavailableError
+from app.services.metrics import metrics
+
+
+class FakeModel:
+    """Chat model answering with its own name after a delay, or failing."""
+
+    def __init__(self, name, behaviour):
+        self.name = name
+        self.behaviour = behaviour
+        self.calls = 0
+        self.cancelled = False
+
+    async def ainvoke(self, messages, output_format=None):
+        self.calls += 1
+        delay, error = self.behaviour.get(self.name, (0, None))
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if error:
+            raise error
+        return self.name
+
+
+class FakeRegistry:
+    """Registry handing out fake models for the configured providers."""
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.behaviour = {}
+        self.models = {}
+
+    def is_configured(self, provider):
+        return provider in self.providers
+
+    def get(self, model, provider="openai"):
+        return self.models.setdefault(model, FakeModel(model, self.behaviour))
+
+
+def make_router(*providers, **options):
+    registry = FakeRegistry(set(providers))
+    options = {"failover": True, "hedge": True, "failure_cooldown": 30, "hedge_min_samples": 5, **options}
+    return LLMRouter(registry=registry, **options), registry
+
+
+def test_router_maps_models_to_configured_providers():
+    """Test that only equivalent models of configured providers are candidates."""
+    router, _ = make_router("openai", cross_provider=True)
+    assert router.candidates(LLMModel.GPT_4O) == [LLMModel.GPT_4O, LLMModel.GPT_4_1]
+    # Claude without an Anthropic key is served by an equivalent OpenAI model
+    assert router.candidates(LLMModel.CLAUDE_SONNET_4) == [LLMModel.GPT_4O, LLMModel.GPT_4_1]
+    assert router.get(LLMModel.CLAUDE_SONNET_4).model == "claude-sonnet-4-20250514"
+
+
+def test_router_stays_with_requested_provider_by_default():
+    """Test that failover and hedging are opt-in and never leave the provider unless configured."""
+    router, _ = make_router("openai", "anthropic", "google", failover=None, hedge=None)
+    assert not router.failover and not router.hedge
+    assert router.candidates(LLMModel.GPT_4O) == [LLMModel.GPT_4O]
+
+    router, _ = make_router("openai", "anthropic", "google")
+    assert router.candidates(LLMModel.GPT_4O) == [LLMModel.GPT_4O, LLMModel.GPT_4_1]
+    assert router.candidates(LLMModel.CLAUDE_SONNET_4) == [LLMModel.CLAUDE_SONNET_4, LLMModel.CLAUDE_3_7_SONNET]
+    assert router.candidates(LLMModel.GEMINI_2_5_PRO) == [LLMModel.GEMINI_2_5_PRO]
+
+    router, _ = make_router("openai")
+    with pytest.raises(LLMUnavailableError, match="ANTHROPIC_API_KEY"):
+        router.get(LLMModel.CLAUDE_SONNET_4)
+
+    router, _ = make_router("google")
+    with pytest.raises(LLMUnavailableError, match="OPENAI_API_KEY"):
+        router.get(LLMModel.O3)
+
+
+def test_router_prefers_faster_equivalents():
+    """Test that equivalents are ordered by recent median latency."""
+    router, _ = make_router("openai", "anthropic", cross_provider=True)
+    for _ in range(5):
+        router.latency(LLMModel.GPT_4_1).record(3.0)
+        router.latency(LLMModel.CLAUDE_SONNET_4).record(1.0)
+    candidates = router.candidates(LLMModel.GPT_4O)
+    assert candidates[:3] == [LLMModel.GPT_4O, LLMModel.CLAUDE_SONNET_4, LLMModel.GPT_4_1]
+
+
+@pytest.mark.asyncio
+async def test_router_fails_over():
+    """Test that a failing model is retried on an equivalent and then tried last."""
+    router, registry = make_router("openai", hedge=False)
+    registry.behaviour["gpt-4o"] = (0, RuntimeError("provider down"))
+    failovers = metrics.llm_failovers.value()
+
+    assert await router.get(LLMModel.GPT_4O).ainvoke([]) == "gpt-4.1"
+    assert metrics.llm_failovers.value() == failovers + 1
+    assert router.candidates(LLMModel.GPT_4O) == [LLMModel.GPT_4_1, LLMModel.GPT_4O]
+
+    registry.behaviour["gpt-4.1"] = (0, RuntimeError("also down"))
+    with pytest.raises(RuntimeError):
+        await router.get(LLMModel.GPT_4O).ainvoke([])
+
+
+@pytest.mark.asyncio
+async def test_router_hedges_slow_calls():
+    """Test that a call slower than the model's p95 is raced against an equivalent."""
+    router, registry = make_router("openai")
+    for _ in range(5):
+        router.latency(LLMModel.GPT_4O).record(0.02)
+    registry.behaviour["gpt-4o"] = (5, None)
+    hedge_wins = metrics.llm_hedge_wins.value()
+
+    result = await asyncio.wait_for(router.get(LLMModel.GPT_4O).ainvoke([]), timeout=1)
+
+    assert result == "gpt-4.1"
+    assert metrics.llm_hedge_wins.value() == hedge_wins + 1
+    assert registry.models["gpt-4o"].cancelled
+
+
+@pytest.mark.asyncio
+async def test_task_fails_without_llm_provider(async_client, sample_task_request, monkeypatch):
+    """Test that a task fails with a clear error instead of running on a mock LLM."""
+    for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GOOGLE_API_KEY", "GROQ_API_KEY"):
+        monkeypatch.delenv(key, raising=False)
+
+    response = await async_client.post("/api/v1/run-task", json=sample_task_request)
+    task_id = response.json()["id"]
+    for _ in range(100):
+        data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+        if data["status"] == TaskStatusEnum.FAILED:
+            break
+        await asyncio.sleep(0.01)
+
+    assert data["status"] == TaskStatusEnum.FAILED
+    assert "No API key configured for gpt-4o" in data["output"]
+
+    response = await async_client.get("/api/v1/llm")
+    gpt_4o = next(model for model in response.json()["models"] if model["model"] == "gpt-4o")
+    assert gpt_4o["provider"] == "openai" and not gpt_4o["available"]
@@ -0,0 +1,94 @@
+import gzip
+import json
+
+import pytest
+
+from app.config import settings
+from app.services.media_service import media_service
+
+
+@pytest.fixture
+def output_file(tmp_path, monkeypatch):
+    """Write a JSON output file for a task under temporary storage."""
+    monkeypatch.setattr(settings, "OUTPUTS_PATH", tmp_path / "outputs")
+    monkeypatch.setattr(media_service, "compressed_path", tmp_path / "compressed")
+    media_service.compressed_path.mkdir()
+    path = settings.OUTPUTS_PATH / "task-1" / "results.json"
+    path.parent.mkdir(parents=True)
+    content = json.dumps([{"row": i, "value": "x" * 20} for i in range(200)]).encode()
+    path.write_bytes(content)
+    return content
+
+
+def test_download_output_range(client, output_file):
+    """Range requests get partial content."""
+    response = client.get(
+        "/api/v1/download/output/task-1/results.json",
+        headers={"Range": "bytes=10-19", "Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 206
+    assert response.content == output_file[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(output_file)}"
+
+
+def test_download_output_not_modified(client, output_file):
+    """Revalidating with the ETag or modification date returns 304."""
+    url = "/api/v1/download/output/task-1/results.json"
+    response = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    etag = response.headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get(url, headers={"If-Modified-Since": response.headers["last-modified"]})
+    assert response.status_code == 304
+
+    response = client.get(url, headers={"If-None-Match": '"stale"', "Accept-Encoding": "identity"})
+    assert response.status_code == 200
+
+
+def test_download_output_precompressed(client, output_file):
+    """Text outputs are served from a compressed copy written on first use."""
+    url = "/api/v1/download/output/task-1/results.json"
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.content == output_file  # decoded by the client
+
+    copies = list(media_service.compressed_path.glob("*.gz"))
+    assert len(copies) == 1
+    assert gzip.decompress(copies[0].read_bytes()) == output_file
+
+    # The compressed representation revalidates with its own ETag
+    response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+    response = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == output_file
+
+
+def test_download_output_rejects_other_directories(client, output_file):
+    """Only files inside the task directory can be downloaded."""
+    response = client.get("/api/v1/download/output/task-1/..")
+    assert response.status_code == 404
+    response = client.get("/api/v1/download/output/task-1/missing.json")
+    assert response.status_code == 404
+
+
+def test_download_recording_range(client, tmp_path, monkeypatch):
+    """Recordings support seeking through Range requests."""
+    monkeypatch.setattr(settings, "RECORDINGS_PATH", tmp_path / "recordings")
+    path = settings.RECORDINGS_PATH / "task-1" / "session.webm"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(bytes(range(256)) * 4)
+
+    response = client.get("/api/v1/download/recording/task-1/session.webm", headers={"Range": "bytes=-16"})
+    assert response.status_code == 206
+    assert response.content == bytes(range(240, 256))
+    assert response.headers["content-type"] == "video/webm"
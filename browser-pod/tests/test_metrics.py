@@ -0,0 +1,83 @@
+import pytest
+import asyncio
+from types import SimpleNamespace
+
+from app.models.enums import TaskStatusEnum
+from app.services.metrics import Counter, Histogram, Metrics, metrics
+
+
+def test_histogram_render():
+    """Test that histogram buckets are cumulative and inclusive of their bound."""
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4"
+    ]
+
+
+def test_counter_labels():
+    """Test that counters are rendered per label value."""
+    counter = Counter("finished_total", "Finished", ("status",))
+    counter.inc(status="failed")
+    counter.inc(status="finished")
+    counter.inc(status="finished")
+
+    assert counter.render()[2:] == ['finished_total{status="failed"} 1', 'finished_total{status="finished"} 2']
+
+
+@pytest.mark.asyncio
+async def test_instrument_llm():
+    """Test that LLM calls are timed and their token usage recorded."""
+    usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=80)
+
+    class FakeLLM:
+        async def ainvoke(self, messages, output_format=None):
+            return SimpleNamespace(completion="ok", usage=usage)
+
+    llm_metrics = Metrics()
+    llm = llm_metrics.instrument_llm(FakeLLM())
+
+    assert (await llm.ainvoke([])).completion == "ok"
+    assert llm_metrics.llm_call_duration.count == 1
+    assert llm_metrics.llm_prompt_tokens.sum == 1200
+    assert llm_metrics.llm_completion_tokens.sum == 80
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(async_client, sample_task_request, fake_agent):
+    """Test that a finished task shows up in the task histograms and status counters."""
+    fake_agent.steps = [{"next_goal": "Open page"}, {"next_goal": "Done"}]
+    queue_waits = metrics.task_queue_wait.count
+    first_steps = metrics.task_first_step.count
+    steps = metrics.step_duration.count
+    finished = metrics.tasks_finished.value(status=TaskStatusEnum.FINISHED.value)
+
+    response = await async_client.post("/api/v1/run-task", json=sample_task_request)
+    task_id = response.json()["id"]
+    for _ in range(100):
+        status = (await async_client.get(f"/api/v1/task/{task_id}/status")).json()
+        if status == TaskStatusEnum.FINISHED:
+            break
+        await asyncio.sleep(0.01)
+
+    assert metrics.task_queue_wait.count == queue_waits + 1
+    assert metrics.task_first_step.count == first_steps + 1
+    assert metrics.step_duration.count == steps + 2
+    assert metrics.tasks_finished.value(status=TaskStatusEnum.FINISHED.value) == finished + 1
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE browser_pod_step_duration_seconds histogram" in body
+    assert f'browser_pod_tasks_finished_total{{status="finished"}} {finished + 1}' in body
+    assert "browser_pod_tasks_queued 0" in body
+    assert "browser_pod_browsers_in_use 0" in body
@@ -0,0 +1,235 @@
+import pytest
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Optional
+
+from browser_use.agent.views import ActionResult
+from pydantic import BaseModel
+
+from app.models.enums import TaskStatusEnum
+from app.services.metrics import metrics
+from app.services.replay_service import ReplayDivergedError, ReplayService, replay_service
+from app.utils.task_manager import TaskManager
+
+
+class Click(BaseModel):
+    index: int
+
+
+class Navigate(BaseModel):
+    url: str
+
+
+class Done(BaseModel):
+    text: str
+    success: bool = True
+
+
+class FakeAction(BaseModel):
+    """Action model with the three actions the tests record."""
+
+    click_element_by_index: Optional[Click] = None
+    go_to_url: Optional[Navigate] = None
+    done: Optional[Done] = None
+
+
+def element(xpath):
+    return SimpleNamespace(
+        tag_name="button", xpath=xpath, highlight_index=3, entire_parent_branch_path=["html", "body", "button"],
+        attributes={"id": "buy"}, shadow_root=False, css_selector="#buy"
+    )
+
+
+def history():
+    """Agent history opening a shop, clicking a button and finishing."""
+    def step(url, goal, action, interacted=None):
+        return SimpleNamespace(
+            state=SimpleNamespace(url=url, interacted_element=[interacted]),
+            model_output=SimpleNamespace(next_goal=goal, action=[action])
+        )
+
+    return SimpleNamespace(history=[
+        step("about:blank", "Open the shop", FakeAction(go_to_url=Navigate(url="https://shop.test/"))),
+        step("https://shop.test", "Buy", FakeAction(click_element_by_index=Click(index=3)), element("/html/body/button")),
+        step("https://shop.test/cart#top", "Finish", FakeAction(done=Done(text="bought"))),
+        SimpleNamespace(state=SimpleNamespace(url="https://shop.test/cart", interacted_element=[]), model_output=None)
+    ])
+
+
+class FakeSession:
+    """Browser session whose page follows the replayed actions."""
+
+    def __init__(self):
+        self.page = SimpleNamespace(url="about:blank")
+
+    async def start(self):
+        pass
+
+    async def get_current_page(self):
+        return self.page
+
+    async def get_state_summary(self, cache_clickable_elements_hashes):
+        return SimpleNamespace(url=self.page.url, screenshot=None)
+
+
+class ReplayingAgent:
+    """Fake agent able to replay scripts on a fake browser session."""
+
+    ActionModel = FakeAction
+    instances = []
+    missing_xpaths = set()
+
+    def __init__(self, task=None, llm=None, **kwargs):
+        self.browser_session = FakeSession()
+        self.acted = []
+        self.ran = False
+        ReplayingAgent.instances.append(self)
+
+    async def _update_action_indices(self, historical_element, action, browser_state_summary):
+        return None if historical_element.xpath in self.missing_xpaths else action
+
+    async def multi_act(self, actions):
+        (action,) = actions
+        self.acted.append(action)
+        if action.go_to_url:
+            self.browser_session.page.url = action.go_to_url.url
+        if action.click_element_by_index:
+            self.browser_session.page.url = "https://shop.test/cart"
+        if action.done:
+            return [ActionResult(is_done=True, success=True, extracted_content=action.done.text)]
+        return [ActionResult()]
+
+    async def run(self, max_steps=100, on_step_start=None, on_step_end=None):
+        self.ran = True
+        return SimpleNamespace(
+            history=[], final_result=lambda: "done", screenshots=lambda: [], model_actions=lambda: [],
+            is_successful=lambda: True
+        )
+
+
+@pytest.fixture
+def scripts(tmp_path, monkeypatch):
+    """Keep saved scripts in a temporary directory."""
+    monkeypatch.setattr(replay_service, "scripts_path", tmp_path)
+    ReplayingAgent.instances = []
+    ReplayingAgent.missing_xpaths = set()
+    return replay_service
+
+
+@pytest.mark.asyncio
+async def test_save_and_replay_script(tmp_path):
+    """Test that a saved run replays its actions and final result without the LLM."""
+    service = ReplayService(scripts_path=tmp_path)
+    assert await service.save("recorded", "Buy something", history())
+    assert not await service.save("empty", "Nothing", SimpleNamespace(history=[]))
+
+    script = await service.load("recorded")
+    assert [step["goal"] for step in script["steps"]] == ["Open the shop", "Buy", "Finish"]
+    assert script["steps"][1]["actions"][0] == {
+        "action": {"click_element_by_index": {"index": 3}},
+        "element": {
+            "tag_name": "button", "xpath": "/html/body/button", "highlight_index": 3,
+            "entire_parent_branch_path": ["html", "body", "button"], "attributes": {"id": "buy"}, "shadow_root": False
+        }
+    }
+
+    agent = ReplayingAgent()
+    steps = []
+
+    async def on_step(state, step, n_steps):
+        steps.append((n_steps, state.url))
+
+    assert await service.replay(agent, script, on_step=on_step) == "bought"
+    assert [action.model_dump(exclude_none=True) for action in agent.acted] == [
+        step["actions"][0]["action"] for step in script["steps"]
+    ]
+    # Fragments and trailing slashes do not count as a different page
+    assert steps == [(1, "about:blank"), (2, "https://shop.test/"), (3, "https://shop.test/cart")]
+
+
+@pytest.mark.asyncio
+async def test_replay_diverges(tmp_path):
+    """Test that a changed URL or a missing element stops the replay."""
+    service = ReplayService(scripts_path=tmp_path)
+    await service.save("recorded", "Buy something", history())
+    script = await service.load("recorded")
+
+    agent = ReplayingAgent()
+    agent.missing_xpaths = {"/html/body/button"}
+    with pytest.raises(ReplayDivergedError, match="could not find <button>"):
+        await service.replay(agent, script)
+
+    agent = ReplayingAgent()
+    agent.browser_session.page.url = "https://shop.test/login"
+    with pytest.raises(ReplayDivergedError, match="expected about:blank"):
+        await service.replay(agent, script)
+    assert agent.acted == []
+
+
+async def run_task(async_client, request):
+    response = await async_client.post("/api/v1/run-task", json=request)
+    task_id = response.json()["id"]
+    for _ in range(100):
+        data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+        if data["status"] not in (TaskStatusEnum.CREATED, TaskStatusEnum.RUNNING):
+            break
+        await asyncio.sleep(0.01)
+    return data
+
+
+@pytest.mark.asyncio
+async def test_replay_rejects_path_traversal(async_client, sample_task_request, scripts, tmp_path):
+    """Test that a replay_task_id cannot name a file outside the scripts directory."""
+    scripts.scripts_path = tmp_path / "scripts"
+    (tmp_path / "secret.json").write_text('{"steps": []}')
+
+    for task_id in ("../secret", "..", "a/b", "secret.json"):
+        response = await async_client.post("/api/v1/run-task", json={**sample_task_request, "replay_task_id": task_id})
+        assert response.status_code == 400
+        assert response.json()["detail"] == f"Invalid replay_task_id: {task_id}"
+        assert await scripts.load(task_id) is None
+    assert (await async_client.get("/api/v1/task/..%2Fsecret/script")).status_code == 404
+    with pytest.raises(ValueError):
+        scripts.path("../secret")
+
+
+@pytest.mark.asyncio
+async def test_task_replays_script(async_client, sample_task_request, scripts, monkeypatch):
+    """Test that a task replays a script and the agent only takes over when it diverges."""
+    monkeypatch.setattr("app.services.browser_service.Agent", ReplayingAgent)
+    response = await async_client.post("/api/v1/run-task", json={**sample_task_request, "replay_task_id": "unknown"})
+    assert response.status_code == 400
+
+    await scripts.save("recorded", sample_task_request["task"], history())
+    assert (await async_client.get("/api/v1/task/recorded/script")).json()["task_id"] == "recorded"
+    replayed = metrics.task_replays.value(outcome="replayed")
+
+    data = await run_task(async_client, {**sample_task_request, "replay_task_id": "recorded"})
+    assert data["status"] == TaskStatusEnum.FINISHED
+    assert data["output"] == "bought"
+    assert [step["next_goal"] for step in data["steps"]] == ["Open the shop", "Buy", "Finish"]
+    assert not ReplayingAgent.instances[-1].ran
+    assert metrics.task_replays.value(outcome="replayed") == replayed + 1
+
+    ReplayingAgent.missing_xpaths = {"/html/body/button"}
+    data = await run_task(async_client, {**sample_task_request, "replay_task_id": "recorded"})
+    assert data["status"] == TaskStatusEnum.FINISHED
+    assert data["output"] == "done"
+    assert ReplayingAgent.instances[-1].ran
+
+
+@pytest.mark.asyncio
+async def test_reaper_deletes_scripts_with_task_summaries(scripts):
+    """Test that a task's script is deleted once its summary expires."""
+    manager = TaskManager(retention_seconds=0, retention_max_count=0, summary_retention_seconds=60)
+    task_id = await manager.create_task("Buy something")
+    await manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
+    await scripts.save(task_id, "Buy something", history())
+    finished_at = (await manager.get_task(task_id)).finished_at
+
+    await manager.reap_finished_tasks(now=finished_at)
+    assert scripts.exists(task_id)
+    await manager.reap_finished_tasks(now=finished_at + timedelta(seconds=120))
+    assert await manager.get_task(task_id) is None
+    assert not scripts.exists(task_id)
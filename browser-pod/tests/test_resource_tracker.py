@@ -0,0 +1,50 @@
+import pytest
+import asyncio
+
+from app.services.resource_tracker import ResourceTracker
+
+
+@pytest.mark.asyncio
+async def test_close_task_closes_everything():
+    """Test that every resource of a task is closed once."""
+    tracker = ResourceTracker(timeout=1)
+    closed = []
+    for name in ["context", "page-1", "page-2"]:
+        async def close(name=name):
+            closed.append(name)
+        tracker.track("task-1", name, close)
+    
+    assert await tracker.close_task("task-1") == 0
+    assert sorted(closed) == ["context", "page-1", "page-2"]
+    assert tracker.stats()["open_resources"] == 0
+    assert tracker.stats()["closed_resources"] == 3
+    assert await tracker.close_task("task-1") == 0
+
+
+@pytest.mark.asyncio
+async def test_close_task_is_bounded():
+    """Test that hanging or failing resources are counted as leaked within the deadline."""
+    tracker = ResourceTracker(timeout=0.05)
+    closed = []
+    
+    async def hang():
+        await asyncio.sleep(10)
+    
+    async def fail():
+        raise RuntimeError("browser crashed")
+    
+    async def close():
+        closed.append("context")
+    
+    tracker.track("task-1", "context", close)
+    tracker.track("task-1", "broken page", fail)
+    tracker.track("task-1", "hung page", hang)
+    
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await tracker.close_task("task-1") == 2
+    assert loop.time() - start < 1
+    assert closed == ["context"]
+    stats = tracker.stats()
+    assert stats["close_timeouts"] == 1
+    assert stats["close_failures"] == 1
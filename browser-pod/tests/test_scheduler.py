@@ -0,0 +1,173 @@
+import pytest
+import asyncio
+
+from app.models.requests import RunTaskRequest
+from app.services.scheduler import TaskScheduler, QueueFullError, task_scheduler
+
+
+def make_runner(started, release):
+    """Create a fake task runner that blocks until released."""
+    async def runner(task_id, request):
+        started.append(task_id)
+        await release.wait()
+    return runner
+
+
+@pytest.mark.asyncio
+async def test_scheduler_bounds_concurrency():
+    """Test that no more than max_workers tasks run at once."""
+    started, release = [], asyncio.Event()
+    scheduler = TaskScheduler(make_runner(started, release), max_workers=2, max_queue_size=10)
+
+    positions = [scheduler.submit(f"task-{i}", RunTaskRequest(task="t")) for i in range(5)]
+    await asyncio.sleep(0)
+
+    assert positions == [0, 0, 1, 2, 3]
+    assert started == ["task-0", "task-1"]
+    assert scheduler.running_count == 2
+    assert scheduler.queued_count == 3
+
+    release.set()
+    while scheduler.running_count or scheduler.queued_count:
+        await asyncio.sleep(0)
+
+    assert started == [f"task-{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_priority_order():
+    """Test that higher priority tasks are dispatched first, FIFO within a level."""
+    started, release = [], asyncio.Event()
+    scheduler = TaskScheduler(make_runner(started, release), max_workers=1, max_queue_size=10)
+
+    scheduler.submit("blocker", RunTaskRequest(task="t"))
+    scheduler.submit("low-1", RunTaskRequest(task="t"))
+    scheduler.submit("low-2", RunTaskRequest(task="t"))
+    scheduler.submit("high", RunTaskRequest(task="t", priority=5))
+
+    assert scheduler.queue_position("high") == 1
+    assert scheduler.queue_position("low-1") == 2
+    assert scheduler.queue_position("low-2") == 3
+
+    release.set()
+    while scheduler.running_count or scheduler.queued_count:
+        await asyncio.sleep(0)
+
+    assert started == ["blocker", "high", "low-1", "low-2"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_priority_does_not_starve():
+    """Test that a priority level only jumps ahead of a bounded number of tasks."""
+    started, release = [], asyncio.Event()
+    scheduler = TaskScheduler(make_runner(started, release), max_workers=1, max_queue_size=10, priority_stride=2)
+
+    scheduler.submit("blocker", RunTaskRequest(task="t"))
+    for i in range(4):
+        scheduler.submit(f"low-{i}", RunTaskRequest(task="t"))
+    scheduler.submit("high", RunTaskRequest(task="t", priority=1))
+
+    assert scheduler.queue_position("high") == 3
+    release.set()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_queue_full():
+    """Test backpressure once the queue depth is reached."""
+    started, release = [], asyncio.Event()
+    scheduler = TaskScheduler(make_runner(started, release), max_workers=1, max_queue_size=1)
+
+    scheduler.ensure_capacity()
+    scheduler.submit("task-0", RunTaskRequest(task="t"))
+    scheduler.ensure_capacity()
+    scheduler.submit("task-1", RunTaskRequest(task="t"))
+
+    with pytest.raises(QueueFullError):
+        scheduler.ensure_capacity()
+    release.set()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_discard():
+    """Test that discarded tasks are never dispatched."""
+    started, release = [], asyncio.Event()
+    scheduler = TaskScheduler(make_runner(started, release), max_workers=1, max_queue_size=10)
+
+    scheduler.submit("task-0", RunTaskRequest(task="t"))
+    scheduler.submit("task-1", RunTaskRequest(task="t"))
+    scheduler.submit("task-2", RunTaskRequest(task="t"))
+
+    assert scheduler.discard("task-1")
+    assert not scheduler.discard("task-1")
+    assert scheduler.queue_position("task-2") == 1
+
+    release.set()
+    while scheduler.running_count or scheduler.queued_count:
+        await asyncio.sleep(0)
+
+    assert started == ["task-0", "task-2"]
+
+
+def test_run_task_queue_full(client, sample_task_request, monkeypatch):
+    """Test that run-task returns 429 with Retry-After when the queue is full."""
+    monkeypatch.setattr(task_scheduler, "max_workers", 0)
+    monkeypatch.setattr(task_scheduler, "max_queue_size", 0)
+
+    response = client.post("/api/v1/run-task", json=sample_task_request)
+    assert response.status_code == 429
+    assert response.json()["detail"] == "Task queue is full"
+    assert "Retry-After" in response.headers
+
+    response = client.get("/api/v1/tasks")
+    assert response.json()["total_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_parked_task_frees_slot():
+    """Test that parking a paused task lets a queued task start."""
+    started, release = [], asyncio.Event()
+    scheduler = TaskScheduler(make_runner(started, release), max_workers=1, max_queue_size=10)
+
+    scheduler.submit("paused", RunTaskRequest(task="t"))
+    scheduler.submit("queued", RunTaskRequest(task="t"))
+    await asyncio.sleep(0)
+    assert started == ["paused"]
+
+    scheduler.park("paused")
+    await asyncio.sleep(0)
+    assert started == ["paused", "queued"]
+    assert scheduler.running_count == 1
+
+    scheduler.unpark("paused")
+    assert scheduler.running_count == 2
+
+    release.set()
+    while scheduler.running_count or scheduler.queued_count:
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_positions_follow_the_queue():
+    """Test that queue positions stay exact as a large batch is queued, discarded from and dispatched."""
+    started, release = [], asyncio.Event()
+    scheduler = TaskScheduler(make_runner(started, release), max_workers=1, max_queue_size=10, priority_stride=100)
+
+    scheduler.submit_many([(f"task-{i}", RunTaskRequest(task="t")) for i in range(1000)])
+    scheduler.submit("urgent", RunTaskRequest(task="t", priority=9))
+    await asyncio.sleep(0)
+
+    assert started == ["task-0"]
+    assert scheduler.queue_position("task-0") == 0
+    # Priority 9 jumps 900 slots ahead
+    assert scheduler.queue_position("urgent") == 100
+    assert scheduler.queue_position("task-500") == 501
+    scheduler.discard("task-1")
+    assert scheduler.queue_position("urgent") == 99
+    assert scheduler.queue_position("task-500") == 500
+    assert scheduler.queue_position("task-999") == 999
+
+    release.set()
+    while scheduler.running_count or scheduler.queued_count:
+        await asyncio.sleep(0)
+    assert started.index("urgent") == 99
+    assert len(started) == 1000
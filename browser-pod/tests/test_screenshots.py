@@ -0,0 +1,40 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.screenshot_service import ScreenshotService, screenshot_url, thumbnail_url
+
+
+def encode(image_format: str) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (1280, 800), "red").save(buffer, format=image_format)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.mark.asyncio
+async def test_save_writes_decoded_screenshots(tmp_path):
+    """Test that screenshots are decoded to files and only paths are returned."""
+    service = ScreenshotService(screenshots_path=tmp_path, thumbnail_width=160)
+    png, jpeg = encode("PNG"), encode("JPEG")
+
+    paths = await service.save("task-1", [png, jpeg], 3)
+
+    assert paths == ["task-1/0003.png", "task-1/0004.jpg"]
+    assert service.path(paths[0]).read_bytes() == base64.b64decode(png)
+    with Image.open(tmp_path / "task-1" / "0004.thumb.webp") as thumbnail:
+        assert thumbnail.size == (160, 100)
+    assert screenshot_url(paths[0]) == "/api/v1/screenshots/task-1/0003.png"
+    assert thumbnail_url(paths[0]) == "/api/v1/screenshots/task-1/0003.thumb.webp"
+
+
+@pytest.mark.asyncio
+async def test_save_skips_invalid_screenshots(tmp_path):
+    """Test that undecodable screenshots are dropped and unreadable images get no thumbnail."""
+    service = ScreenshotService(screenshots_path=tmp_path, thumbnail_width=160)
+
+    paths = await service.save("task-1", ["not base64!", base64.b64encode(b"raw").decode()], 0)
+
+    assert paths == ["task-1/0001.png"]
+    assert not (tmp_path / "task-1" / "0001.thumb.webp").exists()
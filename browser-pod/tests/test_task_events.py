@@ -0,0 +1,150 @@
+import pytest
+import asyncio
+import json
+
+from app.models.enums import TaskStatusEnum
+from app.utils.task_manager import TaskManager, task_manager
+
+
+def parse_events(body):
+    """Parse a Server-Sent Events body into (id, event, data) tuples."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.split("\n") if not line.startswith(":"))
+        if fields:
+            event_id = int(fields["id"]) if "id" in fields else None
+            events.append((event_id, fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def collect(stream, count):
+    """Read a number of frames from an event stream."""
+    frames = []
+    async for frame in stream:
+        frames.append(frame)
+        if len(frames) == count:
+            break
+    return frames
+
+
+def test_task_events_not_found(client):
+    """Test streaming events of a non-existent task."""
+    response = client.get("/api/v1/task/non-existent-id/events")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_task_events_finished_task(async_client):
+    """Test that a finished task streams a snapshot and ends."""
+    task_id = await task_manager.create_task("Test task")
+    await task_manager.add_task_step(task_id, {"next_goal": "go"})
+    await task_manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
+    
+    response = await async_client.get(f"/api/v1/task/{task_id}/events")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = parse_events(response.text)
+    assert [event for _, event, _ in events] == ["snapshot", "end"]
+    assert events[0][2]["status"] == TaskStatusEnum.FINISHED
+    assert events[0][2]["steps"][0]["next_goal"] == "go"
+
+
+@pytest.mark.asyncio
+async def test_task_events_stream_deltas(async_client):
+    """Test that a running task streams steps, screenshots and status changes."""
+    task_id = await task_manager.create_task("Test task")
+    await task_manager.start_task(task_id)
+    
+    request = asyncio.create_task(async_client.get(f"/api/v1/task/{task_id}/events"))
+    while not task_manager.events.stats()["subscribers"]:
+        await asyncio.sleep(0.01)
+    
+    await task_manager.add_task_steps(task_id, [{"next_goal": "go", "url": "https://example.com"}], ["shot"])
+    await task_manager.set_task_output(task_id, "done")
+    await task_manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
+    
+    events = parse_events((await request).text)
+    assert [event for _, event, _ in events] == ["snapshot", "step", "screenshot", "output", "status", "end"]
+    assert events[0][2]["status"] == TaskStatusEnum.RUNNING
+    assert events[1][2]["step"] == 1
+    assert events[1][2]["url"] == "https://example.com"
+    assert events[2][2] == {"index": 0, "url": "/api/v1/screenshots/shot"}
+    assert events[4][2]["status"] == TaskStatusEnum.FINISHED
+    assert events[4][2]["output"] == "done"
+    
+    ids = [event_id for event_id, _, _ in events[:-1]]
+    assert ids == sorted(ids)
+    assert task_manager.events.stats() == {"channels": 0, "subscribers": 0}
+
+
+@pytest.mark.asyncio
+async def test_task_events_resume_from_last_event_id():
+    """Test that reconnecting with Last-Event-ID only replays missed events."""
+    manager = TaskManager()
+    task_id = await manager.create_task("Test task")
+    
+    async def snapshot():
+        return manager.to_task_response(await manager.get_task(task_id)).model_dump(mode="json")
+    
+    first = manager.events.stream(task_id, snapshot)
+    await collect(first, 1)
+    await manager.add_task_step(task_id, {"next_goal": "a"})
+    frames = await collect(first, 1)
+    await first.aclose()
+    last_event_id = parse_events(frames[0].decode())[0][0]
+    
+    await manager.add_task_step(task_id, {"next_goal": "b"})
+    await manager.add_task_step(task_id, {"next_goal": "c"})
+    
+    resumed = manager.events.stream(task_id, snapshot, last_event_id)
+    events = parse_events(b"".join(await collect(resumed, 2)).decode())
+    await resumed.aclose()
+    assert [(event, data["next_goal"]) for _, event, data in events] == [("step", "b"), ("step", "c")]
+
+
+@pytest.mark.asyncio
+async def test_task_events_fan_out_shares_frames():
+    """Test that viewers of one task receive the same encoded frames."""
+    manager = TaskManager()
+    task_id = await manager.create_task("Test task")
+    
+    async def snapshot():
+        return manager.to_task_response(await manager.get_task(task_id)).model_dump(mode="json")
+    
+    viewers = [manager.events.stream(task_id, snapshot) for _ in range(3)]
+    for viewer in viewers:
+        await collect(viewer, 1)
+    assert manager.events.stats() == {"channels": 1, "subscribers": 3}
+    
+    pending = [asyncio.create_task(collect(viewer, 1)) for viewer in viewers]
+    await asyncio.sleep(0)
+    await manager.add_task_step(task_id, {"next_goal": "go"})
+    frames = [frame for frames in await asyncio.gather(*pending) for frame in frames]
+    
+    assert frames[0] is frames[1] is frames[2]
+    for viewer in viewers:
+        await viewer.aclose()
+
+
+@pytest.mark.asyncio
+async def test_task_events_resume_beyond_history_sends_snapshot():
+    """Test that resuming from an event no longer kept falls back to a snapshot."""
+    manager = TaskManager()
+    manager.events.history = 2
+    task_id = await manager.create_task("Test task")
+    
+    async def snapshot():
+        return manager.to_task_response(await manager.get_task(task_id)).model_dump(mode="json")
+    
+    viewer = manager.events.stream(task_id, snapshot)
+    first_id = parse_events((await collect(viewer, 1))[0].decode())[0][0]
+    for goal in "abc":
+        await manager.add_task_step(task_id, {"next_goal": goal})
+    await viewer.aclose()
+    
+    resumed = manager.events.stream(task_id, snapshot, first_id)
+    events = parse_events((await collect(resumed, 1))[0].decode())
+    await resumed.aclose()
+    assert events[0][1] == "snapshot"
+    assert len(events[0][2]["steps"]) == 3
@@ -0,0 +1,256 @@
+import pytest
+import asyncio
+from datetime import timedelta
+
+from app.models.enums import TaskStatusEnum
+from app.utils.task_data import StepLog, TaskStep
+from app.utils.task_manager import TaskManager
+
+
+@pytest.mark.asyncio
+async def test_task_snapshots_are_immutable():
+    """Test that updates publish new snapshots instead of mutating old ones."""
+    manager = TaskManager()
+    task_id = await manager.create_task("Test task")
+    
+    before = await manager.get_task(task_id)
+    await manager.add_task_step(task_id, {"next_goal": "step"})
+    await manager.update_task_status(task_id, TaskStatusEnum.RUNNING)
+    after = await manager.get_task(task_id)
+    
+    assert before.steps == []
+    assert before.status == TaskStatusEnum.CREATED
+    assert after.steps == [TaskStep(next_goal="step")]
+    assert after.status == TaskStatusEnum.RUNNING
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_take_locks():
+    """Test that reads never touch the task locks."""
+    manager = TaskManager()
+    task_id = await manager.create_task("Test task")
+    acquisitions = manager.lock_acquisitions
+    
+    async with manager._lock_for(task_id):
+        task_data = await asyncio.wait_for(manager.get_task(task_id), timeout=1)
+        await asyncio.wait_for(manager.list_tasks(), timeout=1)
+    
+    assert task_data.id == task_id
+    assert manager.lock_acquisitions == acquisitions
+
+
+@pytest.mark.asyncio
+async def test_lock_shards_are_independent():
+    """Test that writers to tasks on different lock shards do not contend."""
+    manager = TaskManager()
+    first = await manager.create_task("First task")
+    second = await manager.create_task("Second task")
+    while manager._lock_for(second) is manager._lock_for(first):
+        second = await manager.create_task("Second task")
+    
+    async with manager._lock_for(first):
+        await asyncio.wait_for(manager.add_task_step(second, {"next_goal": "step"}), timeout=1)
+    
+    assert manager.lock_contentions == 0
+    assert len((await manager.get_task(second)).steps) == 1
+
+
+@pytest.mark.asyncio
+async def test_lock_contention_is_counted():
+    """Test that waiting on a task lock is recorded."""
+    manager = TaskManager()
+    task_id = await manager.create_task("Test task")
+    
+    async with manager._lock_for(task_id):
+        pending = asyncio.create_task(manager.add_task_step(task_id, {"next_goal": "step"}))
+        await asyncio.sleep(0)
+    await pending
+    
+    stats = manager.stats()
+    assert stats["lock_contentions"] == 1
+    assert stats["lock_wait_seconds"] > 0
+    assert len((await manager.get_task(task_id)).steps) == 1
+
+
+def test_task_manager_stats_endpoint(client):
+    """Test the task manager statistics endpoint."""
+    response = client.get("/api/v1/task-manager")
+    assert response.status_code == 200
+    assert "lock_contentions" in response.json()
+
+
+@pytest.mark.asyncio
+async def test_list_tasks_newest_first():
+    """Test that listing pages through tasks newest first."""
+    manager = TaskManager()
+    task_ids = [await manager.create_task(f"Task {i}") for i in range(5)]
+    
+    tasks, total_count = await manager.list_tasks(page=1, limit=2)
+    assert [t.id for t in tasks] == [task_ids[4], task_ids[3]]
+    assert total_count == 5
+    
+    tasks, _ = await manager.list_tasks(page=3, limit=2)
+    assert [t.id for t in tasks] == [task_ids[0]]
+    
+    tasks, _ = await manager.list_tasks(page=4, limit=2)
+    assert tasks == []
+
+
+@pytest.mark.asyncio
+async def test_list_tasks_by_status():
+    """Test that the status index follows status changes."""
+    manager = TaskManager()
+    task_ids = [await manager.create_task(f"Task {i}") for i in range(4)]
+    await manager.start_task(task_ids[1])
+    await manager.start_task(task_ids[3])
+    await manager.update_task_status(task_ids[3], TaskStatusEnum.FINISHED)
+    
+    tasks, total_count = await manager.list_tasks(status=TaskStatusEnum.CREATED)
+    assert [t.id for t in tasks] == [task_ids[2], task_ids[0]]
+    assert total_count == 2
+    
+    tasks, total_count = await manager.list_tasks(status=TaskStatusEnum.RUNNING)
+    assert [t.id for t in tasks] == [task_ids[1]]
+    
+    tasks, total_count = await manager.list_tasks(status=TaskStatusEnum.PAUSED)
+    assert tasks == []
+    assert total_count == 0
+
+
+@pytest.mark.asyncio
+async def test_list_tasks_cursor():
+    """Test cursor based pagination with and without a status filter."""
+    manager = TaskManager()
+    task_ids = [await manager.create_task(f"Task {i}") for i in range(5)]
+    await manager.stop_task(task_ids[2])
+    
+    tasks, _ = await manager.list_tasks(limit=2, after=task_ids[3])
+    assert [t.id for t in tasks] == [task_ids[2], task_ids[1]]
+    
+    tasks, _ = await manager.list_tasks(limit=2, after=task_ids[3], status=TaskStatusEnum.CREATED)
+    assert [t.id for t in tasks] == [task_ids[1], task_ids[0]]
+    
+    tasks, _ = await manager.list_tasks(limit=2, after=task_ids[0])
+    assert tasks == []
+
+
+def test_list_tasks_endpoint_filters(client, sample_task_request):
+    """Test the status filter and cursor query parameters."""
+    for _ in range(3):
+        client.post("/api/v1/run-task", json=sample_task_request)
+    
+    response = client.get("/api/v1/tasks?limit=2")
+    data = response.json()
+    assert len(data["tasks"]) == 2
+    assert data["next_cursor"] == data["tasks"][-1]["id"]
+    
+    response = client.get(f"/api/v1/tasks?limit=2&after={data['next_cursor']}")
+    data = response.json()
+    assert len(data["tasks"]) == 1
+    assert data["next_cursor"] is None
+    
+    response = client.get("/api/v1/tasks?status=paused")
+    assert response.json()["total_count"] == 0
+    
+    response = client.get("/api/v1/tasks?after=unknown-id")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_agent_instance_dropped_on_finish():
+    """Test that a finished task no longer references its agent."""
+    manager = TaskManager()
+    task_id = await manager.create_task("Test task")
+    await manager.start_task(task_id)
+    await manager.set_agent_instance(task_id, object())
+    
+    assert (await manager.get_task(task_id)).agent_instance is not None
+    await manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
+    assert (await manager.get_task(task_id)).agent_instance is None
+
+
+async def create_finished_task(manager, description):
+    """Create a task with a step and run it to completion."""
+    task_id = await manager.create_task(description)
+    await manager.start_task(task_id)
+    await manager.add_task_step(task_id, {"next_goal": "step"})
+    await manager.add_screenshot(task_id, "shot.png")
+    await manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
+    await manager.set_task_output(task_id, "done")
+    return task_id
+
+
+@pytest.mark.asyncio
+async def test_reaper_evicts_beyond_max_count():
+    """Test that only the newest finished tasks are kept in full."""
+    manager = TaskManager(retention_seconds=3600, retention_max_count=1)
+    task_ids = [await create_finished_task(manager, f"Task {i}") for i in range(3)]
+    running_id = await manager.create_task("Running")
+    await manager.start_task(running_id)
+    
+    assert await manager.reap_finished_tasks() == 2
+    
+    for task_id in task_ids[:2]:
+        summary = await manager.get_task(task_id)
+        assert summary.status == TaskStatusEnum.FINISHED
+        assert summary.output == "done"
+        assert summary.steps == []
+        assert summary.screenshots == ()
+    assert len((await manager.get_task(task_ids[2])).steps) == 1
+    assert (await manager.get_task(running_id)).status == TaskStatusEnum.RUNNING
+    assert manager.stats()["evicted_tasks"] == 2
+    
+    # Already evicted tasks are not evicted again
+    assert await manager.reap_finished_tasks() == 0
+
+
+@pytest.mark.asyncio
+async def test_reaper_evicts_and_deletes_by_age():
+    """Test that old finished tasks are compacted, then deleted."""
+    manager = TaskManager(retention_seconds=60, retention_max_count=100, summary_retention_seconds=3600)
+    task_id = await create_finished_task(manager, "Old task")
+    finished_at = (await manager.get_task(task_id)).finished_at
+    
+    assert await manager.reap_finished_tasks(now=finished_at) == 0
+    assert await manager.reap_finished_tasks(now=finished_at + timedelta(seconds=120)) == 1
+    assert (await manager.get_task(task_id)).steps == []
+    
+    assert await manager.reap_finished_tasks(now=finished_at + timedelta(hours=2)) == 1
+    assert await manager.get_task(task_id) is None
+    _, total_count = await manager.list_tasks()
+    assert total_count == 0
+    
+    stats = manager.stats()
+    assert stats["evicted_tasks"] == 1
+    assert stats["deleted_tasks"] == 1
+
+
+def test_step_log_snapshots_share_columns():
+    """Test that appending keeps older step logs unchanged."""
+    empty = StepLog()
+    first = empty.append(TaskStep(next_goal="a", url="https://example.com"))
+    second = first.append(TaskStep(next_goal="b", url="https://example.com"))
+    
+    # Appending to an older log forks instead of overwriting newer steps
+    branch = first.append(TaskStep(next_goal="c"))
+    
+    assert empty == []
+    assert list(first) == [TaskStep(next_goal="a", url="https://example.com")]
+    assert [step.next_goal for step in second] == ["a", "b"]
+    assert [step.next_goal for step in branch] == ["a", "c"]
+    assert second[-1].url is second[0].url
+
+
+@pytest.mark.asyncio
+async def test_add_task_steps_single_update():
+    """Test that a batch of steps and screenshots is applied under one lock acquisition."""
+    manager = TaskManager()
+    task_id = await manager.create_task("Test task")
+    acquisitions = manager.stats()["lock_acquisitions"]
+    
+    await manager.add_task_steps(task_id, [{"next_goal": "a"}, {"next_goal": "b"}], ["shot-a", "shot-b"])
+    
+    task_data = await manager.get_task(task_id)
+    assert [step.next_goal for step in task_data.steps] == ["a", "b"]
+    assert task_data.screenshots == ("shot-a", "shot-b")
+    assert manager.stats()["lock_acquisitions"] == acquisitions + 1
@@ -0,0 +1,236 @@
+import pytest
+from dataclasses import replace
+from datetime import datetime
+
+from app.models.enums import TaskStatusEnum
+from app.utils.task_data import StepLog, TaskData, TaskStep
+from app.utils.task_manager import TaskManager
+from app.utils.task_store import InMemoryTaskStore, SQLiteTaskStore
+
+
+def make_task(task_id, **kwargs):
+    """Create a task snapshot for store tests."""
+    return TaskData(
+        id=task_id,
+        task=f"Task {task_id}",
+        status=TaskStatusEnum.CREATED,
+        created_at=datetime.utcnow(),
+        **kwargs
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+async def store(request, tmp_path):
+    """Create each task store backend."""
+    if request.param == "memory":
+        store = InMemoryTaskStore()
+    else:
+        store = SQLiteTaskStore(tmp_path / "tasks.db", cache_size=2, batch_size=10, flush_interval=60)
+    yield store
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_store_add_save_get(store):
+    """Test storing and updating a task."""
+    task = make_task("a", idempotency_key="key-a")
+    await store.add(task)
+    
+    running = replace(task, status=TaskStatusEnum.RUNNING, steps=StepLog([TaskStep(next_goal="go")]))
+    await store.save(task, running)
+    finished = replace(running, status=TaskStatusEnum.FINISHED, output="done", screenshots=("shot.png",))
+    await store.save(running, finished)
+    
+    loaded = await store.get("a")
+    assert loaded.status == TaskStatusEnum.FINISHED
+    assert loaded.output == "done"
+    assert loaded.steps == [TaskStep(next_goal="go")]
+    assert loaded.screenshots == ("shot.png",)
+    assert await store.get("missing") is None
+    assert await store.find_by_idempotency_key("key-a") == "a"
+    assert await store.find_by_idempotency_key("key-b") is None
+
+
+@pytest.mark.asyncio
+async def test_store_list_and_count(store):
+    """Test listing newest first with status filter and cursor."""
+    tasks = [make_task(str(i)) for i in range(5)]
+    for task in tasks:
+        await store.add(task)
+    await store.save(tasks[1], replace(tasks[1], status=TaskStatusEnum.FINISHED))
+    
+    assert [t.id for t in await store.list(limit=2)] == ["4", "3"]
+    assert [t.id for t in await store.list(limit=2, offset=4)] == ["0"]
+    assert [t.id for t in await store.list(limit=10, status=TaskStatusEnum.FINISHED)] == ["1"]
+    assert [t.id for t in await store.list(limit=2, before="3")] == ["2", "1"]
+    assert [t.id for t in await store.list(limit=2, before="3", status=TaskStatusEnum.CREATED)] == ["2", "0"]
+    assert await store.count() == 5
+    assert await store.count(TaskStatusEnum.CREATED) == 4
+    assert await store.count(TaskStatusEnum.FINISHED) == 1
+
+
+@pytest.mark.asyncio
+async def test_store_delete(store):
+    """Test deleting a task."""
+    task = make_task("a", idempotency_key="key-a")
+    await store.add(task)
+    await store.delete("a")
+    
+    assert await store.get("a") is None
+    assert await store.count() == 0
+    assert await store.find_by_idempotency_key("key-a") is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_persists_across_restarts(tmp_path):
+    """Test that finished tasks survive a restart and unfinished ones are failed."""
+    store = SQLiteTaskStore(tmp_path / "tasks.db")
+    finished = make_task("finished")
+    running = make_task("running")
+    await store.add(finished)
+    await store.add(running)
+    await store.save(finished, replace(finished, status=TaskStatusEnum.FINISHED, steps=StepLog([TaskStep(url="a")]), output="ok"))
+    await store.save(running, replace(running, status=TaskStatusEnum.RUNNING))
+    await store.close()
+    
+    store = SQLiteTaskStore(tmp_path / "tasks.db")
+    loaded = await store.get("finished")
+    assert loaded.status == TaskStatusEnum.FINISHED
+    assert loaded.steps == [TaskStep(url="a")]
+    assert loaded.output == "ok"
+    
+    interrupted = await store.get("running")
+    assert interrupted.status == TaskStatusEnum.FAILED
+    assert interrupted.output == "Interrupted by pod restart"
+    assert await store.count(TaskStatusEnum.FAILED) == 1
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_batches_step_writes(tmp_path):
+    """Test that steps of running tasks are buffered and written in batches."""
+    store = SQLiteTaskStore(tmp_path / "tasks.db", batch_size=5, flush_interval=60)
+    task = make_task("a")
+    await store.add(task)
+    
+    for i in range(3):
+        updated = replace(task, steps=task.steps.append(TaskStep(next_goal=f"step {i}")))
+        await store.save(task, updated)
+        task = updated
+    
+    assert len(store._pending_steps) == 3
+    
+    updated = replace(task, steps=task.steps.append(TaskStep(next_goal="step 3")))
+    await store.save(task, updated)
+    assert store._pending_steps == []
+    
+    rows = store._conn.execute("SELECT COUNT(*) FROM task_steps").fetchone()
+    assert rows[0] == 4
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_evicts_finished_tasks(tmp_path):
+    """Test that only cache_size finished tasks stay in memory."""
+    store = SQLiteTaskStore(tmp_path / "tasks.db", cache_size=2)
+    for i in range(5):
+        task = make_task(str(i))
+        await store.add(task)
+        await store.save(task, replace(task, status=TaskStatusEnum.FINISHED, steps=StepLog([TaskStep(next_goal=f"step {i}")])))
+    
+    assert store.resident_count() == 2
+    loaded = await store.get("0")
+    assert loaded.steps == [TaskStep(next_goal="step 0")]
+    assert store.resident_count() == 2
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_task_manager_with_sqlite_store(tmp_path):
+    """Test the task lifecycle on top of the SQLite store."""
+    manager = TaskManager(SQLiteTaskStore(tmp_path / "tasks.db", cache_size=0))
+    task_id = await manager.create_task("Persisted task", idempotency_key="key")
+    assert await manager.create_task("Persisted task", idempotency_key="key") == task_id
+    
+    await manager.start_task(task_id)
+    await manager.add_task_step(task_id, {"next_goal": "go"})
+    await manager.update_task_status(task_id, TaskStatusEnum.FAILED)
+    await manager.set_task_output(task_id, "Error: boom")
+    
+    task_data = await manager.get_task(task_id)
+    assert task_data.status == TaskStatusEnum.FAILED
+    assert task_data.output == "Error: boom"
+    assert task_data.steps == [TaskStep(next_goal="go")]
+    
+    tasks, total_count = await manager.list_tasks(status=TaskStatusEnum.FAILED)
+    assert [t.id for t in tasks] == [task_id]
+    assert total_count == 1
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_reaper_keeps_tasks_on_disk(tmp_path):
+    """Test that reaping a SQLite store only drops finished tasks from memory."""
+    manager = TaskManager(
+        SQLiteTaskStore(tmp_path / "tasks.db"),
+        retention_seconds=3600,
+        retention_max_count=0
+    )
+    task_id = await manager.create_task("Archived task")
+    await manager.start_task(task_id)
+    await manager.add_task_step(task_id, {"next_goal": "go"})
+    await manager.update_task_status(task_id, TaskStatusEnum.FINISHED)
+    
+    assert manager.stats()["tasks"] == 1
+    assert await manager.reap_finished_tasks() == 1
+    assert manager.stats()["tasks"] == 0
+    
+    task_data = await manager.get_task(task_id)
+    assert task_data.steps == [TaskStep(next_goal="go")]
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_bulk_insert(tmp_path):
+    """Test that tasks added together are written in one flush and keep their batch ID."""
+    store = SQLiteTaskStore(tmp_path / "tasks.db", batch_size=10, flush_interval=60)
+    await store.add_many([make_task(f"task-{i}", batch_id="batch") for i in range(25)])
+    
+    assert store._pending_tasks == {}
+    assert store._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 25
+    await store.close()
+    
+    store = SQLiteTaskStore(tmp_path / "tasks.db")
+    assert (await store.get("task-7")).batch_id == "batch"
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_reads_without_flushing(tmp_path):
+    """Test that listing and idempotency lookups merge unwritten tasks instead of flushing them."""
+    store = SQLiteTaskStore(tmp_path / "tasks.db", batch_size=100, flush_interval=60)
+    tasks = [make_task(str(i), idempotency_key=f"key-{i}") for i in range(6)]
+    await store.add_many(tasks[:3])
+    await store.save(tasks[0], replace(tasks[0], status=TaskStatusEnum.FINISHED))
+    await store.save(tasks[1], replace(tasks[1], status=TaskStatusEnum.RUNNING))
+    for task in tasks[3:]:
+        await store.add(task)
+    writes = []
+    write_batch = store._write_batch
+    store._write_batch = lambda *rows: writes.append(rows) or write_batch(*rows)
+
+    assert [t.id for t in await store.list(limit=4)] == ["5", "4", "3", "2"]
+    assert [t.id for t in await store.list(limit=2, offset=2)] == ["3", "2"]
+    assert [t.id for t in await store.list(limit=3, offset=3)] == ["2", "1", "0"]
+    assert [t.id for t in await store.list(limit=2, before="4")] == ["3", "2"]
+    assert [t.id for t in await store.list(limit=2, before="2")] == ["1", "0"]
+    assert [t.id for t in await store.list(limit=5, status=TaskStatusEnum.CREATED)] == ["5", "4", "3", "2"]
+    assert [t.id for t in await store.list(limit=5, status=TaskStatusEnum.RUNNING)] == ["1"]
+    assert [t.id for t in await store.list(limit=5, before="1", status=TaskStatusEnum.CREATED)] == []
+    assert [t.id for t in await store.list(limit=5, before="4", status=TaskStatusEnum.FINISHED)] == ["0"]
+    assert (await store.list(limit=1, offset=4))[0].status == TaskStatusEnum.RUNNING
+
+    assert await store.find_by_idempotency_keys(["key-0", "key-4", "key-9"]) == {"key-0": "0", "key-4": "4"}
+    assert await store.find_by_idempotency_key("key-1") == "1"
+    assert writes == []
+    await store.close()
@@ -3,6 +3,9 @@ import asyncio
 from unittest.mock import patch, AsyncMock
 
 from app.models.enums import TaskStatusEnum
+from app.config import settings
+from app.services.scheduler import task_scheduler
+from app.services.screenshot_service import screenshot_service
 
 
 def test_ping_endpoint(client):
@@ -177,3 +180,165 @@ def test_get_output_file_not_found(client):
     response = client.get("/api/v1/task/non-existent-id/output-file/test.txt")
     assert response.status_code == 404
     assert response.json()["detail"] == "Task not found"
+
+
+async def wait_for_status(async_client, task_id, statuses):
+    """Poll a task until it reaches one of the given statuses."""
+    for _ in range(100):
+        response = await async_client.get(f"/api/v1/task/{task_id}/status")
+        if response.json() in statuses:
+            return response.json()
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Task {task_id} never reached {statuses}")
+
+
+@pytest.mark.asyncio
+async def test_run_task_launches_single_agent(async_client, sample_task_request, fake_agent):
+    """Test that each run-task request constructs exactly one agent."""
+    response = await async_client.post("/api/v1/run-task", json=sample_task_request)
+    task_id = response.json()["id"]
+    
+    await wait_for_status(async_client, task_id, [TaskStatusEnum.FINISHED])
+    
+    assert len(fake_agent.instances) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_task_idempotency_key(async_client, sample_task_request, fake_agent):
+    """Test that retried requests with the same idempotency key reuse the task."""
+    request = {**sample_task_request, "idempotency_key": "retry-me"}
+    
+    first = await async_client.post("/api/v1/run-task", json=request)
+    second = await async_client.post("/api/v1/run-task", json=request)
+    assert first.json()["id"] == second.json()["id"]
+    
+    await wait_for_status(async_client, first.json()["id"], [TaskStatusEnum.FINISHED])
+    third = await async_client.post("/api/v1/run-task", json=request)
+    assert third.json()["id"] == first.json()["id"]
+    
+    response = await async_client.get("/api/v1/tasks")
+    assert response.json()["total_count"] == 1
+    assert len(fake_agent.instances) == 1
+
+
+@pytest.mark.asyncio
+async def test_create_and_run_task_runs_once(sample_task_request, fake_agent):
+    """Test that concurrent launches of the same task ID run one agent."""
+    from app.models.requests import RunTaskRequest
+    from app.services.browser_service import browser_service
+    from app.utils.task_manager import task_manager
+    
+    request = RunTaskRequest(**sample_task_request)
+    task_id = await task_manager.create_task(request.task)
+    
+    await asyncio.gather(
+        browser_service.create_and_run_task(task_id, request),
+        browser_service.create_and_run_task(task_id, request)
+    )
+    
+    assert len(fake_agent.instances) == 1
+
+
+@pytest.mark.asyncio
+async def test_steps_visible_while_running(async_client, sample_task_request, fake_agent, tmp_path, monkeypatch):
+    """Test that steps and screenshots appear on the task as the agent reports them."""
+    monkeypatch.setattr(screenshot_service, "screenshots_path", tmp_path)
+    fake_agent.steps = [
+        {"next_goal": "Open google", "url": "https://google.com", "screenshot": "c2hvdDE="},
+        {"next_goal": "Search", "url": "https://google.com/search", "screenshot": "c2hvdDI="}
+    ]
+    fake_agent.step_gate = asyncio.Event()
+    
+    response = await async_client.post("/api/v1/run-task", json=sample_task_request)
+    task_id = response.json()["id"]
+    
+    for _ in range(100):
+        data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+        if data["steps"]:
+            break
+        await asyncio.sleep(0.01)
+    assert data["status"] == TaskStatusEnum.RUNNING
+    assert [step["next_goal"] for step in data["steps"]] == ["Open google"]
+    assert data["steps"][0]["url"] == "https://google.com"
+    
+    gate, fake_agent.step_gate = fake_agent.step_gate, None
+    gate.set()
+    await wait_for_status(async_client, task_id, [TaskStatusEnum.FINISHED])
+    
+    data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+    assert [step["next_goal"] for step in data["steps"]] == ["Open google", "Search"]
+    screenshots = (await async_client.get(f"/api/v1/task/{task_id}/screenshots")).json()["screenshots"]
+    assert screenshots == [f"/api/v1/screenshots/{task_id}/0000.png", f"/api/v1/screenshots/{task_id}/0001.png"]
+    
+    response = await async_client.get(screenshots[1])
+    assert response.content == b"shot2"
+    assert "immutable" in response.headers["cache-control"]
+
+
+async def wait_for_steps(async_client, task_id, count):
+    """Poll a task until it has recorded a number of steps."""
+    for _ in range(100):
+        data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+        if len(data["steps"]) >= count:
+            return data
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Task {task_id} never reached {count} steps")
+
+
+@pytest.mark.asyncio
+async def test_pause_stops_agent_between_steps(async_client, sample_task_request, fake_agent, fake_browser_pool):
+    """Test that a paused task parks its browser before the next step and resumes from it."""
+    fake_agent.steps = [{"next_goal": "First"}, {"next_goal": "Second"}]
+    fake_agent.step_gate = asyncio.Event()
+    
+    task_id = (await async_client.post("/api/v1/run-task", json=sample_task_request)).json()["id"]
+    await wait_for_steps(async_client, task_id, 1)
+    assert (await async_client.put(f"/api/v1/pause-task?task_id={task_id}")).status_code == 200
+    
+    gate, fake_agent.step_gate = fake_agent.step_gate, None
+    gate.set()
+    context = fake_browser_pool.factory.browsers[-1].contexts[-1]
+    for _ in range(100):
+        if context.frozen:
+            break
+        await asyncio.sleep(0.01)
+    assert context.frozen
+    assert fake_browser_pool.stats()["parked"] == 1
+    assert task_scheduler.running_count == 0
+    data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+    assert [step["next_goal"] for step in data["steps"]] == ["First"]
+    
+    assert (await async_client.put(f"/api/v1/resume-task?task_id={task_id}")).status_code == 200
+    await wait_for_status(async_client, task_id, [TaskStatusEnum.FINISHED])
+    data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+    assert [step["next_goal"] for step in data["steps"]] == ["First", "Second"]
+    assert not context.frozen
+    assert fake_browser_pool.stats()["parked"] == 0
+
+
+@pytest.mark.asyncio
+async def test_long_pause_spills_browser(async_client, sample_task_request, fake_agent, fake_browser_pool,
+                                         tmp_path, monkeypatch):
+    """Test that a task paused past the spill delay saves its pages to disk and restores them on resume."""
+    monkeypatch.setattr(settings, "TASK_PAUSE_SPILL_AFTER", 0.01)
+    monkeypatch.setattr(settings, "BROWSER_STATES_PATH", tmp_path)
+    fake_agent.steps = [{"next_goal": "First"}, {"next_goal": "Second"}]
+    fake_agent.step_gate = asyncio.Event()
+    
+    task_id = (await async_client.post("/api/v1/run-task", json=sample_task_request)).json()["id"]
+    await wait_for_steps(async_client, task_id, 1)
+    await async_client.put(f"/api/v1/pause-task?task_id={task_id}")
+    gate, fake_agent.step_gate = fake_agent.step_gate, None
+    gate.set()
+    
+    context = fake_browser_pool.factory.browsers[-1].contexts[-1]
+    for _ in range(100):
+        if context.spilled:
+            break
+        await asyncio.sleep(0.01)
+    assert (tmp_path / f"{task_id}.json").exists()
+    
+    await async_client.put(f"/api/v1/resume-task?task_id={task_id}")
+    await wait_for_status(async_client, task_id, [TaskStatusEnum.FINISHED])
+    assert not context.spilled
+    assert not (tmp_path / f"{task_id}.json").exists()
@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services.screenshot_service import screenshot_service
+from app.services.timeline_service import TimelineService, sample_frames, timeline_service
+from app.utils.task_manager import task_manager
+
+
+def make_screenshot(color, size=(1280, 800)) -> str:
+    """Encode a solid color PNG the way browser-use returns screenshots."""
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def screenshots(tmp_path):
+    """Write solid color screenshot files."""
+    def write(*colors):
+        paths = []
+        for color in colors:
+            path = tmp_path / "screenshots" / f"{color}.png"
+            path.parent.mkdir(exist_ok=True)
+            Image.new("RGB", (1280, 800), color).save(path)
+            paths.append(path)
+        return paths
+    return write
+
+
+@pytest.fixture
+async def service(tmp_path):
+    service = TimelineService(timelines_path=tmp_path / "timelines", max_width=320, workers=1)
+    yield service
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_timeline_downscales_frames(service, screenshots, tmp_path):
+    """Test that timelines are built from downscaled frames and cached by screenshot count."""
+    files = screenshots("red", "blue")
+    path = await service.timeline("task-1", files)
+
+    assert path == tmp_path / "timelines" / "task-1" / "2.gif"
+    with Image.open(path) as animation:
+        assert animation.size == (320, 200)
+        assert animation.n_frames == 2
+
+    mtime = path.stat().st_mtime_ns
+    assert await service.timeline("task-1", files) == path
+    assert path.stat().st_mtime_ns == mtime
+
+
+@pytest.mark.asyncio
+async def test_timeline_extends_incrementally(service, screenshots, tmp_path):
+    """Test that a growing task only renders its new screenshots."""
+    files = screenshots("red", "blue", "green")
+    await service.timeline("task-1", files[:2])
+    first_frame = tmp_path / "timelines" / "task-1" / "frames" / "000000.png"
+    mtime = first_frame.stat().st_mtime_ns
+
+    path = await service.timeline("task-1", files)
+
+    assert first_frame.stat().st_mtime_ns == mtime
+    assert sorted(p.name for p in (tmp_path / "timelines" / "task-1").glob("*.gif")) == ["3.gif"]
+    with Image.open(path) as animation:
+        assert animation.n_frames == 3
+    assert service.latest("task-1", "2.gif") == path
+    assert service.latest("task-1", "3.gif") is None
+    assert service.latest("task-1", "2.webp") is None
+
+
+@pytest.mark.asyncio
+async def test_timeline_concurrent_requests_build_once(service, screenshots, monkeypatch):
+    """Test that concurrent requests for a task wait for a single build and release its lock."""
+    files = screenshots("red", "blue")
+    builds = []
+    build = service._build
+
+    async def counting_build(task_dir, screenshots, target, image_format):
+        builds.append(target.name)
+        await build(task_dir, screenshots, target, image_format)
+
+    monkeypatch.setattr(service, "_build", counting_build)
+    paths = await asyncio.gather(*(service.timeline("task-1", files) for _ in range(5)))
+
+    assert builds == ["2.gif"]
+    assert set(paths) == {paths[0]}
+    assert service._locks == {} and service._lock_users == {}
+
+
+@pytest.mark.asyncio
+async def test_timeline_caps_frames(tmp_path, screenshots):
+    """Test that long tasks are sampled down to max_frames, keeping the first and last screenshot."""
+    assert sample_frames(3, 5) == [0, 1, 2]
+    assert sample_frames(10, 4) == [0, 3, 6, 9]
+    assert sample_frames(10, 1) == [9]
+
+    service = TimelineService(timelines_path=tmp_path / "timelines", max_width=320, workers=1, max_frames=3)
+    try:
+        path = await service.timeline("task-1", screenshots("red", "blue", "green", "white", "black"), "webp")
+        with Image.open(path) as animation:
+            assert animation.n_frames == 3
+            animation.seek(2)
+            assert animation.convert("RGB").getpixel((0, 0)) == (0, 0, 0)
+    finally:
+        await service.close()
+
+
+@pytest.mark.asyncio
+async def test_timeline_webp(service, screenshots):
+    """Test building an animated WebP."""
+    path = await service.timeline("task-1", screenshots("red", "blue"), "webp")
+    with Image.open(path) as animation:
+        assert animation.format == "WEBP"
+        assert animation.n_frames == 2
+
+
+@pytest.mark.asyncio
+async def test_task_gif_endpoint(async_client, tmp_path, monkeypatch):
+    """Test that the gif endpoint links to a downloadable timeline."""
+    monkeypatch.setattr(settings, "TIMELINES_PATH", tmp_path / "timelines")
+    monkeypatch.setattr(timeline_service, "timelines_path", tmp_path / "timelines")
+    monkeypatch.setattr(screenshot_service, "screenshots_path", tmp_path / "screenshots")
+
+    task_id = await task_manager.create_task("Test task")
+    response = await async_client.get(f"/api/v1/task/{task_id}/gif")
+    assert response.json()["gif"] is None
+
+    saved = await screenshot_service.save(task_id, [make_screenshot("red")], 0)
+    await task_manager.add_task_steps(task_id, [{"next_goal": "go"}], saved)
+    response = await async_client.get(f"/api/v1/task/{task_id}/gif")
+    gif_url = response.json()["gif"]
+    assert gif_url == f"/api/v1/download/timeline/{task_id}/1.gif"
+
+    response = await async_client.get(gif_url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/gif"
+    assert response.content.startswith(b"GIF8")
+
+    # Links to a timeline replaced by a newer one follow it
+    saved = await screenshot_service.save(task_id, [make_screenshot("blue")], 1)
+    await task_manager.add_task_steps(task_id, [{"next_goal": "look"}], saved)
+    response = await async_client.get(f"/api/v1/task/{task_id}/gif")
+    assert response.json()["gif"] == f"/api/v1/download/timeline/{task_id}/2.gif"
+    response = await async_client.get(gif_url, follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == f"/api/v1/download/timeline/{task_id}/2.gif"
+    assert (await async_client.get(f"/api/v1/download/timeline/{task_id}/3.gif")).status_code == 404
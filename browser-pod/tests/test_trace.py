@@ -0,0 +1,88 @@
+import pytest
+import asyncio
+
+from app.services.trace_service import TraceService
+from app.utils.task_manager import task_manager
+
+
+def test_trace_ring_buffer():
+    """Test that traces keep their latest spans and only the most recent tasks."""
+    service = TraceService(max_events=2, max_tasks=2)
+    service.start("task-1")
+    for index in range(3):
+        service.add("task-1", f"step {index + 1}", "step", start=index, end=index + 0.5)
+
+    trace = service.get("task-1").to_chrome_trace()
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["step 2", "step 3"]
+    assert spans[0]["ts"] == 1_000_000 and spans[0]["dur"] == 500_000
+    assert trace["otherData"]["dropped_events"] == 1
+
+    service.start("task-2")
+    service.start("task-3")
+    assert service.get("task-1") is None
+    assert service.get("task-3") is not None
+
+
+@pytest.mark.asyncio
+async def test_instrument_agent_phases():
+    """Test that agent browser state, LLM and action calls become spans."""
+    service = TraceService()
+    service.start("task-1")
+
+    class FakeAction:
+        def __init__(self, name):
+            self.name = name
+
+        def model_dump(self, exclude_unset=False):
+            return {self.name: {}}
+
+    class FakeController:
+        async def act(self, action, browser_session, **kwargs):
+            return action.name
+
+    class FakeStepAgent:
+        controller = FakeController()
+
+        async def _get_browser_state_with_recovery(self, cache_clickable_elements_hashes=True):
+            return "state"
+
+        async def _get_model_output_with_retry(self, input_messages):
+            return "output"
+
+    agent = FakeStepAgent()
+    service.instrument_agent("task-1", agent)
+    assert await agent._get_browser_state_with_recovery() == "state"
+    assert await agent._get_model_output_with_retry([]) == "output"
+    assert await agent.controller.act(FakeAction("go_to_url"), None) == "go_to_url"
+    await agent.controller.act(FakeAction("click_element_by_index"), None)
+
+    spans = [(e["name"], e["cat"]) for e in service.get("task-1").to_chrome_trace()["traceEvents"] if e["ph"] == "X"]
+    assert spans == [
+        ("browser state", "extract"),
+        ("llm", "llm"),
+        ("go_to_url", "navigate"),
+        ("click_element_by_index", "action")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_task_trace_endpoint(async_client, sample_task_request, fake_agent):
+    """Test that a finished task has a trace of its setup, steps and teardown."""
+    fake_agent.steps = [{"next_goal": "Open page"}, {"next_goal": "Done"}]
+    response = await async_client.post("/api/v1/run-task", json=sample_task_request)
+    task_id = response.json()["id"]
+    for _ in range(100):
+        data = (await async_client.get(f"/api/v1/task/{task_id}/trace")).json()
+        if any(event["name"] == "task" for event in data["traceEvents"]):
+            break
+        await asyncio.sleep(0.01)
+
+    names = [event["name"] for event in data["traceEvents"] if event["ph"] == "X"]
+    assert names[0] in ("browser lease", "browser launch")
+    assert names[1:] == ["agent creation", "step 1", "step 2", "teardown", "task"]
+    assert data["otherData"]["task_id"] == task_id
+
+    queued_id = await task_manager.create_task("Not started")
+    assert (await async_client.get(f"/api/v1/task/{queued_id}/trace")).json()["traceEvents"][1:] == []
+    assert (await async_client.get("/api/v1/task/missing/trace")).status_code == 404
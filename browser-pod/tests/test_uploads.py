@@ -1,5 +1,7 @@
 import pytest
 import io
+import asyncio
+import hashlib
 from fastapi import UploadFile
 
 
@@ -99,3 +101,256 @@ def test_upload_validation():
         content_type="image/png"
     )
     assert image_request.content_type == "image/png"
+
+
+def test_raw_upload_streams_with_checksum(client, upload_dirs):
+    """Test uploading a raw body with a matching checksum."""
+    content = b"raw body content" * 1000
+    digest = hashlib.sha256(content).hexdigest()
+    
+    response = client.put(
+        "/api/v1/upload/raw.txt",
+        content=content,
+        headers={"Content-Type": "application/octet-stream", "X-Checksum-SHA256": digest}
+    )
+    assert response.status_code == 200
+    assert response.json()["sha256"] == digest
+    assert response.json()["size"] == len(content)
+    
+    uploads, partial = upload_dirs
+    assert (uploads / "raw.txt").read_bytes() == content
+    assert list(partial.iterdir()) == []
+
+
+def test_raw_upload_checksum_mismatch(client, upload_dirs):
+    """Test that a checksum mismatch rejects the upload without storing it."""
+    response = client.put(
+        "/api/v1/upload/bad.txt",
+        content=b"content",
+        headers={"Content-Type": "application/octet-stream", "X-Checksum-SHA256": "0" * 64}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Checksum mismatch"
+    
+    uploads, partial = upload_dirs
+    assert not (uploads / "bad.txt").exists()
+    assert list(partial.iterdir()) == []
+
+
+def test_upload_invalid_filename(client, upload_dirs):
+    """Test that hidden or path-like file names are rejected."""
+    response = client.put("/api/v1/upload/.hidden", content=b"x")
+    assert response.status_code == 400
+
+
+def test_resumable_upload(client, upload_dirs):
+    """Test uploading a file in parts with Content-Range."""
+    content = b"0123456789" * 10
+    digest = hashlib.sha256(content).hexdigest()
+    url = "/api/v1/upload/parts.bin"
+    
+    response = client.put(url, content=content[:40], headers={"Content-Range": "bytes 0-39/100"})
+    assert response.status_code == 202
+    assert response.json()["received"] == 40
+    assert client.head(url).headers["Upload-Offset"] == "40"
+    
+    # A part that does not continue at the stored offset is rejected
+    response = client.put(url, content=content[50:], headers={"Content-Range": "bytes 50-99/100"})
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "40"
+    
+    response = client.put(
+        url,
+        content=content[40:],
+        headers={"Content-Range": "bytes 40-99/100", "X-Checksum-SHA256": digest}
+    )
+    assert response.status_code == 200
+    assert response.json()["sha256"] == digest
+    
+    uploads, partial = upload_dirs
+    assert (uploads / "parts.bin").read_bytes() == content
+    assert list(partial.iterdir()) == []
+    assert client.head(url).headers["Upload-Offset"] == "0"
+
+
+@pytest.mark.asyncio
+async def test_upload_aborts_when_limit_exceeded(tmp_path):
+    """Test that streaming stops at the first chunk over the size limit."""
+    from app.services.upload_service import UploadService, UploadTooLargeError
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    service = UploadService(
+        uploads_path=storage, partial_path=storage, blobs_path=storage / "blobs", max_size=100, chunk_size=10
+    )
+    consumed = []
+    
+    async def chunks():
+        for i in range(100):
+            consumed.append(i)
+            yield b"x" * 30
+    
+    with pytest.raises(UploadTooLargeError):
+        await service.write("big.bin", chunks())
+    
+    assert len(consumed) == 4
+    assert list(storage.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_streams_without_content_length(async_client, upload_dirs, monkeypatch):
+    """Test that multipart bodies are streamed, so chunked uploads stop at the size limit."""
+    from starlette.requests import Request
+    from app.services.upload_service import upload_service
+    
+    async def no_form(self, **kwargs):
+        raise AssertionError("multipart bodies must not be spooled")
+    
+    monkeypatch.setattr(Request, "form", no_form)
+    boundary = "pod-boundary"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhello\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.txt\"\r\n"
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    
+    async def body(parts):
+        for part in parts:
+            yield part
+    
+    response = await async_client.put("/api/v1/upload/form.txt", content=body([head, b"file ", b"content", tail]), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["sha256"] == hashlib.sha256(b"file content").hexdigest()
+    
+    monkeypatch.setattr(upload_service, "max_size", 100)
+    sent = []
+    
+    async def endless():
+        yield head
+        for i in range(1000):
+            sent.append(i)
+            yield b"x" * 30
+    
+    response = await async_client.put("/api/v1/upload/big.txt", content=endless(), headers=headers)
+    assert response.status_code == 413
+    assert len(sent) < 10
+
+
+def test_uploads_are_deduplicated(client, upload_dirs):
+    """Test that identical content is stored once and referenced by every name."""
+    from app.services.upload_service import upload_service
+    content = b"same report"
+    digest = hashlib.sha256(content).hexdigest()
+    
+    for name in ["a.txt", "b.txt"]:
+        response = client.put(f"/api/v1/upload/{name}", content=content)
+        assert response.status_code == 200
+    
+    assert upload_service.refcount(digest) == 2
+    assert len(list(upload_service.blobs_path.glob("*/*"))) == 1
+    assert client.get("/api/v1/uploads/b.txt").content == content
+
+
+def test_check_upload(client, upload_dirs):
+    """Test skipping the upload of content that is already stored."""
+    from app.services.upload_service import upload_service
+    content = b"known content"
+    digest = hashlib.sha256(content).hexdigest()
+    request = {"file_name": "report.txt", "content_type": "text/plain", "sha256": digest}
+    
+    response = client.post("/api/v1/uploads/check", json=request)
+    assert response.json()["exists"] is False
+    upload_url = response.json()["upload_url"]
+    assert client.put(upload_url, content=content).status_code == 200
+    
+    response = client.post("/api/v1/uploads/check", json=request)
+    data = response.json()
+    assert data["exists"] is True
+    assert data["file_name"].endswith(".txt")
+    assert client.get(f"/api/v1/uploads/{data['file_name']}").status_code == 404
+    
+    challenge = data["challenge"]
+    proof = hashlib.sha256(
+        challenge["nonce"].encode() + content[challenge["offset"]:challenge["offset"] + challenge["length"]]
+    ).hexdigest()
+    assert client.post(challenge["proof_url"], json={"proof": proof}).status_code == 200
+    assert client.get(f"/api/v1/uploads/{data['file_name']}").content == content
+    assert upload_service.refcount(digest) == 2
+    # A challenge is answered once
+    assert client.post(challenge["proof_url"], json={"proof": proof}).status_code == 403
+
+
+def test_check_upload_requires_content(client, upload_dirs, monkeypatch):
+    """Test that knowing a file's SHA-256 is not enough to get a name for it."""
+    from app.services.upload_service import upload_service
+    monkeypatch.setattr(upload_service, "proof_size", 16)
+    content = bytes(range(256)) * 64
+    digest = hashlib.sha256(content).hexdigest()
+    assert client.put("/api/v1/upload/secret.bin", content=content).status_code == 200
+    
+    request = {"file_name": "guess.bin", "content_type": "text/plain", "sha256": digest}
+    data = client.post("/api/v1/uploads/check", json=request).json()
+    assert data["challenge"]["length"] == 16
+    response = client.post(data["challenge"]["proof_url"], json={"proof": digest})
+    assert response.status_code == 403
+    assert client.get(f"/api/v1/uploads/{data['file_name']}").status_code == 404
+    assert upload_service.refcount(digest) == 1
+    
+    # Names that were never challenged cannot be linked
+    response = client.post("/api/v1/uploads/check/other.bin", json={"proof": digest})
+    assert response.status_code == 403
+
+
+def test_replaced_upload_releases_blob(client, upload_dirs):
+    """Test that a blob no longer referenced by any name is deleted."""
+    from app.services.upload_service import upload_service
+    old, new = b"old content", b"new content"
+    
+    client.put("/api/v1/upload/doc.txt", content=old)
+    client.put("/api/v1/upload/doc.txt", content=new)
+    
+    assert upload_service.refcount(hashlib.sha256(old).hexdigest()) == 0
+    assert not upload_service.blob_path(hashlib.sha256(old).hexdigest()).exists()
+    assert client.get("/api/v1/uploads/doc.txt").content == new
+
+
+def test_reuploaded_content_keeps_single_link(client, upload_dirs):
+    """Test that uploading the same content again under a name leaves no extra link behind."""
+    from app.services.upload_service import upload_service
+    uploads, _ = upload_dirs
+    content = b"same content"
+    digest = hashlib.sha256(content).hexdigest()
+    
+    for _ in range(2):
+        assert client.put("/api/v1/upload/a.txt", content=content).status_code == 200
+    
+    assert sorted(path.name for path in uploads.iterdir()) == ["a.txt"]
+    assert upload_service.refcount(digest) == 1
+    
+    client.put("/api/v1/upload/a.txt", content=b"other content")
+    assert not upload_service.blob_path(digest).exists()
+
+
+@pytest.mark.asyncio
+async def test_run_task_with_included_files(async_client, sample_task_request, upload_dirs, fake_agent):
+    """Test that included files must exist and are handed to the agent."""
+    from app.models.enums import TaskStatusEnum
+    
+    request = {**sample_task_request, "included_file_names": ["missing.pdf"]}
+    response = await async_client.post("/api/v1/run-task", json=request)
+    assert response.status_code == 400
+    
+    await async_client.put("/api/v1/upload/input.pdf", content=b"%PDF")
+    request = {**sample_task_request, "included_file_names": ["input.pdf"]}
+    response = await async_client.post("/api/v1/run-task", json=request)
+    task_id = response.json()["id"]
+    for _ in range(100):
+        data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+        if data["status"] == TaskStatusEnum.FINISHED:
+            break
+        await asyncio.sleep(0.01)
+    
+    assert data["user_uploaded_files"] == ["input.pdf"]
+    uploads, _ = upload_dirs
+    assert fake_agent.instances[0].kwargs["available_file_paths"] == [str(uploads / "input.pdf")]
@@ -0,0 +1,94 @@
+import pytest
+import asyncio
+
+from app.config import settings
+from app.models.enums import TaskStatusEnum
+from app.services.scheduler import task_scheduler
+from app.services.watchdog import TaskTimeoutError, TaskWatchdog
+
+
+def test_watchdog_limits():
+    """Test that each limit reports its own reason."""
+    watchdog = TaskWatchdog(timeout=100, step_timeout=10, idle_timeout=5)
+    start = watchdog.started_at
+
+    assert watchdog.expired(start + 4) is None
+    assert "no progress for 5s" in watchdog.expired(start + 6)
+
+    watchdog._in_step, watchdog._since = True, start + 6
+    assert watchdog.expired(start + 15) is None
+    assert "step 1 exceeded the 10s step time limit" in watchdog.expired(start + 17)
+
+    assert "exceeded its 100s time limit" in watchdog.expired(start + 101)
+
+
+def test_watchdog_pause_stops_step_clocks():
+    """Test that paused time does not count towards the step and idle limits."""
+    pause_event = asyncio.Event()
+    watchdog = TaskWatchdog(timeout=100, step_timeout=10, idle_timeout=5, pause_event=pause_event)
+    start = watchdog.started_at
+
+    assert watchdog.expired(start + 50) is None
+    pause_event.set()
+    assert watchdog.expired(start + 54) is None
+    assert "no progress" in watchdog.expired(start + 56)
+
+    pause_event.clear()
+    assert "time limit" in watchdog.expired(start + 101)
+
+
+@pytest.mark.asyncio
+async def test_watchdog_cancels_hung_run():
+    """Test that a run exceeding a limit is cancelled."""
+    watchdog = TaskWatchdog(timeout=0, step_timeout=0, idle_timeout=0.05, check_interval=0.01)
+    cancelled = asyncio.Event()
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TaskTimeoutError, match="no progress"):
+        await watchdog.run(hang())
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_watchdog_passes_result():
+    """Test that runs within their limits return normally."""
+    watchdog = TaskWatchdog(check_interval=0.01)
+
+    async def work():
+        await watchdog.step_started()
+        await asyncio.sleep(0.02)
+        await watchdog.step_finished()
+        return "done"
+
+    assert await watchdog.run(work()) == "done"
+    assert watchdog.steps == 1
+
+
+@pytest.mark.asyncio
+async def test_hung_task_fails_with_timeout(async_client, sample_task_request, fake_agent, monkeypatch):
+    """Test that a stuck agent fails its task and frees its worker slot."""
+    monkeypatch.setattr(settings, "TASK_STEP_TIMEOUT", 0.05)
+    monkeypatch.setattr(settings, "TASK_WATCHDOG_INTERVAL", 0.01)
+    fake_agent.steps = [{"next_goal": "Hang"}]
+    fake_agent.step_gate = asyncio.Event()
+
+    response = await async_client.post("/api/v1/run-task", json=sample_task_request)
+    task_id = response.json()["id"]
+
+    for _ in range(100):
+        data = (await async_client.get(f"/api/v1/task/{task_id}")).json()
+        if data["status"] == TaskStatusEnum.FAILED:
+            break
+        await asyncio.sleep(0.01)
+    assert data["status"] == TaskStatusEnum.FAILED
+    assert data["output"].startswith("Timed out: step 1 exceeded")
+
+    await asyncio.sleep(0.01)
+    assert task_scheduler.running_count == 0
+    assert (await async_client.get("/api/v1/task-manager")).json()["timed_out_tasks"] >= 1